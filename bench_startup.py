@@ -0,0 +1,128 @@
+"""测量安装器的启动耗时
+
+报告窗口首次绘制的时间（time-to-first-paint）、后台环境检查完成的时间，
+以及 `python -X importtime` 统计的各模块导入耗时。
+
+用法:
+    python bench_startup.py --runs 5 --top 15
+    python bench_startup.py --budget-ms 1500   # 首次绘制超过预算时返回1，可用于CI
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent
+
+# 在子进程中运行，保证每次都是冷启动
+CHILD = r'''
+import sys, json, time
+started = time.time()
+from PySide6.QtCore import QEvent, QObject, QTimer
+from PySide6.QtWidgets import QApplication
+app = QApplication(sys.argv)
+from src.ui.main_window import MainWindow
+imported = time.time()
+window = MainWindow()
+constructed = time.time()
+marks = {}
+
+class PaintWatcher(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint and 'paint' not in marks:
+            marks['paint'] = time.time()
+            QTimer.singleShot(0, wait_for_checks)
+        return False
+
+def wait_for_checks():
+    # 环境检查线程结束后 check_thread 会被置为 None
+    if window.check_thread is None or time.time() - started > 30:
+        marks['ready'] = time.time()
+        app.quit()
+    else:
+        QTimer.singleShot(10, wait_for_checks)
+
+watcher = PaintWatcher()
+window.installEventFilter(watcher)
+window.show()
+app.exec()
+print(json.dumps({'started': started, 'imported': imported, 'constructed': constructed, **marks}))
+'''
+
+
+def measure_first_paint(platform: str) -> Dict[str, float]:
+    env = dict(os.environ)
+    if platform:
+        env['QT_QPA_PLATFORM'] = platform
+    spawned = time.time()
+    result = subprocess.run([sys.executable, '-c', CHILD], cwd=ROOT, env=env,
+                            capture_output=True, text=True, timeout=120)
+    if result.returncode != 0:
+        raise RuntimeError(f"启动测量失败:\n{result.stderr.strip()}")
+    marks = json.loads(result.stdout.strip().splitlines()[-1])
+    return {
+        'interpreter': (marks['started'] - spawned) * 1000,
+        'imports': (marks['imported'] - marks['started']) * 1000,
+        'construct': (marks['constructed'] - marks['imported']) * 1000,
+        'first_paint': (marks['paint'] - spawned) * 1000,
+        'environment_ready': (marks['ready'] - spawned) * 1000,
+    }
+
+
+def measure_imports(module: str) -> Dict[str, Dict[str, int]]:
+    """解析 -X importtime 输出，返回 {模块: {'self': 微秒, 'cumulative': 微秒}}"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=ROOT, capture_output=True, text=True, timeout=120)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = {'self': int(self_us), 'cumulative': int(cumulative_us)}
+    return modules
+
+
+def median_of(samples: List[Dict[str, float]]) -> Dict[str, float]:
+    return {key: statistics.median(sample[key] for sample in samples) for key in samples[0]}
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="测量安装器启动耗时")
+    parser.add_argument('--runs', type=int, default=5, help="冷启动次数，取中位数")
+    parser.add_argument('--top', type=int, default=15, help="列出导入最慢的模块数")
+    parser.add_argument('--module', default='src.ui.main_window', help="统计导入耗时的入口模块")
+    parser.add_argument('--platform', default='offscreen', help="QT_QPA_PLATFORM，为空时使用系统默认")
+    parser.add_argument('--budget-ms', type=float, help="首次绘制的时间预算，超出时返回1")
+    parser.add_argument('--json', action='store_true', help="以JSON输出结果")
+    args = parser.parse_args()
+
+    paint = median_of([measure_first_paint(args.platform) for _ in range(args.runs)])
+    imports = measure_imports(args.module)
+    slowest = sorted(imports.items(), key=lambda item: item[1]['self'], reverse=True)[:args.top]
+
+    if args.json:
+        print(json.dumps({'startup_ms': paint, 'imports_us': dict(slowest),
+                          'entry_import_us': imports.get(args.module, {}).get('cumulative')}, indent=2))
+    else:
+        print(f"启动耗时（{args.runs} 次中位数，毫秒）")
+        for key, value in paint.items():
+            print(f"  {key:<18} {value:8.1f}")
+        entry = imports.get(args.module)
+        if entry:
+            print(f"\n导入 {args.module} 共 {entry['cumulative'] / 1000:.1f}ms，自身耗时最多的模块:")
+        for name, times in slowest:
+            print(f"  {name:<40} {times['self'] / 1000:8.1f}ms  (累计 {times['cumulative'] / 1000:.1f}ms)")
+
+    if args.budget_ms is not None and paint['first_paint'] > args.budget_ms:
+        print(f"首次绘制 {paint['first_paint']:.0f}ms 超出预算 {args.budget_ms:.0f}ms", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
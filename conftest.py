@@ -0,0 +1,5 @@
+import os
+import tempfile
+
+# 测试不读写用户缓存目录（配置编译缓存、模型清单缓存）
+os.environ["DEEPSEEK_CACHE_DIR"] = tempfile.mkdtemp(prefix="deepseek-test-cache-")
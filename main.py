@@ -1,13 +1,13 @@
 import sys
 import logging
-from PySide6.QtWidgets import QApplication
-from src.ui.main_window import MainWindow
 
-# 配置日志
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
 def main():
+    # 配置日志（命令行模式由 src.cli 按 -v 自行配置）
+    logging.basicConfig(level=logging.DEBUG)
+    from PySide6.QtWidgets import QApplication
+    from src.ui.main_window import MainWindow
     try:
         logger.info("正在初始化应用程序...")
         app = QApplication(sys.argv)
@@ -25,4 +25,8 @@ def main():
         return 1
 
 if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        # 带参数时进入命令行模式，不导入Qt
+        from src.cli import main as cli_main
+        sys.exit(cli_main())
     sys.exit(main()) 
\ No newline at end of file
@@ -1,7 +1,6 @@
 import sys
 import logging
 from pathlib import Path
-from ui.main_window import main
 
 def setup_logging():
     """设置日志配置"""
@@ -18,5 +17,10 @@ def setup_logging():
     )
 
 if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        # 带参数时进入命令行模式，不导入Qt
+        from .cli import main as cli_main
+        sys.exit(cli_main())
+    from .ui.main_window import main
     setup_logging()
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,643 @@
+"""无界面的命令行模式，供配置管理工具批量部署使用
+
+不导入 PySide6。进度和结果以JSON行输出到标准输出，日志输出到标准错误。
+
+退出码:
+    0   全部成功
+    1   部分或全部模型安装失败
+    2   参数或部署清单错误
+    3   运行环境不满足（Docker/Ollama不可用）
+    130 被中断（已下载的数据保留，重新运行即可续传）
+
+部署清单示例（YAML或JSON）:
+    install_path: /data/ollama/models
+    backend: api              # api 或 registry
+    max_parallel: 2
+    bandwidth_limit: 50MB     # 每秒，所有模型共享
+    window: "22:00-06:00"
+    warmup: true              # 安装后预读模型文件并预加载
+    models:
+      - deepseek-r1:7b
+      - name: deepseek-r1:14b
+        backend: registry
+"""
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import signal
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, TextIO
+
+from .utils import tracing
+from .utils.config_loader import ConfigLoader
+from .utils.disk_preflight import InsufficientDiskSpace
+from .utils.installer import ModelInstaller
+from .utils.system_checker import SystemChecker
+
+logger = logging.getLogger(__name__)
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_ENVIRONMENT = 3
+EXIT_INTERRUPTED = 130
+
+_UNITS = {'': 1, 'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+
+
+class UsageError(Exception):
+    """命令行参数或部署清单错误"""
+
+
+def parse_rate(value: Any) -> Optional[float]:
+    """把 "50MB"、"1.5G"、1048576 等形式解析为字节数"""
+    if value is None or value == '':
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMG]?)(?:i?B)?(?:/s)?\s*', str(value), re.IGNORECASE)
+    if not match:
+        raise UsageError(f"无法解析带宽: {value}")
+    return float(match.group(1)) * _UNITS[match.group(2).upper()]
+
+
+class JsonLinesReporter:
+    """线程安全地输出JSON行事件"""
+
+    def __init__(self, stream: TextIO = sys.stdout):
+        self.stream = stream
+        self._lock = threading.Lock()
+
+    def emit(self, event: str, **fields: Any) -> None:
+        record = {'event': event, 'ts': round(time.time(), 3), **fields}
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            self.stream.write(line + '\n')
+            self.stream.flush()
+
+    def progress_callback(self, model: str):
+        def callback(percent: int, message: str) -> None:
+            self.emit('progress', model=model, percent=percent, message=message)
+        return callback
+
+
+def parse_keep_alive(value: str) -> Any:
+    """Ollama的 keep_alive：带单位的时长（如 30m）或秒数，-1 表示一直常驻"""
+    return int(value) if value.lstrip('-').isdigit() else value
+
+
+def load_manifest(path: str) -> Dict[str, Any]:
+    """读取部署清单并补全默认值"""
+    import yaml
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = yaml.safe_load(f) or {}
+    except OSError as e:
+        raise UsageError(f"无法读取部署清单 {path}: {str(e)}")
+    except yaml.YAMLError as e:
+        raise UsageError(f"部署清单格式错误 {path}: {str(e)}")
+    if not isinstance(data, dict) or not data.get('models'):
+        raise UsageError(f"部署清单 {path} 中没有 models")
+
+    models = []
+    for item in data['models']:
+        if isinstance(item, str):
+            item = {'name': item}
+        if not isinstance(item, dict) or not item.get('name'):
+            raise UsageError(f"无效的模型条目: {item!r}")
+        models.append(item)
+    backend = data.get('backend', 'api')
+    for item in models:
+        item.setdefault('backend', backend)
+        if item['backend'] not in ('api', 'registry'):
+            raise UsageError(f"未知的安装方式: {item['backend']}")
+    if data.get('bandwidth_limit') is not None or data.get('window'):
+        # 限速时通过Ollama服务的模型由调度器一起拉取，只能使用清单级的安装路径
+        per_model = [item['name'] for item in models if item['backend'] == 'api' and item.get('install_path')]
+        if per_model:
+            raise UsageError(f"设置 bandwidth_limit 或 window 时不支持单个模型的 install_path: {', '.join(per_model)}")
+
+    return {
+        'install_path': data.get('install_path'),
+        'max_parallel': int(data.get('max_parallel', 2)),
+        'bandwidth_limit': parse_rate(data.get('bandwidth_limit')),
+        'window': data.get('window'),
+        'registry_url': data.get('registry_url'),
+        'warmup': bool(data.get('warmup', False)),
+        'models': models,
+    }
+
+
+def default_install_path() -> str:
+    from .utils.model_store import default_models_path
+    return default_models_path()
+
+
+class Provisioner:
+    """按部署清单无人值守地安装模型"""
+
+    def __init__(self, reporter: JsonLinesReporter, cancel_event: Optional[threading.Event] = None,
+                 installer_factory=ModelInstaller):
+        self.reporter = reporter
+        self.cancel_event = cancel_event or threading.Event()
+        self.installer_factory = installer_factory
+        self.environment_ready = True
+        self._installers = set()
+        self._lock = threading.Lock()
+
+    def _new_installer(self) -> ModelInstaller:
+        installer = self.installer_factory()
+        with self._lock:
+            self._installers.add(installer)
+        return installer
+
+    def _release(self, installer: ModelInstaller) -> None:
+        with self._lock:
+            self._installers.discard(installer)
+
+    def abort(self) -> None:
+        """取消时断开所有进行中的下载连接，不必等到下一条进度"""
+        self.cancel_event.set()
+        with self._lock:
+            installers = list(self._installers)
+        for installer in installers:
+            installer.abort_downloads()
+
+    def check_environment(self, installer: ModelInstaller) -> bool:
+        """通过Ollama服务安装前检查Docker；Ollama缺失时安装器会自动安装"""
+        docker_ok = installer.check_docker()
+        ollama_ok = installer.check_ollama()
+        self.reporter.emit('environment', docker=docker_ok, ollama=ollama_ok)
+        return docker_ok
+
+    def _report(self, name: str, success: bool, **fields: Any) -> None:
+        self.reporter.emit('result', model=name, success=success,
+                           cancelled=self.cancel_event.is_set() and not success, **fields)
+
+    def _install_one(self, item: Dict[str, Any], install_path: str, registry_url: Optional[str],
+                     warmup: bool = False) -> bool:
+        name = item['name']
+        # 每个线程使用单独的安装器，吞吐量统计互不干扰
+        installer = self._new_installer()
+        started = time.monotonic()
+        self.reporter.emit('start', model=name, backend=item['backend'])
+        try:
+            success = installer.install_model(
+                name, item.get('install_path') or install_path, self.reporter.progress_callback(name),
+                backend=item['backend'], registry_url=item.get('registry_url') or registry_url,
+                cancel_event=self.cancel_event, warmup=warmup,
+            )
+        finally:
+            self._release(installer)
+        self._report(name, success, duration=round(time.monotonic() - started, 3),
+                     io=installer.last_io_summary, warmup=installer.last_warmup)
+        return success
+
+    def run(self, manifest: Dict[str, Any]) -> Dict[str, bool]:
+        install_path = manifest['install_path'] or default_install_path()
+        queue = manifest['models']
+        results: Dict[str, bool] = {}
+
+        api_models = [item['name'] for item in queue if item['backend'] == 'api']
+        if api_models:
+            self.environment_ready = self.check_environment(self.installer_factory())
+            if not self.environment_ready:
+                for name in api_models:
+                    results[name] = False
+                    self._report(name, False, error="Docker未运行或未安装")
+                queue = [item for item in queue if item['backend'] != 'api']
+            elif manifest['bandwidth_limit'] is not None or manifest['window']:
+                # 限速或限定时间窗口时由调度器统一拉取，共享带宽预算
+                for name in api_models:
+                    self.reporter.emit('start', model=name, backend='api')
+                installer = self._new_installer()
+                try:
+                    batch = installer.install_models(
+                        api_models, install_path, self.reporter.progress_callback('*'),
+                        max_parallel=manifest['max_parallel'], bandwidth_limit=manifest['bandwidth_limit'],
+                        window=manifest['window'], cancel_event=self.cancel_event,
+                    )
+                    for name, success in batch.items():
+                        warmed = None
+                        if success and manifest.get('warmup'):
+                            warmed = installer.warm_up(name, install_path)
+                        self._report(name, success, warmup=warmed)
+                finally:
+                    self._release(installer)
+                results.update(batch)
+                queue = [item for item in queue if item['backend'] != 'api']
+
+        if queue:
+            with ThreadPoolExecutor(max_workers=max(1, manifest['max_parallel'])) as pool:
+                futures = {item['name']: pool.submit(self._install_one, item, install_path,
+                                                     manifest['registry_url'], manifest.get('warmup', False))
+                           for item in queue}
+                for name, future in futures.items():
+                    results[name] = future.result()
+        return results
+
+
+def cmd_check(args, reporter: JsonLinesReporter) -> int:
+    checker = SystemChecker(disk_path=args.path)
+    installer = ModelInstaller()
+    snapshot = checker.check_system()
+    docker_ok = installer.check_docker()
+    ollama_ok = installer.check_ollama()
+    reporter.emit('system', snapshot=snapshot)
+    reporter.emit('environment', docker=docker_ok, ollama=ollama_ok)
+    recommended = checker.recommend_models(ConfigLoader().get_model_catalog())
+    reporter.emit('recommendation', largest=recommended[0].name if recommended else None,
+                  models=[record.name for record in recommended])
+    if args.model:
+        requirements = ConfigLoader().get_model_requirements(args.model)
+        compatible, message = checker.check_model_compatibility(requirements)
+        reporter.emit('compatibility', model=args.model, compatible=compatible, message=message)
+        try:
+            disk = installer.preflight(args.model, checker.disk_path)
+        except InsufficientDiskSpace as e:
+            reporter.emit('disk', model=args.model, ok=False, message=str(e))
+            return EXIT_ENVIRONMENT
+        if disk is None:
+            reporter.emit('disk', model=args.model, ok=True, skipped=True, message="模型大小未知，跳过磁盘空间检查")
+        else:
+            reporter.emit('disk', model=args.model, ok=True, message=disk.describe())
+        if not compatible:
+            return EXIT_ENVIRONMENT
+    return EXIT_OK if docker_ok and ollama_ok else EXIT_ENVIRONMENT
+
+
+def cmd_list(args, reporter: JsonLinesReporter) -> int:
+    installer = ModelInstaller()
+    if not installer.ollama.is_available():
+        reporter.emit('error', message="Ollama服务不可用")
+        return EXIT_ENVIRONMENT
+    records = installer.get_installed_model_records()
+    reporter.emit('installed', models=[record.name for record in records],
+                  details=[record.as_dict() for record in records])
+    reporter.emit('available', models=sorted(ConfigLoader().get_available_models()))
+    return EXIT_OK
+
+
+def cmd_uninstall(args, reporter: JsonLinesReporter) -> int:
+    installer = ModelInstaller()
+    failed = False
+    for name in args.models:
+        success = installer.uninstall_model(name)
+        reporter.emit('result', model=name, success=success)
+        failed = failed or not success
+    return EXIT_FAILED if failed else EXIT_OK
+
+
+def _raise_interrupt(signum, frame) -> None:
+    raise KeyboardInterrupt
+
+
+def _run_provisioning(manifest: Dict[str, Any], reporter: JsonLinesReporter) -> int:
+    cancel_event = threading.Event()
+    provisioner = Provisioner(reporter, cancel_event)
+    started = time.monotonic()
+    worker_result: Dict[str, Any] = {}
+    done = threading.Event()
+
+    def work() -> None:
+        try:
+            worker_result['results'] = provisioner.run(manifest)
+        except Exception as e:
+            worker_result['error'] = e
+        finally:
+            done.set()
+
+    # 在工作线程中安装，主线程等待 Ctrl+C 或 SIGTERM 并通知取消。
+    # 不用 join() 等待：join() 被 KeyboardInterrupt 打断后线程可能被误标记为已结束
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, _raise_interrupt)
+    threading.Thread(target=work, name="provision", daemon=True).start()
+    try:
+        while not done.wait(0.2):
+            pass
+    except KeyboardInterrupt:
+        reporter.emit('cancelling')
+        provisioner.abort()
+        try:
+            while not done.wait(0.2):
+                pass
+        except KeyboardInterrupt:
+            # 再次中断时不等待安装线程收尾；线程池的线程会阻止解释器正常退出
+            reporter.emit('error', message="再次中断，已强制退出，重新运行即可续传")
+            sys.stdout.flush()
+            sys.stderr.flush()
+            os._exit(EXIT_INTERRUPTED)
+
+    if 'error' in worker_result:
+        reporter.emit('error', message=str(worker_result['error']))
+        return EXIT_FAILED
+    results = worker_result.get('results', {})
+    succeeded = sorted(name for name, ok in results.items() if ok)
+    failed = sorted(name for name, ok in results.items() if not ok)
+    reporter.emit('summary', succeeded=succeeded, failed=failed,
+                  duration=round(time.monotonic() - started, 3), cancelled=cancel_event.is_set())
+    if cancel_event.is_set():
+        return EXIT_INTERRUPTED
+    if failed and not provisioner.environment_ready:
+        return EXIT_ENVIRONMENT
+    return EXIT_FAILED if failed else EXIT_OK
+
+
+def cmd_install(args, reporter: JsonLinesReporter) -> int:
+    manifest = {
+        'install_path': args.path,
+        'max_parallel': args.parallel,
+        'bandwidth_limit': parse_rate(args.bandwidth),
+        'window': args.window,
+        'registry_url': args.registry_url,
+        'warmup': args.warmup,
+        'models': [{'name': name, 'backend': args.backend} for name in args.models],
+    }
+    return _run_provisioning(manifest, reporter)
+
+
+def cmd_provision(args, reporter: JsonLinesReporter) -> int:
+    manifest = load_manifest(args.manifest)
+    if args.path:
+        manifest['install_path'] = args.path
+    if args.warmup:
+        manifest['warmup'] = True
+    return _run_provisioning(manifest, reporter)
+
+
+def cmd_sync(args, reporter: JsonLinesReporter) -> int:
+    from .utils.catalog_sync import CatalogSync
+    from .utils.registry import RegistryClient
+    models = args.models or list(ConfigLoader().load_config().get('models', {}))
+    results = CatalogSync(RegistryClient(args.registry_url)).sync(models)
+    for result in results.values():
+        reporter.emit('sync', **result.as_dict())
+    return EXIT_FAILED if any(r.status == 'failed' for r in results.values()) else EXIT_OK
+
+
+def cmd_verify(args, reporter: JsonLinesReporter) -> int:
+    from .utils.model_store import ModelStore
+    from .utils.store_verify import StoreVerifier
+    verifier = StoreVerifier(ModelStore(args.path or default_install_path()), max_workers=args.workers,
+                             progress_callback=reporter.progress_callback('*'))
+    report = verifier.verify(args.models or None, full=args.full)
+    for name, result in sorted(report['models'].items()):
+        reporter.emit('verify', model=name, **result)
+    summary = {key: value for key, value in report.items() if key != 'models'}
+    reporter.emit('summary', **summary)
+    return EXIT_OK if report['ok'] else EXIT_FAILED
+
+
+def cmd_export(args, reporter: JsonLinesReporter) -> int:
+    from .utils.bundle import BundleError
+    if args.output == '-':
+        # 模型包写到标准输出（例如通过 ssh 传到离线主机），事件改为输出到标准错误
+        reporter.stream = sys.stderr
+        output = sys.stdout.fileno()
+    else:
+        output = args.output
+    try:
+        result = ModelInstaller().export_models(args.models, output, args.path or default_install_path(),
+                                                progress_callback=reporter.progress_callback('*'))
+    except (BundleError, InsufficientDiskSpace) as e:
+        reporter.emit('error', message=str(e))
+        return EXIT_FAILED
+    except KeyboardInterrupt:
+        reporter.emit('error', message="导出已中断")
+        return EXIT_INTERRUPTED
+    reporter.emit('summary', **result)
+    return EXIT_OK
+
+
+def cmd_import(args, reporter: JsonLinesReporter) -> int:
+    from .utils.bundle import BundleError
+    source = sys.stdin.fileno() if args.bundle == '-' else args.bundle
+    try:
+        result = ModelInstaller().import_bundle(source, args.path or default_install_path(), args.model or None,
+                                                progress_callback=reporter.progress_callback('*'))
+    except (BundleError, InsufficientDiskSpace, OSError) as e:
+        reporter.emit('error', message=str(e))
+        return EXIT_FAILED
+    except KeyboardInterrupt:
+        reporter.emit('error', message="导入已中断，重新导入会跳过已完成的blob")
+        return EXIT_INTERRUPTED
+    for name, status in sorted(result['models'].items()):
+        reporter.emit('import', model=name, status=status)
+    reporter.emit('summary', **{key: value for key, value in result.items() if key != 'models'})
+    return EXIT_OK if result['ok'] else EXIT_FAILED
+
+
+def cmd_mirror(args, reporter: JsonLinesReporter) -> int:
+    from .utils.mirror import RegistryMirror
+    from .utils.model_store import ModelStore
+    from .utils.registry import RegistryClient
+    upstream = None if args.offline else RegistryClient(args.upstream)
+    mirror = RegistryMirror(ModelStore(args.path or default_install_path()), upstream)
+    server = mirror.make_server(args.host, args.port)
+    reporter.emit('listening', url=server.url, path=str(mirror.store.root),
+                  upstream=upstream.base_url if upstream else None)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    reporter.emit('summary', **mirror.stats)
+    return EXIT_OK
+
+
+def cmd_warmup(args, reporter: JsonLinesReporter) -> int:
+    from .utils.warmup import ModelWarmer
+    installer = ModelInstaller()
+    if not installer.ollama.is_available():
+        reporter.emit('error', message="Ollama服务不可用")
+        return EXIT_ENVIRONMENT
+    models = args.models or installer.get_installed_models()
+    paths = [args.path, default_install_path()] if args.path else None
+    warmer = ModelWarmer(installer.ollama, paths, keep_alive=args.keep_alive, mode=args.mode,
+                         max_workers=args.workers)
+    failed = False
+    for name in models:
+        result = warmer.warm(name)
+        reporter.emit('warmup', **result)
+        failed = failed or 'error' in result
+    return EXIT_FAILED if failed else EXIT_OK
+
+
+def cmd_bench(args, reporter: JsonLinesReporter) -> int:
+    from .utils.benchmark import BenchmarkHistory, BenchmarkRunner, compare_report, load_prompts
+    installer = ModelInstaller()
+    if not installer.ollama.is_available():
+        reporter.emit('error', message="Ollama服务不可用")
+        return EXIT_ENVIRONMENT
+    try:
+        prompts = load_prompts(args.prompts) if args.prompts else None
+        concurrency = [int(c) for c in args.concurrency.split(',')]
+    except (OSError, ValueError) as e:
+        raise UsageError(f"无效的测试参数: {str(e)}")
+    models = args.models or installer.get_installed_models()
+
+    cancel_event = threading.Event()
+    # 本机测试时订阅常驻的nvidia-smi采样，显存峰值和GPU利用率来自实际设备
+    telemetry = None
+    if installer.ollama.is_local and shutil.which('nvidia-smi'):
+        from .utils.gpu_telemetry import GpuTelemetry
+        telemetry = GpuTelemetry(interval_ms=250)
+        if not telemetry.start():
+            telemetry = None
+    runner = BenchmarkRunner(installer.ollama, prompts, concurrency, num_predict=args.num_predict,
+                             progress_callback=reporter.progress_callback('*'), cancel_event=cancel_event,
+                             telemetry=telemetry)
+    try:
+        records = runner.run(models, SystemChecker(telemetry=telemetry).get_snapshot())
+    except KeyboardInterrupt:
+        cancel_event.set()
+        return EXIT_INTERRUPTED
+    finally:
+        if telemetry is not None:
+            telemetry.stop()
+    history = BenchmarkHistory(args.history)
+    history.append(records)
+    for record in records:
+        reporter.emit('benchmark', **record)
+    sys.stderr.write(compare_report(history.load()))
+    return EXIT_FAILED if any(record.get('errors') for record in records) else EXIT_OK
+
+
+def cmd_bench_report(args, reporter: JsonLinesReporter) -> int:
+    from .utils.benchmark import BenchmarkHistory, compare_report, latest_records, recommend
+    records = BenchmarkHistory(args.history).load(hardware=args.hardware)
+    for record in latest_records(records):
+        reporter.emit('benchmark', **record)
+    reporter.emit('recommendation', models=recommend(records, args.min_tokens_per_s, args.max_ttft))
+    sys.stderr.write(compare_report(records, args.min_tokens_per_s, args.max_ttft))
+    return EXIT_OK
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m src', description="Deepseek-R1 模型安装器（命令行模式）")
+    parser.add_argument('-v', '--verbose', action='store_true', help="输出调试日志")
+    parser.add_argument('--trace', metavar='FILE', help="把各阶段的span追加到JSON行文件（或设置 DEEPSEEK_TRACE_FILE）")
+    parser.add_argument('--metrics-textfile', metavar='FILE',
+                        help="写出node-exporter textfile格式的阶段指标（或设置 DEEPSEEK_METRICS_TEXTFILE）")
+    parser.add_argument('--profile', metavar='PHASE', action='append', default=[],
+                        help="用cProfile分析指定阶段，例如 install_model，* 表示全部（或设置 DEEPSEEK_PROFILE）")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    check = sub.add_parser('check', help="检查系统环境")
+    check.add_argument('--model', help="同时检查该模型的资源需求")
+    check.add_argument('--path', help="按该模型目录所在的卷检查磁盘空间")
+    check.set_defaults(func=cmd_check)
+
+    listing = sub.add_parser('list', help="列出已安装和可用的模型")
+    listing.set_defaults(func=cmd_list)
+
+    install = sub.add_parser('install', help="安装一个或多个模型")
+    install.add_argument('models', nargs='+')
+    install.add_argument('--path', help="模型目录，默认为 OLLAMA_MODELS 或 ~/.ollama/models")
+    install.add_argument('--backend', choices=('api', 'registry'), default='api')
+    install.add_argument('--registry-url')
+    install.add_argument('--parallel', type=int, default=2)
+    install.add_argument('--bandwidth', help="总带宽上限，例如 50MB")
+    install.add_argument('--window', help="允许下载的时间段，例如 22:00-06:00")
+    install.add_argument('--warmup', action='store_true', help="安装后预读模型文件并预加载")
+    install.set_defaults(func=cmd_install)
+
+    provision = sub.add_parser('provision', help="按部署清单安装")
+    provision.add_argument('manifest')
+    provision.add_argument('--path', help="覆盖清单中的模型目录")
+    provision.add_argument('--warmup', action='store_true', help="安装后预读模型文件并预加载")
+    provision.set_defaults(func=cmd_provision)
+
+    uninstall = sub.add_parser('uninstall', help="卸载模型")
+    uninstall.add_argument('models', nargs='+')
+    uninstall.set_defaults(func=cmd_uninstall)
+
+    sync = sub.add_parser('sync', help="从模型仓库同步模型的实际大小")
+    sync.add_argument('models', nargs='*')
+    sync.add_argument('--registry-url')
+    sync.set_defaults(func=cmd_sync)
+
+    verify = sub.add_parser('verify', help="校验模型目录中blob的完整性")
+    verify.add_argument('models', nargs='*', help="默认校验全部模型")
+    verify.add_argument('--path', help="模型目录，默认为 OLLAMA_MODELS 或 ~/.ollama/models")
+    verify.add_argument('--full', action='store_true', help="忽略校验缓存，重新计算全部哈希")
+    verify.add_argument('--workers', type=int, help="并行计算哈希的线程数")
+    verify.set_defaults(func=cmd_verify)
+
+    export = sub.add_parser('export', help="把已安装的模型导出为模型包，用于离线主机")
+    export.add_argument('models', nargs='+')
+    export.add_argument('-o', '--output', required=True, help="模型包路径，- 表示标准输出")
+    export.add_argument('--path', help="模型目录，默认为 OLLAMA_MODELS 或 ~/.ollama/models")
+    export.set_defaults(func=cmd_export)
+
+    bundle_import = sub.add_parser('import', help="从模型包导入模型")
+    bundle_import.add_argument('bundle', help="模型包路径，- 表示标准输入")
+    bundle_import.add_argument('--model', action='append', help="只导入指定的模型，可重复")
+    bundle_import.add_argument('--path', help="模型目录，默认为 OLLAMA_MODELS 或 ~/.ollama/models")
+    bundle_import.set_defaults(func=cmd_import)
+
+    mirror = sub.add_parser('mirror', help="在局域网内提供模型仓库镜像，其他主机用 --registry-url 指向这里")
+    mirror.add_argument('--path', help="模型目录，默认为 OLLAMA_MODELS 或 ~/.ollama/models")
+    mirror.add_argument('--host', default='0.0.0.0')
+    mirror.add_argument('--port', type=int, default=8765)
+    mirror.add_argument('--upstream', help="上游模型仓库，默认为 DEEPSEEK_REGISTRY_URL 或 registry.ollama.ai")
+    mirror.add_argument('--offline', action='store_true', help="只提供本地已有的模型，不回源")
+    mirror.set_defaults(func=cmd_mirror)
+
+    warmup = sub.add_parser('warmup', help="预读模型文件并预加载（例如在服务启动后运行）")
+    warmup.add_argument('models', nargs='*', help="默认预热全部已安装的模型")
+    warmup.add_argument('--path', help="模型目录，默认为 OLLAMA_MODELS 或 ~/.ollama/models")
+    warmup.add_argument('--keep-alive', type=parse_keep_alive, default='30m', help="模型常驻内存的时间，-1 表示一直常驻")
+    warmup.add_argument('--mode', choices=('auto', 'advise', 'read'), default='auto')
+    warmup.add_argument('--workers', type=int, default=4, help="并行预读的线程数")
+    warmup.set_defaults(func=cmd_warmup)
+
+    bench = sub.add_parser('bench', help="测试已安装模型的推理性能")
+    bench.add_argument('models', nargs='*', help="默认测试全部已安装的模型")
+    bench.add_argument('--prompts', help="提示集文件（每行一个提示，或JSON/YAML列表）")
+    bench.add_argument('--concurrency', default='1', help="并发级别，例如 1,4")
+    bench.add_argument('--num-predict', type=int, default=128, help="每个请求最多生成的token数")
+    bench.add_argument('--history', help="历史记录文件，默认在缓存目录下")
+    bench.set_defaults(func=cmd_bench)
+
+    report = sub.add_parser('bench-report', help="对比历史测试结果并推荐模型")
+    report.add_argument('--history', help="历史记录文件，默认在缓存目录下")
+    report.add_argument('--hardware', help="只看该硬件分类")
+    report.add_argument('--min-tokens-per-s', type=float, default=10.0)
+    report.add_argument('--max-ttft', type=float, default=2.0, help="首token延迟上限（秒）")
+    report.set_defaults(func=cmd_bench_report)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None, stream: TextIO = sys.stdout) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    logging.basicConfig(
+        level=logging.DEBUG if args.verbose else logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        stream=sys.stderr,
+    )
+    if args.trace or args.metrics_textfile or args.profile:
+        tracing.configure(args.trace, args.metrics_textfile, args.profile)
+    reporter = JsonLinesReporter(stream)
+    with tracing.span('cli', command=args.command) as current:
+        try:
+            code = args.func(args, reporter)
+        except UsageError as e:
+            reporter.emit('error', message=str(e))
+            code = EXIT_USAGE
+        current.set(exit_code=code)
+        if code != EXIT_OK:
+            current.outcome = 'cancelled' if code == EXIT_INTERRUPTED else 'failed'
+        return code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,47 +1,105 @@
 import sys
 import os
+import threading
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QWidget, QVBoxLayout, QHBoxLayout,
-    QLabel, QComboBox, QPushButton, QProgressBar, QTextEdit,
+    QLabel, QComboBox, QPushButton, QProgressBar, QCheckBox,
     QFileDialog, QMessageBox
 )
-from PySide6.QtCore import Qt, QThread, Signal
+from PySide6.QtCore import Qt, QThread, QTimer, Signal
 from PySide6.QtGui import QFont, QIcon
 from ..utils.system_checker import SystemChecker
 from ..utils.config_loader import ConfigLoader
+from ..utils.config_cache import ConfigWatcher
 from ..utils.installer import ModelInstaller
+from .widgets import LogView, ProgressCoalescer
 
 class InstallationThread(QThread):
+    """在后台线程中执行安装，进度通过排队信号发送到界面线程"""
     progress_updated = Signal(int, str)
     installation_completed = Signal(bool, str)
 
-    def __init__(self, model_name: str, install_path: str):
-        super().__init__()
+    def __init__(self, installer: ModelInstaller, model_name: str, install_path: str, parent=None,
+                 warmup: bool = False):
+        super().__init__(parent)
+        self.installer = installer
         self.model_name = model_name
         self.install_path = install_path
+        self.warmup = warmup
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        """请求取消安装并断开下载连接，下载线程随即停止"""
+        self.cancel_event.set()
+        self.installer.abort_downloads()
 
     def run(self):
         try:
-            # 模拟安装过程
-            # TODO: 实现实际的安装逻辑
-            for i in range(101):
-                self.progress_updated.emit(i, f"正在安装 {self.model_name}...")
-                self.msleep(100)
-            self.installation_completed.emit(True, "安装完成！")
+            success = self.installer.install_model(
+                self.model_name,
+                self.install_path,
+                self.progress_updated.emit,
+                cancel_event=self.cancel_event,
+                warmup=self.warmup,
+            )
         except Exception as e:
             self.installation_completed.emit(False, f"安装失败: {str(e)}")
+            return
+
+        if success:
+            self.installation_completed.emit(True, f"模型 {self.model_name} 安装成功！")
+        elif self.cancel_event.is_set():
+            self.installation_completed.emit(False, "安装已取消")
+        else:
+            self.installation_completed.emit(False, f"模型 {self.model_name} 安装失败，请查看日志了解详情。")
+
+class EnvironmentCheckThread(QThread):
+    """在后台检查Docker、Ollama和硬件信息，避免阻塞窗口显示"""
+    checked = Signal(dict)
+
+    def __init__(self, installer: ModelInstaller, system_checker: SystemChecker, parent=None):
+        super().__init__(parent)
+        self.installer = installer
+        self.system_checker = system_checker
+
+    def run(self):
+        result = {
+            'docker': self.installer.check_docker(),
+            'ollama': self.installer.check_ollama(),
+        }
+        try:
+            result['system_info'] = self.system_checker.get_snapshot()
+        except Exception as e:
+            result['error'] = str(e)
+        self.checked.emit(result)
 
 class MainWindow(QMainWindow):
     """主窗口类"""
+    config_changed = Signal(dict)
     
     def __init__(self):
         super().__init__()
         self.installer = ModelInstaller()
         self.system_checker = SystemChecker()
         self.config_loader = ConfigLoader()
+        self.install_thread = None
+        self.check_thread = None
+        self.last_logged_message = None
+        self.closing = False
+        
+        # 进度事件按固定帧率合并后再刷新界面
+        self.progress_coalescer = ProgressCoalescer(parent=self)
+        self.progress_coalescer.flushed.connect(self.on_progress_flushed)
+        self.progress_coalescer.start()
         
         self.init_ui()
         
+        # 配置文件修改后自动刷新模型列表，监视线程通过信号转发到界面线程
+        self.config_changed.connect(self.on_config_changed, Qt.QueuedConnection)
+        self.config_watcher = ConfigWatcher(self.config_loader.get_config_path())
+        self.config_watcher.subscribe(self.config_changed.emit)
+        self.config_watcher.start()
+        
     def init_ui(self):
         """初始化用户界面"""
         self.setWindowTitle('Deepseek-R1 安装器')
@@ -71,8 +129,12 @@ class MainWindow(QMainWindow):
         # 添加操作按钮
         self.add_action_buttons(layout)
         
-        # 检查环境
-        self.check_environment()
+        # 加载可用模型
+        self.load_available_models()
+        
+        # 窗口先显示，环境检查在事件循环开始后于后台进行
+        self.install_button.setEnabled(False)
+        QTimer.singleShot(0, self.check_environment)
         
     def add_system_info(self, parent_layout):
         """添加系统信息区域"""
@@ -84,7 +146,7 @@ class MainWindow(QMainWindow):
         group_layout.addWidget(title)
         
         # 系统信息内容
-        self.system_info = QLabel()
+        self.system_info = QLabel('正在检测系统信息...')
         self.system_info.setWordWrap(True)
         group_layout.addWidget(self.system_info)
         
@@ -109,6 +171,10 @@ class MainWindow(QMainWindow):
         self.model_info.setWordWrap(True)
         group_layout.addWidget(self.model_info)
         
+        # 预热会让Ollama加载模型并常驻内存一段时间，默认不开启
+        self.warmup_check = QCheckBox('安装后预热模型（预读文件并让Ollama加载模型，常驻30分钟）')
+        group_layout.addWidget(self.warmup_check)
+        
         parent_layout.addLayout(group_layout)
         
     def add_progress_area(self, parent_layout):
@@ -136,8 +202,7 @@ class MainWindow(QMainWindow):
         group_layout.addWidget(title)
         
         # 日志文本框
-        self.log_text = QTextEdit()
-        self.log_text.setReadOnly(True)
+        self.log_text = LogView()
         self.log_text.setMinimumHeight(150)
         group_layout.addWidget(self.log_text)
         
@@ -157,43 +222,78 @@ class MainWindow(QMainWindow):
         self.uninstall_button.clicked.connect(self.on_uninstall_clicked)
         button_layout.addWidget(self.uninstall_button)
         
+        # 取消按钮，仅在安装过程中可用
+        self.cancel_button = QPushButton('取消')
+        self.cancel_button.setEnabled(False)
+        self.cancel_button.clicked.connect(self.on_cancel_clicked)
+        button_layout.addWidget(self.cancel_button)
+        
         parent_layout.addLayout(button_layout)
         
     def check_environment(self):
-        """检查环境"""
+        """在后台线程中检查环境"""
+        if self.check_thread is not None:
+            return
+        self.check_thread = EnvironmentCheckThread(self.installer, self.system_checker, self)
+        self.check_thread.checked.connect(self.on_environment_checked, Qt.QueuedConnection)
+        self.check_thread.finished.connect(self.check_thread.deleteLater)
+        self.check_thread.start()
+        
+    def on_environment_checked(self, result: dict):
+        """环境检查完成后更新界面"""
+        self.check_thread = None
+        
         # 检查Docker
-        if not self.installer.check_docker():
+        if not result['docker']:
             self.log_message("错误: Docker未运行或未安装")
-            self.install_button.setEnabled(False)
+            self.system_info.setText('')
             return
             
         # 检查Ollama
-        if not self.installer.check_ollama():
+        if not result['ollama']:
             self.log_message("警告: Ollama未安装，将在安装模型时自动安装")
             
         # 更新系统信息
-        self.update_system_info()
+        if 'error' in result:
+            self.log_message(f"获取系统信息失败: {result['error']}")
+        else:
+            self.update_system_info(result['system_info'])
         
-        # 加载可用模型
-        self.load_available_models()
+        if self.install_thread is None:
+            self.install_button.setEnabled(True)
         
-    def update_system_info(self):
+    def update_system_info(self, system_info=None):
         """更新系统信息显示"""
-        system_info = self.system_checker.check_system()
-        
-        info_text = f"""
-操作系统: {system_info['os_info']['system']} {system_info['os_info']['release']}
-CPU: {system_info['cpu_info']['cores']}核 {system_info['cpu_info']['threads']}线程
-内存: 总计 {system_info['memory_info']['total']:.1f}GB, 可用 {system_info['memory_info']['available']:.1f}GB
-"""
+        if system_info is None:
+            system_info = self.system_checker.get_snapshot()
+        
+        info_text = "\n"
+        os_info = system_info.get('os_info')
+        if os_info:
+            info_text += f"操作系统: {os_info['system']} {os_info['release']}\n"
+        cpu_info = system_info.get('cpu_info')
+        if cpu_info:
+            info_text += f"CPU: {cpu_info['cores']}核 {cpu_info['threads']}线程\n"
+        memory_info = system_info.get('memory_info')
+        if memory_info:
+            info_text += f"内存: 总计 {memory_info['total']:.1f}GB, 可用 {memory_info['available']:.1f}GB\n"
 
         # 添加GPU信息
         gpu_info = system_info.get('gpu_info')
         if gpu_info:
-            info_text += f"GPU: {'已检测到 NVIDIA GPU' if gpu_info.get('has_gpu') else '未检测到 NVIDIA GPU'}\n"
-            info_text += f"CUDA: {'已安装' if gpu_info.get('has_cuda') else '未安装'}\n"
+            info_text += f"GPU: {gpu_info['name']} x{gpu_info['count']}, 显存 {gpu_info['total_memory']:.1f}GB\n"
         else:
-            info_text += "GPU: 未检测到 NVIDIA GPU\nCUDA: 未安装\n"
+            info_text += "GPU: 未检测到 NVIDIA GPU\n"
+        cuda_info = system_info.get('cuda_info') or {}
+        info_text += f"CUDA: {'已安装 ' + (cuda_info.get('version') or '') if cuda_info.get('available') else '未安装'}\n"
+        disk_info = system_info.get('disk_info')
+        if disk_info:
+            info_text += f"模型目录所在磁盘: 可用 {disk_info['free']:.1f}GB / 总计 {disk_info['total']:.1f}GB\n"
+
+        # 超时或失败的探测项
+        for name, stats in system_info['probe_stats'].items():
+            if stats['status'] != 'ok':
+                info_text += f"警告: {name} 检测{'超时' if stats['status'] == 'timeout' else '失败'}\n"
 
         self.system_info.setText(info_text)
         
@@ -201,15 +301,26 @@ CPU: {system_info['cpu_info']['cores']}核 {system_info['cpu_info']['threads']}
         """加载可用模型列表"""
         config = self.config_loader.load_config()
         
-        # 清空并添加模型
+        # 清空并添加模型，尽量保留当前选择
+        current = self.model_combo.currentText()
+        self.model_combo.blockSignals(True)
         self.model_combo.clear()
-        for model_name, model_info in config['models'].items():
+        for model_name, model_info in config.get('models', {}).items():
             self.model_combo.addItem(model_name)
+        index = self.model_combo.findText(current)
+        self.model_combo.setCurrentIndex(index if index >= 0 else 0)
+        self.model_combo.blockSignals(False)
+        self.on_model_selected()
+        
+    def on_config_changed(self, config: dict):
+        """配置文件修改后刷新模型列表和模型信息"""
+        self.log_message("配置文件已更新，已重新加载模型列表")
+        self.load_available_models()
             
     def on_model_selected(self):
         """模型选择改变时的处理"""
         model = self.model_combo.currentText()
-        model_info = self.config_loader.load_config()['models'].get(model, {})
+        model_info = self.config_loader.get_available_models().get(model, {})
         
         info_text = f"""
         GPU内存要求: {model_info.get('gpu_memory', 'N/A')} GB
@@ -229,22 +340,43 @@ CPU: {system_info['cpu_info']['cores']}核 {system_info['cpu_info']['threads']}
         self.install_button.setEnabled(False)
         self.uninstall_button.setEnabled(False)
         
-        # 开始安装
-        install_path = os.path.expanduser("~/ollama/models")
-        success = self.installer.install_model(
-            model_name, 
-            install_path,
-            self.on_progress_update
-        )
+        self.cancel_button.setEnabled(True)
+        
+        # 在后台线程中安装，信号排队到界面线程处理
+        install_path = self.system_checker.disk_path
+        self.install_thread = InstallationThread(self.installer, model_name, install_path, self,
+                                                 warmup=self.warmup_check.isChecked())
+        # 进度直接写入合并器（线程安全），不为每个事件排队一次界面更新
+        self.install_thread.progress_updated.connect(self.progress_coalescer.submit_progress, Qt.DirectConnection)
+        self.install_thread.installation_completed.connect(self.on_installation_completed, Qt.QueuedConnection)
+        self.install_thread.finished.connect(self.install_thread.deleteLater)
+        self.install_thread.start()
+        
+    def on_cancel_clicked(self):
+        """取消按钮点击处理"""
+        if self.install_thread is not None and self.install_thread.isRunning():
+            self.cancel_button.setEnabled(False)
+            self.log_message("正在取消安装...")
+            self.install_thread.cancel()
+            
+    def on_installation_completed(self, success: bool, message: str):
+        """安装线程结束后的处理"""
+        cancelled = self.install_thread is not None and self.install_thread.cancel_event.is_set()
+        self.install_thread = None
+        self.progress_coalescer.flush()
         
         # 恢复按钮
         self.install_button.setEnabled(True)
         self.uninstall_button.setEnabled(True)
+        self.cancel_button.setEnabled(False)
         
+        self.log_message(message)
+        if self.closing:
+            return
         if success:
-            QMessageBox.information(self, "安装成功", f"模型 {model_name} 安装成功！")
-        else:
-            QMessageBox.critical(self, "安装失败", f"模型 {model_name} 安装失败，请查看日志了解详情。")
+            QMessageBox.information(self, "安装成功", message)
+        elif not cancelled:
+            QMessageBox.critical(self, "安装失败", message)
             
     def on_uninstall_clicked(self):
         """卸载按钮点击处理"""
@@ -278,13 +410,39 @@ CPU: {system_info['cpu_info']['cores']}核 {system_info['cpu_info']['threads']}
             
     def on_progress_update(self, progress: int, message: str):
         """进度更新回调"""
-        self.progress_bar.setValue(progress)
-        self.progress_label.setText(message)
-        self.log_message(message)
+        self.progress_coalescer.submit_progress(progress, message)
+        
+    def on_progress_flushed(self, values: dict):
+        """每帧最多刷新一次进度条和进度信息"""
+        if 'progress' in values:
+            self.progress_bar.setValue(values['progress'])
+        message = values.get('message')
+        if message is not None:
+            self.progress_label.setText(message)
+            if message != self.last_logged_message:
+                self.last_logged_message = message
+                self.log_message(message)
         
     def log_message(self, message: str):
         """添加日志消息"""
-        self.log_text.append(message)
+        self.log_text.append_line(message)
+        
+    def closeEvent(self, event):
+        """关闭窗口时取消正在进行的安装，后台线程全部退出后再关闭"""
+        running = [thread for thread in self.findChildren(QThread) if thread.isRunning()]
+        if running:
+            if not self.closing:
+                self.closing = True
+                if self.install_thread is not None:
+                    self.log_message("正在取消安装，完成后关闭窗口...")
+                    self.install_thread.cancel()
+                # 每个线程结束时再次尝试关闭，直到没有运行中的线程
+                for thread in running:
+                    thread.finished.connect(self.close, Qt.QueuedConnection)
+            event.ignore()
+            return
+        self.config_watcher.stop()
+        super().closeEvent(event)
 
 def main():
     app = QApplication(sys.argv)
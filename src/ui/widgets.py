@@ -0,0 +1,97 @@
+import threading
+from collections import deque
+from typing import Any, Dict
+
+from PySide6.QtCore import QObject, QTimer, Signal
+from PySide6.QtWidgets import QPlainTextEdit
+
+
+class ProgressCoalescer(QObject):
+    """把高频进度事件合并为固定频率的界面刷新
+
+    submit 可以在任意线程中调用，只记录每个键的最新值；界面线程中的
+    定时器按 fps 取出待刷新的值并发出一次 flushed 信号。
+    """
+
+    flushed = Signal(dict)
+
+    def __init__(self, fps: int = 30, parent=None):
+        super().__init__(parent)
+        self._pending: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.flushes = 0
+        self._timer = QTimer(self)
+        self._timer.setInterval(max(1, 1000 // fps))
+        self._timer.timeout.connect(self.flush)
+
+    def start(self) -> None:
+        self._timer.start()
+
+    def stop(self) -> None:
+        """停止定时刷新，并立即刷新剩余的值"""
+        self._timer.stop()
+        self.flush()
+
+    def submit(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._pending[key] = value
+            self.submitted += 1
+
+    def submit_progress(self, progress: int, message: str) -> None:
+        """与 progress_callback 签名相同，便于直接连接安装线程的信号"""
+        with self._lock:
+            self._pending['progress'] = progress
+            self._pending['message'] = message
+            self.submitted += 1
+
+    def flush(self) -> None:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if pending:
+            self.flushes += 1
+            self.flushed.emit(pending)
+
+
+class LogView(QPlainTextEdit):
+    """行数有上限的日志视图
+
+    新日志先写入定长队列，由定时器批量追加到文档；QPlainTextEdit 只
+    布局可见的文本块，setMaximumBlockCount 让最旧的行自动淘汰。
+    """
+
+    def __init__(self, max_lines: int = 5000, flush_interval_ms: int = 100, parent=None):
+        super().__init__(parent)
+        self.setReadOnly(True)
+        self.setMaximumBlockCount(max_lines)
+        self.max_lines = max_lines
+        self._pending = deque(maxlen=max_lines)
+        self._lock = threading.Lock()
+        self._timer = QTimer(self)
+        self._timer.setInterval(flush_interval_ms)
+        self._timer.timeout.connect(self.flush)
+        self._timer.start()
+
+    def append_line(self, message: str) -> None:
+        """追加一行日志，可以在任意线程中调用"""
+        with self._lock:
+            self._pending.append(message)
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._pending:
+                return
+            lines = list(self._pending)
+            self._pending.clear()
+
+        # 只有用户停留在底部时才自动滚动
+        scrollbar = self.verticalScrollBar()
+        at_bottom = scrollbar.value() >= scrollbar.maximum() - 2
+        self.appendPlainText("\n".join(lines))
+        if at_bottom:
+            scrollbar.setValue(scrollbar.maximum())
+
+    def lines(self) -> list:
+        """当前保留的全部日志行（包括尚未刷新的）"""
+        self.flush()
+        return self.toPlainText().split("\n") if self.document().characterCount() > 1 else []
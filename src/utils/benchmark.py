@@ -0,0 +1,442 @@
+import json
+import math
+import time
+import socket
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+import psutil
+
+from .config_cache import default_cache_dir
+from .model_catalog import parse_tag
+from .ollama_client import OllamaClient, OllamaError
+
+if TYPE_CHECKING:
+    from .gpu_telemetry import GpuTelemetry
+
+logger = logging.getLogger(__name__)
+
+NS = 1e9
+
+# 默认提示集：短问答、推理和较长的生成，覆盖不同的输入输出长度
+DEFAULT_PROMPTS = (
+    "用一句话解释什么是向量数据库。",
+    "一个水池有进水管和出水管，进水管6小时注满，出水管8小时放空，同时打开多久注满？请逐步推理。",
+    "Write a Python function that merges two sorted lists, and explain its time complexity.",
+    "请写一段约200字的说明，介绍在本地部署大语言模型时需要注意的硬件因素。",
+)
+
+
+def load_prompts(path: str) -> List[str]:
+    """读取提示集：每行一个提示的文本文件，或字符串列表的JSON/YAML文件"""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    if path.endswith(('.json', '.yaml', '.yml')):
+        import yaml
+        data = yaml.safe_load(text)
+        prompts = data.get('prompts', []) if isinstance(data, dict) else data
+    else:
+        prompts = text.splitlines()
+    prompts = [str(p).strip() for p in prompts or [] if str(p).strip()]
+    if not prompts:
+        raise ValueError(f"提示集 {path} 为空")
+    return prompts
+
+
+def hardware_class(snapshot: Dict[str, Any]) -> str:
+    """按GPU型号、显存和内存把主机归类，同类主机的测试结果可以直接比较"""
+    gpu_info = snapshot.get('gpu_info') or {}
+    memory_info = snapshot.get('memory_info') or {}
+    ram = f"RAM {memory_info.get('total', 0):.0f}GB"
+    if not gpu_info:
+        return f"CPU / {ram}"
+    count = gpu_info.get('count', 1)
+    name = gpu_info.get('name', 'GPU')
+    return f"{name}{f' x{count}' if count > 1 else ''} {gpu_info.get('total_memory', 0):.0f}GB / {ram}"
+
+
+def _percentile(values: Sequence[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * q / 100), len(ordered) - 1)]
+
+
+class RequestSample:
+    """单次生成请求的计时"""
+
+    __slots__ = ('ttft', 'duration', 'tokens', 'eval_duration', 'load_duration', 'error')
+
+    def __init__(self):
+        self.ttft: Optional[float] = None       # 客户端观察到的首个token时间（秒）
+        self.duration = 0.0
+        self.tokens = 0
+        self.eval_duration: Optional[float] = None  # 服务端解码耗时（秒）
+        self.load_duration: Optional[float] = None  # 服务端加载模型耗时（秒）
+        self.error: Optional[str] = None
+
+    @property
+    def tokens_per_s(self) -> Optional[float]:
+        """解码速度，优先使用服务端计时，不含排队和首token延迟"""
+        if self.eval_duration:
+            return self.tokens / self.eval_duration
+        if self.ttft is not None and self.tokens > 1 and self.duration > self.ttft:
+            return (self.tokens - 1) / (self.duration - self.ttft)
+        return None
+
+
+def gpu_memory_used(sample) -> Optional[int]:
+    """一次GPU采样中所有GPU已用显存之和（字节），没有读数时返回None"""
+    from .gpu_telemetry import FIELDS
+    used = [v for v in sample[:, FIELDS.index('memory_used')].tolist() if not math.isnan(v)]
+    return int(sum(used) * 1024 ** 2) if used else None
+
+
+class MemorySampler:
+    """测试期间采样Ollama进程的常驻内存和 /api/ps 报告的模型显存，记录峰值
+
+    服务在远程主机上时无法读取进程内存，只记录显存。在本机测试且传入
+    GpuTelemetry 时订阅其采样流，显存峰值取GPU实际已用显存减去 gpu_baseline
+    （加载模型前所有GPU上已用的显存，包括其他进程），并记录GPU利用率；
+    没有收到GPU采样时退回 /api/ps 的 size_vram。
+    """
+
+    def __init__(self, client: OllamaClient, model_name: str, interval: float = 0.25,
+                 telemetry: Optional['GpuTelemetry'] = None, gpu_baseline: int = 0):
+        self.client = client
+        self.model_name = model_name
+        self.interval = interval
+        self.local = client.is_local
+        self.telemetry = telemetry if self.local else None
+        self.gpu_baseline = gpu_baseline
+        self.peak_rss = 0
+        self.peak_model_size = 0
+        self.peak_vram = 0
+        self.peak_gpu_memory = 0
+        self.gpu_memory_samples = 0
+        self.gpu_samples = 0
+        self.gpu_util_sum = 0.0
+        self.gpu_util_max: Optional[float] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._unsubscribe: Optional[Callable[[], None]] = None
+
+    def _on_gpu_sample(self, timestamp: float, sample) -> None:
+        """GpuTelemetry 的订阅回调：各GPU已用显存之和相对基线的增量和平均利用率"""
+        from .gpu_telemetry import FIELDS
+        used = gpu_memory_used(sample)
+        utilization = [v for v in sample[:, FIELDS.index('utilization')].tolist() if not math.isnan(v)]
+        if used is not None:
+            self.gpu_memory_samples += 1
+            self.peak_gpu_memory = max(self.peak_gpu_memory, used - self.gpu_baseline)
+        if utilization:
+            average = sum(utilization) / len(utilization)
+            self.gpu_samples += 1
+            self.gpu_util_sum += average
+            self.gpu_util_max = average if self.gpu_util_max is None else max(self.gpu_util_max, average)
+
+    @property
+    def vram_peak(self) -> int:
+        return self.peak_gpu_memory if self.gpu_memory_samples else self.peak_vram
+
+    @property
+    def vram_source(self) -> Optional[str]:
+        if self.gpu_memory_samples:
+            return 'nvidia-smi'
+        return 'api/ps' if self.peak_vram else None
+
+    @property
+    def gpu_util_avg(self) -> Optional[float]:
+        return self.gpu_util_sum / self.gpu_samples if self.gpu_samples else None
+
+    def sample(self) -> None:
+        if self.local:
+            rss = 0
+            for process in psutil.process_iter(['name', 'memory_info']):
+                name = process.info.get('name') or ''
+                memory = process.info.get('memory_info')
+                if name.lower().startswith('ollama') and memory is not None:
+                    rss += memory.rss
+            self.peak_rss = max(self.peak_rss, rss)
+        try:
+            for model in self.client.running_models():
+                if model.get('name') == self.model_name or model.get('model') == self.model_name:
+                    self.peak_model_size = max(self.peak_model_size, int(model.get('size') or 0))
+                    self.peak_vram = max(self.peak_vram, int(model.get('size_vram') or 0))
+        except OllamaError:
+            pass
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def start(self) -> 'MemorySampler':
+        if self.telemetry is not None:
+            self._unsubscribe = self.telemetry.subscribe(self._on_gpu_sample)
+        self.sample()
+        self._thread = threading.Thread(target=self._loop, name="bench-memory", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        if self._unsubscribe is not None:
+            self._unsubscribe()
+            self._unsubscribe = None
+        self.sample()
+
+
+class BenchmarkRunner:
+    """对已安装的模型测试冷启动加载时间、首token延迟、解码速度和峰值内存
+
+    每个模型先卸载再发送第一个提示，测得冷启动；之后在每个并发级别下
+    把提示集按并发数重复发送，统计每个请求的延迟和总吞吐量。
+    telemetry 为已启动的 GpuTelemetry 时，本机测试的显存峰值和GPU利用率取自它。
+    """
+
+    def __init__(self, client: Optional[OllamaClient] = None, prompts: Optional[Sequence[str]] = None,
+                 concurrency: Sequence[int] = (1,), num_predict: int = 128,
+                 memory_interval: float = 0.25,
+                 progress_callback: Optional[Callable[[int, str], None]] = None,
+                 cancel_event: Optional[threading.Event] = None,
+                 telemetry: Optional['GpuTelemetry'] = None):
+        self.client = client or OllamaClient()
+        self.prompts = list(prompts or DEFAULT_PROMPTS)
+        self.concurrency = sorted(set(int(c) for c in concurrency if int(c) > 0)) or [1]
+        self.num_predict = num_predict
+        self.memory_interval = memory_interval
+        self.progress_callback = progress_callback
+        self.cancel_event = cancel_event
+        self.telemetry = telemetry
+
+    def _cancelled(self) -> bool:
+        return self.cancel_event is not None and self.cancel_event.is_set()
+
+    def _generate(self, model_name: str, prompt: str) -> RequestSample:
+        sample = RequestSample()
+        started = time.monotonic()
+        try:
+            for event in self.client.generate(model_name, prompt,
+                                              options={'num_predict': self.num_predict, 'temperature': 0}):
+                if event.get('error'):
+                    raise OllamaError(event['error'])
+                if sample.ttft is None and event.get('response'):
+                    sample.ttft = time.monotonic() - started
+                if not event.get('done'):
+                    sample.tokens += 1
+                    continue
+                if event.get('eval_count') is not None:
+                    sample.tokens = event['eval_count']
+                if event.get('eval_duration'):
+                    sample.eval_duration = event['eval_duration'] / NS
+                if event.get('load_duration') is not None:
+                    sample.load_duration = event['load_duration'] / NS
+        except OllamaError as e:
+            sample.error = str(e)
+        sample.duration = time.monotonic() - started
+        return sample
+
+    def _report(self, percent: int, message: str) -> None:
+        logger.info(message)
+        if self.progress_callback:
+            self.progress_callback(percent, message)
+
+    def _gpu_baseline(self) -> Optional[int]:
+        """模型卸载后、冷启动前所有GPU已用的显存，峰值显存减去它得到模型本身的占用"""
+        if self.telemetry is None or not self.client.is_local:
+            return None
+        latest = self.telemetry.latest()
+        return gpu_memory_used(latest[1]) if latest is not None else None
+
+    def run_model(self, model_name: str, base_record: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """测试单个模型，每个并发级别返回一条记录"""
+        base = dict(base_record or {}, model=model_name, num_predict=self.num_predict,
+                    prompts=len(self.prompts))
+
+        # 冷启动：先卸载，再计时第一个请求
+        try:
+            self.client.unload(model_name)
+        except OllamaError as e:
+            logger.warning(f"卸载模型 {model_name} 失败，冷启动时间可能偏小: {str(e)}")
+        gpu_baseline = self._gpu_baseline()
+        cold_started = time.monotonic()
+        cold = self._generate(model_name, self.prompts[0])
+        if cold.error:
+            return [dict(base, concurrency=level, requests=1, errors=1, error=cold.error)
+                    for level in self.concurrency]
+        cold_wall = time.monotonic() - cold_started
+        cold_load = cold.load_duration if cold.load_duration is not None else cold.ttft
+
+        records = []
+        for level in self.concurrency:
+            if self._cancelled():
+                break
+            jobs = [prompt for prompt in self.prompts for _ in range(level)]
+            sampler = MemorySampler(self.client, model_name, self.memory_interval, self.telemetry,
+                                    gpu_baseline or 0).start()
+            started = time.monotonic()
+            try:
+                with ThreadPoolExecutor(max_workers=level) as pool:
+                    samples = list(pool.map(lambda prompt: self._generate(model_name, prompt), jobs))
+            finally:
+                sampler.stop()
+            wall = time.monotonic() - started
+
+            ok = [s for s in samples if s.error is None]
+            ttfts = [s.ttft for s in ok if s.ttft is not None]
+            rates = [s.tokens_per_s for s in ok if s.tokens_per_s is not None]
+            record = dict(
+                base,
+                concurrency=level,
+                requests=len(samples),
+                errors=len(samples) - len(ok),
+                cold_load_s=round(cold_load, 3) if cold_load is not None else None,
+                cold_first_token_s=round(cold.ttft if cold.ttft is not None else cold_wall, 3),
+                ttft_p50_s=_round(_percentile(ttfts, 50)),
+                ttft_p95_s=_round(_percentile(ttfts, 95)),
+                tokens_per_s=_round(_percentile(rates, 50)),
+                throughput_tokens_per_s=_round(sum(s.tokens for s in ok) / wall if wall > 0 else None),
+                peak_rss_bytes=sampler.peak_rss or None,
+                peak_model_bytes=sampler.peak_model_size or None,
+                peak_vram_bytes=sampler.vram_peak or None,
+                vram_source=sampler.vram_source,
+                vram_baseline_bytes=gpu_baseline if sampler.gpu_memory_samples else None,
+                gpu_util_avg=_round(sampler.gpu_util_avg, 1),
+                gpu_util_max=_round(sampler.gpu_util_max, 1),
+                wall_s=round(wall, 3),
+            )
+            if len(ok) < len(samples):
+                record['error'] = next(s.error for s in samples if s.error)
+            records.append(record)
+        return records
+
+    def run(self, model_names: Iterable[str], snapshot: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """依次测试各模型；snapshot 为 SystemChecker 的系统信息，用于按硬件分类"""
+        model_names = list(model_names)
+        base = {
+            'timestamp': time.time(),
+            'host': socket.gethostname(),
+            'server': self.client.host,
+            'ollama_version': self.client.version(),
+        }
+        if snapshot is not None:
+            base['hardware_class'] = hardware_class(snapshot)
+        records = []
+        for index, name in enumerate(model_names):
+            if self._cancelled():
+                break
+            self._report(int(100 * index / max(len(model_names), 1)), f"正在测试模型 {name}...")
+            records.extend(self.run_model(name, base))
+        self._report(100, f"测试完成，共 {len(records)} 条结果")
+        return records
+
+
+def _round(value: Optional[float], digits: int = 3) -> Optional[float]:
+    return round(value, digits) if value is not None else None
+
+
+class BenchmarkHistory:
+    """测试结果历史，每行一条JSON记录，追加写入"""
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else default_cache_dir() / 'benchmarks.jsonl'
+
+    def append(self, records: Iterable[Dict[str, Any]]) -> None:
+        lines = ''.join(json.dumps(record, ensure_ascii=False) + '\n' for record in records)
+        if not lines:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+
+    def load(self, model_name: Optional[str] = None, hardware: Optional[str] = None) -> List[Dict[str, Any]]:
+        records = []
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue
+                    if model_name and record.get('model') != model_name:
+                        continue
+                    if hardware and record.get('hardware_class') != hardware:
+                        continue
+                    records.append(record)
+        except FileNotFoundError:
+            pass
+        return records
+
+
+def latest_records(records: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """每个 (硬件分类, 模型, 并发数) 只保留最新的一条"""
+    latest: Dict[tuple, Dict[str, Any]] = {}
+    for record in records:
+        key = (record.get('hardware_class') or record.get('host'), record.get('model'), record.get('concurrency'))
+        if key not in latest or record.get('timestamp', 0) >= latest[key].get('timestamp', 0):
+            latest[key] = record
+    return list(latest.values())
+
+
+def recommend(records: Iterable[Dict[str, Any]], min_tokens_per_s: float = 10.0,
+              max_ttft_s: float = 2.0) -> Dict[str, Optional[str]]:
+    """每个硬件分类中，单并发下速度和首token延迟都达标的最大模型"""
+    best: Dict[str, Optional[Dict[str, Any]]] = {}
+    for record in latest_records(records):
+        group = record.get('hardware_class') or record.get('host')
+        best.setdefault(group, None)
+        if record.get('concurrency') != 1 or record.get('errors'):
+            continue
+        if (record.get('tokens_per_s') or 0) < min_tokens_per_s:
+            continue
+        if record.get('ttft_p50_s') is None or record['ttft_p50_s'] > max_ttft_s:
+            continue
+        current = best[group]
+        size = (parse_tag(record['model'])[1] or 0, record.get('tokens_per_s') or 0)
+        if current is None or size > (parse_tag(current['model'])[1] or 0, current.get('tokens_per_s') or 0):
+            best[group] = record
+    return {group: record['model'] if record else None for group, record in best.items()}
+
+
+def _fmt(value: Optional[float], spec: str = '.2f') -> str:
+    return format(value, spec) if value is not None else '-'
+
+
+def compare_report(records: Iterable[Dict[str, Any]], min_tokens_per_s: float = 10.0,
+                   max_ttft_s: float = 2.0) -> str:
+    """按硬件分类对比各模型最新的测试结果，并给出推荐"""
+    records = latest_records(records)
+    if not records:
+        return "没有测试记录"
+    groups: Dict[str, List[Dict[str, Any]]] = {}
+    for record in records:
+        groups.setdefault(record.get('hardware_class') or record.get('host'), []).append(record)
+    recommended = recommend(records, min_tokens_per_s, max_ttft_s)
+
+    header = (f"{'模型':<24}{'并发':>5}{'冷启动s':>9}{'首token p50':>12}{'p95':>8}"
+              f"{'tok/s':>8}{'总tok/s':>9}{'峰值内存GB':>11}{'显存GB':>8}{'错误':>5}")
+    lines = []
+    for group in sorted(groups):
+        lines.append(f"== {group} ==")
+        lines.append(header)
+        rows = sorted(groups[group], key=lambda r: (parse_tag(r['model'])[1] or 0, r['model'], r['concurrency']))
+        for r in rows:
+            memory = r.get('peak_rss_bytes') or r.get('peak_model_bytes')
+            lines.append(
+                f"{r['model']:<24}{r['concurrency']:>5}{_fmt(r.get('cold_load_s')):>9}"
+                f"{_fmt(r.get('ttft_p50_s')):>12}{_fmt(r.get('ttft_p95_s')):>8}"
+                f"{_fmt(r.get('tokens_per_s'), '.1f'):>8}{_fmt(r.get('throughput_tokens_per_s'), '.1f'):>9}"
+                f"{_fmt(memory / 1024 ** 3 if memory else None, '.1f'):>11}"
+                f"{_fmt(r['peak_vram_bytes'] / 1024 ** 3 if r.get('peak_vram_bytes') else None, '.1f'):>8}"
+                f"{r.get('errors', 0):>5}")
+        choice = recommended.get(group)
+        lines.append(f"推荐: {choice}" if choice else
+                     f"推荐: 无（没有模型达到 {min_tokens_per_s:g} tok/s 且首token不超过 {max_ttft_s:g}s）")
+        lines.append("")
+    return '\n'.join(lines).rstrip() + '\n'
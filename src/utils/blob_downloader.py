@@ -0,0 +1,417 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .disk_preflight import DEFAULT_MARGIN, DiskPreflight, InsufficientDiskSpace, allocate_file
+from .ollama_pull import PullProgress, format_bytes
+from .registry import ModelRef, RegistryClient, RegistryError, manifest_blobs
+from .model_store import ModelStore
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 64 * 1024 * 1024
+READ_SIZE = 1024 * 1024
+_CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+|\*)$')
+
+
+class BlobDownloadError(Exception):
+    """blob下载或校验失败"""
+
+
+class BlobDownloadCancelled(BlobDownloadError):
+    """下载被用户取消，已完成的分块保留用于续传"""
+
+
+class _ChunkFailed(BlobDownloadError):
+    """重试也不会成功的分块错误"""
+
+
+class ChunkBitmap:
+    """记录分块完成情况，保存在 <blob>-partial.chunks 中用于断点续传"""
+
+    def __init__(self, path: Path, digest: str, size: int, chunk_size: int):
+        self.path = path
+        self.digest = digest
+        self.size = size
+        self.chunk_size = chunk_size
+        self.count = max(1, (size + chunk_size - 1) // chunk_size)
+        self.bits = bytearray((self.count + 7) // 8)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path: Path, digest: str, size: int, chunk_size: int) -> 'ChunkBitmap':
+        """读取位图，参数不一致或文件损坏时返回空位图"""
+        bitmap = cls(path, digest, size, chunk_size)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if (data.get('digest'), data.get('size'), data.get('chunk_size')) == (digest, size, chunk_size):
+                bits = bytes.fromhex(data['bitmap'])
+                if len(bits) == len(bitmap.bits):
+                    bitmap.bits[:] = bits
+        except (OSError, ValueError, KeyError):
+            pass
+        return bitmap
+
+    def is_done(self, index: int) -> bool:
+        return bool(self.bits[index >> 3] & (1 << (index & 7)))
+
+    def mark_done(self, index: int) -> None:
+        """标记分块完成并立即持久化"""
+        with self._lock:
+            self.bits[index >> 3] |= 1 << (index & 7)
+            self.save()
+
+    def chunk_range(self, index: int) -> Tuple[int, int]:
+        """分块的 [start, end) 字节范围"""
+        start = index * self.chunk_size
+        return start, min(start + self.chunk_size, self.size)
+
+    @property
+    def pending(self) -> List[int]:
+        return [i for i in range(self.count) if not self.is_done(i)]
+
+    @property
+    def done_bytes(self) -> int:
+        return sum(self.chunk_range(i)[1] - self.chunk_range(i)[0]
+                   for i in range(self.count) if self.is_done(i))
+
+    def save(self) -> None:
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'digest': self.digest,
+                'size': self.size,
+                'chunk_size': self.chunk_size,
+                'bitmap': self.bits.hex(),
+            }, f)
+        os.replace(tmp_path, self.path)
+
+    def remove(self) -> None:
+        try:
+            self.path.unlink()
+        except FileNotFoundError:
+            pass
+
+
+class _StreamingHasher:
+    """边下载边计算SHA-256
+
+    SHA-256只能按顺序计算。正在下载哈希游标所在分块的线程直接把数据
+    喂给哈希；其他分块先写入文件，游标推进到它们时再从页缓存读回。
+    续传时已完成的前缀同样从文件读回一次。
+    """
+
+    def __init__(self, path: Path, bitmap: ChunkBitmap):
+        self.bitmap = bitmap
+        self.hasher = hashlib.sha256()
+        self.position = 0
+        self.chunk = 0
+        self._done = set(i for i in range(bitmap.count) if bitmap.is_done(i))
+        self._lock = threading.Lock()
+        # 不使用缓冲，避免seek后读到缓冲区里尚未写入时的旧数据
+        self._file = open(path, 'rb', buffering=0)
+        with self._lock:
+            self._advance()
+
+    def _catch_up(self, end: int) -> None:
+        """从文件读取 [position, end) 并计算哈希"""
+        self._file.seek(self.position)
+        while self.position < end:
+            data = self._file.read(min(READ_SIZE, end - self.position))
+            if not data:
+                raise BlobDownloadError("读取部分下载文件时遇到意外的文件结尾")
+            self.hasher.update(data)
+            self.position += len(data)
+
+    def _advance(self) -> None:
+        while self.chunk in self._done:
+            self._catch_up(self.bitmap.chunk_range(self.chunk)[1])
+            self.chunk += 1
+
+    def feed(self, offset: int, data: bytes) -> None:
+        """数据已写入文件后调用"""
+        with self._lock:
+            start, end = self.bitmap.chunk_range(self.chunk) if self.chunk < self.bitmap.count else (0, 0)
+            if not start <= offset < end:
+                return
+            if offset > self.position:
+                self._catch_up(offset)
+            if offset == self.position:
+                self.hasher.update(data)
+                self.position += len(data)
+
+    def chunk_done(self, index: int) -> None:
+        with self._lock:
+            self._done.add(index)
+            self._advance()
+
+    def hexdigest(self) -> str:
+        with self._lock:
+            if self.position != self.bitmap.size:
+                raise BlobDownloadError(f"哈希未覆盖完整文件: {self.position}/{self.bitmap.size}")
+            return self.hasher.hexdigest()
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class BlobDownloader:
+    """从模型仓库直接下载blob，按Range分块并行下载，支持断点续传"""
+
+    def __init__(self, registry: Optional[RegistryClient] = None, store: Optional[ModelStore] = None,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, max_workers: int = 4,
+                 max_retries: int = 5, retry_delay: float = 1.0, read_timeout: float = 60.0,
+                 reserve_margin: int = DEFAULT_MARGIN):
+        self.registry = registry or RegistryClient()
+        self.store = store or ModelStore()
+        self.chunk_size = chunk_size
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.read_timeout = read_timeout
+        self.reserve_margin = reserve_margin
+
+    def _fetch_chunk(self, url: str, path: Path, index: int, bitmap: ChunkBitmap,
+                     hasher: _StreamingHasher, on_bytes: Callable[[int], None],
+                     cancel_event: Optional[threading.Event] = None,
+                     on_chunk: Optional[Callable[[int, int], None]] = None,
+                     abort: Optional[threading.Event] = None) -> None:
+        """下载单个分块，失败时从已写入的位置继续重试
+
+        abort 由同一blob的其他分块在彻底失败时设置，本分块随即停止，不再重试。
+        """
+        start, end = bitmap.chunk_range(index)
+        position = start
+        attempt = 0
+        with open(path, 'r+b', buffering=0) as f:
+            while position < end:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise BlobDownloadCancelled(f"分块 {index} 下载已取消")
+                if abort is not None and abort.is_set():
+                    raise BlobDownloadError(f"分块 {index} 已停止: 其他分块下载失败")
+                try:
+                    headers = {"Range": f"bytes={position}-{end - 1}"}
+                    with self.registry.session.get(url, headers=headers, stream=True,
+                                                   timeout=(10, self.read_timeout)) as response:
+                        if 400 <= response.status_code < 500 and response.status_code not in (408, 416, 429):
+                            # 权限不足或blob不存在，重试也不会成功
+                            raise _ChunkFailed(f"分块 {index} 下载失败: HTTP {response.status_code}")
+                        if response.status_code != 206:
+                            raise BlobDownloadError(f"服务器不支持Range请求: HTTP {response.status_code}")
+                        # 代理可能忽略或改写Range，确认返回的区间从请求的位置开始
+                        match = _CONTENT_RANGE.match(response.headers.get('Content-Range', '').strip())
+                        if not match or int(match.group(1)) != position or int(match.group(2)) < position:
+                            raise BlobDownloadError(
+                                f"返回的区间与请求不符: 请求 {position}-{end - 1}, "
+                                f"Content-Range: {response.headers.get('Content-Range')}")
+                        limit = min(end, int(match.group(2)) + 1)
+                        for data in response.iter_content(READ_SIZE):
+                            if cancel_event is not None and cancel_event.is_set():
+                                raise BlobDownloadCancelled(f"分块 {index} 下载已取消")
+                            if abort is not None and abort.is_set():
+                                raise BlobDownloadError(f"分块 {index} 已停止: 其他分块下载失败")
+                            data = data[:limit - position]
+                            if not data:
+                                break
+                            f.seek(position)
+                            f.write(data)
+                            hasher.feed(position, data)
+                            position += len(data)
+                            on_bytes(len(data))
+                    if position < end:
+                        raise BlobDownloadError(f"分块 {index} 数据不完整: {position - start}/{end - start}")
+                except (BlobDownloadCancelled, _ChunkFailed):
+                    raise
+                except (requests.RequestException, BlobDownloadError) as e:
+                    attempt += 1
+                    if attempt > self.max_retries or (abort is not None and abort.is_set()):
+                        raise BlobDownloadError(f"分块 {index} 下载失败: {str(e)}") from e
+                    logger.warning(f"分块 {index} 下载出错，第 {attempt} 次重试: {str(e)}")
+                    delay = self.retry_delay * 2 ** (attempt - 1)
+                    if abort is None:
+                        time.sleep(delay)
+                    elif abort.wait(delay):
+                        raise BlobDownloadError(f"分块 {index} 已停止: 其他分块下载失败") from e
+
+        bitmap.mark_done(index)
+        hasher.chunk_done(index)
+        if on_chunk:
+            on_chunk(start, end)
+
+    def _prepare_partial(self, digest: str, size: int) -> Tuple[Path, ChunkBitmap, bool]:
+        """创建或复用部分下载文件并预分配空间，返回 (路径, 位图, 是否新建)"""
+        self.store.ensure_dirs()
+        partial_path = self.store.partial_path(digest)
+        bitmap = ChunkBitmap.load(partial_path.with_name(partial_path.name + ".chunks"),
+                                  digest, size, self.chunk_size)
+        created = not partial_path.exists() or partial_path.stat().st_size != size
+        if created:
+            bitmap.bits[:] = bytes(len(bitmap.bits))
+            with open(partial_path, 'wb'):
+                pass
+        try:
+            allocate_file(partial_path, size)
+        except InsufficientDiskSpace:
+            if created:
+                partial_path.unlink()
+                bitmap.remove()
+            raise
+        bitmap.save()
+        return partial_path, bitmap, created
+
+    def reserve(self, blobs: List[Tuple[str, int]]) -> List[Tuple[str, int]]:
+        """下载前为所有缺少的blob预分配空间，返回本次新预留的blob
+
+        空间不足时删除本次新建的文件并抛出 InsufficientDiskSpace，不会在下载了
+        大部分数据之后才失败。
+        """
+        created = []
+        try:
+            for digest, size in blobs:
+                if self.store.has_blob(digest, size):
+                    continue
+                if self._prepare_partial(digest, size)[2]:
+                    created.append((digest, size))
+        except InsufficientDiskSpace:
+            self.release(created)
+            raise
+        return created
+
+    def release(self, blobs: List[Tuple[str, int]]) -> None:
+        """删除没有已完成分块的预留文件"""
+        for digest, size in blobs:
+            partial_path = self.store.partial_path(digest)
+            bitmap = ChunkBitmap.load(partial_path.with_name(partial_path.name + ".chunks"),
+                                      digest, size, self.chunk_size)
+            if bitmap.done_bytes == 0 and partial_path.exists():
+                partial_path.unlink()
+                bitmap.remove()
+
+    def download_blob(self, ref: ModelRef, digest: str, size: int,
+                      on_bytes: Optional[Callable[[int], None]] = None,
+                      cancel_event: Optional[threading.Event] = None,
+                      on_chunk: Optional[Callable[[int, int], None]] = None) -> Path:
+        """下载并校验单个blob，已存在时直接返回
+
+        cancel_event 被设置后各分块在下一次读取时停止，抛出 BlobDownloadCancelled。
+        on_chunk(start, end) 在每个分块写入部分下载文件后调用（包括续传前已完成的分块），
+        供镜像在下载完成前就把已到达的数据转发给客户端。
+        """
+        on_bytes = on_bytes or (lambda n: None)
+        final_path = self.store.blob_path(digest)
+        if self.store.has_blob(digest, size):
+            on_bytes(size)
+            return final_path
+
+        partial_path, bitmap, _ = self._prepare_partial(digest, size)
+
+        if on_chunk:
+            for index in range(bitmap.count):
+                if bitmap.is_done(index):
+                    on_chunk(*bitmap.chunk_range(index))
+        resumed = bitmap.done_bytes
+        if resumed:
+            logger.info(f"续传 {digest[:19]}: 已完成 {format_bytes(resumed)}/{format_bytes(size)}")
+            on_bytes(resumed)
+
+        hasher = _StreamingHasher(partial_path, bitmap)
+        url = self.registry.blob_url(ref, digest)
+        try:
+            pending = bitmap.pending
+            if pending:
+                abort = threading.Event()
+                with ThreadPoolExecutor(max_workers=min(self.max_workers, len(pending))) as pool:
+                    futures = [pool.submit(self._fetch_chunk, url, partial_path, i, bitmap, hasher,
+                                           on_bytes, cancel_event, on_chunk, abort)
+                               for i in pending]
+                    try:
+                        for future in futures:
+                            future.result()
+                    except BaseException:
+                        # 一个分块彻底失败后不再等待队列中的分块逐个重试
+                        abort.set()
+                        pool.shutdown(wait=False, cancel_futures=True)
+                        raise
+            actual = "sha256:" + hasher.hexdigest()
+        finally:
+            hasher.close()
+
+        if actual != digest:
+            # 内容错误时丢弃部分文件，下次从头下载
+            partial_path.unlink()
+            bitmap.remove()
+            raise BlobDownloadError(f"校验失败 {digest}: 实际为 {actual}")
+
+        os.replace(partial_path, final_path)
+        bitmap.remove()
+        return final_path
+
+    def pull(self, model_name: str,
+             progress_callback: Optional[Callable[[int, str], None]] = None,
+             progress_range: Tuple[int, int] = (0, 100), report_interval: float = 0.5,
+             cancel_event: Optional[threading.Event] = None,
+             progress: Optional[PullProgress] = None) -> Dict:
+        """下载模型全部blob并写入清单，返回清单内容
+
+        传入 progress 时进度记录在其中，下载失败或取消后调用方仍可读取已完成的字节数。
+        """
+        ref = ModelRef.parse(model_name)
+        try:
+            manifest, raw = self.registry.get_manifest(ref)
+        except RegistryError as e:
+            raise BlobDownloadError(str(e)) from e
+
+        progress = progress or PullProgress()
+        completed: Dict[str, int] = {}
+        lock = threading.Lock()
+        low, high = progress_range
+        last_report = [0.0]
+
+        def make_counter(digest: str, size: int) -> Callable[[int], None]:
+            def on_bytes(count: int) -> None:
+                with lock:
+                    completed[digest] = completed.get(digest, 0) + count
+                    progress.update({"status": f"pulling {digest[7:19]}", "digest": digest,
+                                     "total": size, "completed": completed[digest]})
+                    now = time.monotonic()
+                    if progress_callback and now - last_report[0] >= report_interval:
+                        last_report[0] = now
+                        progress_callback(low + int((high - low) * progress.fraction), progress.describe())
+            return on_bytes
+
+        blobs = manifest_blobs(manifest)
+        # 先按目标卷检查并预留空间，空间不足时立即失败
+        try:
+            DiskPreflight(self.store, self.reserve_margin).check(blobs)
+            reserved = self.reserve(blobs)
+        except InsufficientDiskSpace as e:
+            raise BlobDownloadError(str(e)) from e
+
+        for digest, size in blobs:
+            progress.update({"status": "pulling manifest", "digest": digest, "total": size, "completed": 0})
+
+        started = set()
+        try:
+            for digest, size in blobs:
+                started.add(digest)
+                self.download_blob(ref, digest, size, make_counter(digest, size), cancel_event)
+        except BlobDownloadError:
+            # 还没开始下载的blob释放预留空间，已开始的保留用于续传
+            self.release([(digest, size) for digest, size in reserved if digest not in started])
+            raise
+
+        self.store.write_manifest(ref, raw)
+        progress.update({"status": "success"})
+        if progress_callback:
+            progress_callback(high, f"已下载 {format_bytes(progress.total_bytes)}")
+        logger.info(f"模型 {ref.short_name} 已从 {self.registry.base_url} 下载完成")
+        return manifest
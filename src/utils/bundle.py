@@ -0,0 +1,449 @@
+import os
+import json
+import stat
+import time
+import errno
+import hashlib
+import logging
+import tarfile
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+import psutil
+
+from .disk_preflight import DiskPreflight, InsufficientDiskSpace, allocate_file, existing_parent
+from .model_store import ModelStore
+from .ollama_pull import format_bytes
+from .registry import ModelRef, manifest_blobs
+
+logger = logging.getLogger(__name__)
+
+BUNDLE_FORMAT = 'deepseek-installer-bundle'
+BUNDLE_VERSION = 1
+INDEX_NAME = 'index.json'
+BLOCK_SIZE = 512
+RECORD_SIZE = 20 * BLOCK_SIZE
+INDEX_ALIGN = 4096
+COPY_CHUNK = 64 * 1024 * 1024
+BUFFER_SIZE = 8 * 1024 * 1024
+
+# copy_file_range 不支持这些情况（跨文件系统、管道、旧内核）时退回到 sendfile
+_FALLBACK_ERRNOS = {errno.EXDEV, errno.EINVAL, errno.ENOSYS, errno.EBADF, errno.ENOTSOCK,
+                    getattr(errno, 'EOPNOTSUPP', errno.ENOSYS), getattr(errno, 'ENOTSUP', errno.ENOSYS)}
+
+
+class BundleError(Exception):
+    """模型包格式错误或导出、导入失败"""
+
+
+class BundleCancelled(BundleError):
+    """导出或导入被取消"""
+
+
+def _padding(size: int) -> int:
+    return -size % BLOCK_SIZE
+
+
+def _tar_header(name: str, size: int, mtime: float) -> bytes:
+    info = tarfile.TarInfo(name)
+    info.size = size
+    info.mtime = int(mtime)
+    info.mode = 0o644
+    return info.tobuf(tarfile.PAX_FORMAT, 'utf-8', 'surrogateescape')
+
+
+def _write_all(fd: int, data) -> None:
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+
+
+class RangeCopier:
+    """在内核中把一个文件的区间复制到另一个文件描述符，数据不经过用户态
+
+    优先使用 copy_file_range（同一文件系统上可能直接共享数据块），目标是
+    管道或套接字时使用 sendfile，都不可用时退回到 pread/write。
+    不支持的方式失败一次后不再尝试。
+    """
+
+    def __init__(self):
+        self.methods = [name for name in ('copy_file_range', 'sendfile') if hasattr(os, name)] + ['read']
+
+    def _copy_once(self, method: str, src_fd: int, dst_fd: int, offset: int, count: int) -> int:
+        count = min(count, COPY_CHUNK)
+        if method == 'copy_file_range':
+            return os.copy_file_range(src_fd, dst_fd, count, offset)
+        if method == 'sendfile':
+            return os.sendfile(dst_fd, src_fd, offset, count)
+        data = os.pread(src_fd, min(count, BUFFER_SIZE), offset)
+        _write_all(dst_fd, data)
+        return len(data)
+
+    def copy(self, src_fd: int, dst_fd: int, offset: int, count: int,
+             on_bytes: Optional[Callable[[int], None]] = None) -> None:
+        """把 src_fd 中 [offset, offset+count) 写到 dst_fd 的当前位置"""
+        while count > 0:
+            method = self.methods[0]
+            try:
+                copied = self._copy_once(method, src_fd, dst_fd, offset, count)
+            except OSError as e:
+                if method == 'read' or e.errno not in _FALLBACK_ERRNOS:
+                    raise
+                logger.debug(f"{method} 不可用（{e.strerror}），改用 {self.methods[1]}")
+                self.methods.pop(0)
+                continue
+            if copied == 0:
+                raise BundleError("源文件在复制过程中被截断")
+            offset += copied
+            count -= copied
+            if on_bytes:
+                on_bytes(copied)
+
+
+class _Progress:
+    def __init__(self, total: int, verb: str, callback: Optional[Callable[[int, str], None]],
+                 cancel_event: Optional[threading.Event]):
+        self.total = total
+        self.verb = verb
+        self.callback = callback
+        self.cancel_event = cancel_event
+        self.done = 0
+        self.percent = -1
+
+    def __call__(self, count: int) -> None:
+        if self.cancel_event is not None and self.cancel_event.is_set():
+            raise BundleCancelled(f"{self.verb}已取消")
+        self.done += count
+        percent = int(100 * self.done / self.total) if self.total else 100
+        if self.callback and percent != self.percent:
+            self.percent = percent
+            self.callback(percent, f"已{self.verb} {format_bytes(self.done)}/{format_bytes(self.total)}")
+
+
+class BundleExporter:
+    """把模型的清单和blob导出为单个模型包，用于没有网络的主机
+
+    模型包是标准的tar文件（可以直接用 tar 解压到模型目录），第一个成员
+    index.json 记录每个成员数据在文件中的偏移，导入时可以只读取需要的模型。
+    blob通过 RangeCopier 在内核中复制，输出可以是文件，也可以是管道（例如 ssh）。
+    """
+
+    def __init__(self, store: Optional[ModelStore] = None,
+                 progress_callback: Optional[Callable[[int, str], None]] = None,
+                 cancel_event: Optional[threading.Event] = None):
+        self.store = store or ModelStore()
+        self.progress_callback = progress_callback
+        self.cancel_event = cancel_event
+
+    def _collect(self, model_names: Iterable[str]) -> Tuple[Dict[str, Any], List[Tuple[str, Any, int, float]]]:
+        """返回 (各模型的索引项, 成员列表)；成员为 (名称, 清单内容或blob路径, 大小, mtime)"""
+        models: Dict[str, Any] = {}
+        manifests: List[Tuple[str, Any, int, float]] = []
+        blobs: Dict[str, Tuple[str, Any, int, float]] = {}
+        for name in dict.fromkeys(model_names):
+            ref = ModelRef.parse(name)
+            path = self.store.manifest_path(ref)
+            try:
+                raw = path.read_bytes()
+                entries = manifest_blobs(json.loads(raw))
+                mtime = path.stat().st_mtime
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                raise BundleError(f"模型 {name} 未安装或清单无法读取: {str(e)}") from e
+            member = path.relative_to(self.store.root).as_posix()
+            models[ref.short_name] = {
+                'manifest': member,
+                'digest': 'sha256:' + hashlib.sha256(raw).hexdigest(),
+                'size': sum(size for _, size in entries),
+            }
+            manifests.append((member, raw, len(raw), mtime))
+            for digest, size in entries:
+                blob_path = self.store.blob_path(digest)
+                if not self.store.has_blob(digest, size):
+                    raise BundleError(f"模型 {name} 的blob {digest} 缺失或大小不符，请先运行 verify")
+                blobs.setdefault(digest, (blob_path.relative_to(self.store.root).as_posix(), blob_path,
+                                          size, blob_path.stat().st_mtime))
+        return models, manifests + list(blobs.values())
+
+    @staticmethod
+    def _layout(models: Dict[str, Any], members: List[Tuple[str, Any, int, float]]) -> Tuple[bytes, List[bytes], int]:
+        """计算每个成员的偏移并生成索引，返回 (索引内容, 成员头, 最后一个成员的结束位置)
+
+        索引本身的大小会影响后续成员的偏移，索引补齐到 INDEX_ALIGN 的整数倍后
+        通常一两轮就能稳定。
+        """
+        index_size = 0
+        for _ in range(8):
+            offset = len(_tar_header(INDEX_NAME, index_size, 0)) + index_size + _padding(index_size)
+            headers = []
+            entries = {}
+            for name, _, size, mtime in members:
+                header = _tar_header(name, size, mtime)
+                headers.append(header)
+                offset += len(header)
+                entries[name] = {'offset': offset, 'size': size}
+                offset += size + _padding(size)
+            index = json.dumps({
+                'format': BUNDLE_FORMAT,
+                'version': BUNDLE_VERSION,
+                'created_at': time.time(),
+                'models': models,
+                'entries': entries,
+            }, indent=1).encode('utf-8')
+            padded = index + b' ' * (-len(index) % INDEX_ALIGN)
+            if len(padded) == index_size:
+                return padded, headers, offset
+            index_size = len(padded)
+        raise BundleError("无法生成模型包索引")
+
+    def export(self, model_names: Iterable[str], output: Union[str, Path, int]) -> Dict[str, Any]:
+        """导出模型；output 为文件路径或已打开的文件描述符（例如标准输出）"""
+        started = time.monotonic()
+        models, members = self._collect(model_names)
+        index, headers, data_end = self._layout(models, members)
+        end = data_end + 2 * BLOCK_SIZE
+        bundle_size = end + (-end % RECORD_SIZE)
+        blob_bytes = sum(size for _, source, size, _ in members if isinstance(source, Path))
+
+        tmp_path = None
+        if isinstance(output, int):
+            fd = output
+        else:
+            output = Path(output)
+            free = psutil.disk_usage(existing_parent(str(output.parent))).free
+            if free < bundle_size:
+                raise InsufficientDiskSpace(f"{output.parent} 所在卷空间不足，模型包需要 "
+                                            f"{format_bytes(bundle_size)}，可用 {format_bytes(free)}",
+                                            required=bundle_size, free=free)
+            output.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = output.with_name(output.name + '.part')
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, 'O_BINARY', 0), 0o644)
+
+        progress = _Progress(blob_bytes, "导出", self.progress_callback, self.cancel_event)
+        copier = RangeCopier()
+        try:
+            _write_all(fd, _tar_header(INDEX_NAME, len(index), time.time()) + index)
+            _write_all(fd, b'\0' * _padding(len(index)))
+            for (name, source, size, _), header in zip(members, headers):
+                _write_all(fd, header)
+                if isinstance(source, Path):
+                    src_fd = os.open(source, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+                    try:
+                        if hasattr(os, 'posix_fadvise'):
+                            os.posix_fadvise(src_fd, 0, size, os.POSIX_FADV_SEQUENTIAL)
+                        copier.copy(src_fd, fd, 0, size, progress)
+                    finally:
+                        os.close(src_fd)
+                else:
+                    _write_all(fd, source)
+                _write_all(fd, b'\0' * _padding(size))
+            _write_all(fd, b'\0' * (bundle_size - data_end))
+        except BaseException:
+            if tmp_path:
+                os.close(fd)
+                tmp_path.unlink(missing_ok=True)
+            raise
+        if tmp_path:
+            os.close(fd)
+            os.replace(tmp_path, output)
+
+        elapsed = time.monotonic() - started
+        result = {
+            'models': sorted(models),
+            'blobs': len(members) - len(models),
+            'bytes': bundle_size,
+            'method': copier.methods[0],
+            'seconds': round(elapsed, 3),
+            'gb_per_s': round(blob_bytes / elapsed / 1024 ** 3, 2) if blob_bytes and elapsed > 0 else None,
+        }
+        logger.info(f"已导出 {len(models)} 个模型（{format_bytes(bundle_size)}），用时 {elapsed:.1f}s")
+        return result
+
+
+class _BundleReader:
+    """按偏移顺序读取模型包；可定位的文件直接跳到目标位置，管道则读取并丢弃中间的数据"""
+
+    def __init__(self, fd: int):
+        self.fd = fd
+        self.position = 0
+        mode = os.fstat(fd).st_mode
+        self.seekable = stat.S_ISREG(mode) or stat.S_ISBLK(mode)
+        self.buffer = bytearray(BUFFER_SIZE)
+
+    def read_into(self, view: memoryview) -> int:
+        count = os.readv(self.fd, [view]) if hasattr(os, 'readv') else self._read_fallback(view)
+        self.position += count
+        return count
+
+    def _read_fallback(self, view: memoryview) -> int:
+        data = os.read(self.fd, len(view))
+        view[:len(data)] = data
+        return len(data)
+
+    def read_exact(self, size: int) -> bytes:
+        data = bytearray(size)
+        view = memoryview(data)
+        done = 0
+        while done < size:
+            count = self.read_into(view[done:])
+            if not count:
+                raise BundleError("模型包不完整")
+            done += count
+        return bytes(data)
+
+    def seek(self, offset: int) -> None:
+        if offset < self.position:
+            raise BundleError("模型包索引中的偏移无效")
+        if self.seekable:
+            os.lseek(self.fd, offset, os.SEEK_SET)
+            self.position = offset
+            return
+        view = memoryview(self.buffer)
+        while self.position < offset:
+            if not self.read_into(view[:min(len(view), offset - self.position)]):
+                raise BundleError("模型包不完整")
+
+    def stream(self, size: int) -> Iterable[memoryview]:
+        """按块读取 size 字节，返回的视图在下一块读取前有效"""
+        view = memoryview(self.buffer)
+        while size > 0:
+            count = self.read_into(view[:min(len(view), size)])
+            if not count:
+                raise BundleError("模型包不完整")
+            size -= count
+            yield view[:count]
+
+
+def read_index(reader: _BundleReader) -> Dict[str, Any]:
+    """读取模型包开头的索引"""
+    try:
+        info = tarfile.TarInfo.frombuf(reader.read_exact(BLOCK_SIZE), 'utf-8', 'surrogateescape')
+    except tarfile.TarError as e:
+        raise BundleError(f"不是有效的模型包: {str(e)}") from e
+    if info.name != INDEX_NAME:
+        raise BundleError("不是有效的模型包：缺少索引")
+    try:
+        index = json.loads(reader.read_exact(info.size))
+    except ValueError as e:
+        raise BundleError(f"模型包索引无法解析: {str(e)}") from e
+    if index.get('format') != BUNDLE_FORMAT or index.get('version') != BUNDLE_VERSION:
+        raise BundleError(f"不支持的模型包格式: {index.get('format')} {index.get('version')}")
+    return index
+
+
+class BundleImporter:
+    """从模型包导入模型到模型目录
+
+    已存在（digest和大小一致）的blob直接跳过；写入时同时计算sha256，
+    哈希不符的blob不会落地，引用它的模型也不会写入清单。一个模型的清单只在
+    它的全部blob都就绪后写入，中断后重新导入会跳过已完成的blob。
+    """
+
+    def __init__(self, store: Optional[ModelStore] = None,
+                 progress_callback: Optional[Callable[[int, str], None]] = None,
+                 cancel_event: Optional[threading.Event] = None):
+        self.store = store or ModelStore()
+        self.progress_callback = progress_callback
+        self.cancel_event = cancel_event
+
+    def _write_blob(self, reader: _BundleReader, digest: str, size: int, progress: _Progress) -> bool:
+        """写入一个blob，哈希一致时返回True"""
+        path = self.store.blob_path(digest)
+        tmp_path = path.with_name(path.name + '-import')
+        allocate_file(tmp_path, size)
+        hasher = hashlib.sha256()
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | getattr(os, 'O_BINARY', 0))
+            try:
+                for chunk in reader.stream(size):
+                    hasher.update(chunk)
+                    _write_all(fd, chunk)
+                    progress(len(chunk))
+            finally:
+                os.close(fd)
+            if 'sha256:' + hasher.hexdigest() != digest:
+                logger.error(f"blob {digest} 的哈希不符，已丢弃")
+                tmp_path.unlink()
+                return False
+            os.replace(tmp_path, path)
+            return True
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    def import_bundle(self, source: Union[str, Path, int],
+                      models: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """导入模型包（默认全部模型）；source 为文件路径或已打开的文件描述符（例如标准输入）"""
+        started = time.monotonic()
+        fd = source if isinstance(source, int) else os.open(source, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+        try:
+            return self._import(_BundleReader(fd), models, started)
+        finally:
+            if not isinstance(source, int):
+                os.close(fd)
+
+    def _import(self, reader: _BundleReader, models: Optional[Iterable[str]], started: float) -> Dict[str, Any]:
+        index = read_index(reader)
+        available = index['models']
+        wanted = list(dict.fromkeys(models)) if models else sorted(available)
+        unknown = [name for name in wanted if name not in available]
+        if unknown:
+            raise BundleError(f"模型包中没有 {', '.join(unknown)}，可用: {', '.join(sorted(available))}")
+        entries = index['entries']
+
+        # 清单排在blob之前，先读出需要的清单，确定要写入哪些blob
+        manifests: Dict[str, bytes] = {}
+        for name in sorted(wanted, key=lambda n: entries[available[n]['manifest']]['offset']):
+            entry = entries[available[name]['manifest']]
+            reader.seek(entry['offset'])
+            raw = reader.read_exact(entry['size'])
+            if 'sha256:' + hashlib.sha256(raw).hexdigest() != available[name]['digest']:
+                raise BundleError(f"模型 {name} 的清单已损坏")
+            manifests[name] = raw
+
+        needed: Dict[str, int] = {}
+        model_blobs: Dict[str, List[str]] = {}
+        for name, raw in manifests.items():
+            blobs = manifest_blobs(json.loads(raw))
+            model_blobs[name] = [digest for digest, _ in blobs]
+            needed.update(blobs)
+        missing = {digest: size for digest, size in needed.items() if not self.store.has_blob(digest, size)}
+        self.store.ensure_dirs()
+        DiskPreflight(self.store).check(missing.items())
+
+        progress = _Progress(sum(missing.values()), "导入", self.progress_callback, self.cancel_event)
+        failed = set()
+        ordered = sorted(missing.items(), key=lambda item: entries[self._blob_member(item[0])]['offset'])
+        for digest, size in ordered:
+            entry = entries[self._blob_member(digest)]
+            if entry['size'] != size:
+                raise BundleError(f"模型包索引中 {digest} 的大小与清单不符")
+            reader.seek(entry['offset'])
+            if not self._write_blob(reader, digest, size, progress):
+                failed.add(digest)
+
+        results = {}
+        for name, raw in manifests.items():
+            if failed.intersection(model_blobs[name]):
+                results[name] = 'corrupt'
+                continue
+            self.store.write_manifest(ModelRef.parse(name), raw)
+            results[name] = 'imported'
+
+        written = sum(size for digest, size in missing.items() if digest not in failed)
+        elapsed = time.monotonic() - started
+        logger.info(f"已导入 {sum(1 for status in results.values() if status == 'imported')} 个模型，"
+                    f"写入 {format_bytes(written)}，跳过已存在的 {len(needed) - len(missing)} 个blob")
+        return {
+            'models': results,
+            'blobs_written': len(missing) - len(failed),
+            'blobs_skipped': len(needed) - len(missing),
+            'blobs_corrupt': sorted(failed),
+            'bytes_written': written,
+            'seconds': round(elapsed, 3),
+            'gb_per_s': round(written / elapsed / 1024 ** 3, 2) if written and elapsed > 0 else None,
+            'ok': not failed,
+        }
+
+    def _blob_member(self, digest: str) -> str:
+        return self.store.blob_path(digest).relative_to(self.store.root).as_posix()
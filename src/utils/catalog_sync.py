@@ -0,0 +1,84 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, Optional
+
+from .manifest_cache import ManifestCache
+from .registry import ModelRef, RegistryClient, RegistryError, manifest_blobs
+
+logger = logging.getLogger(__name__)
+
+
+class SyncResult:
+    """单个模型标签的同步结果"""
+
+    __slots__ = ('model_name', 'status', 'size', 'error', 'latency', 'entry')
+
+    def __init__(self, model_name: str, status: str, size: Optional[int] = None,
+                 error: Optional[str] = None, latency: float = 0.0):
+        self.model_name = model_name
+        self.status = status  # updated / unchanged / failed
+        self.size = size
+        self.error = error
+        self.latency = latency
+        self.entry: Optional[Dict[str, Any]] = None  # 需要写入缓存的新条目
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {'model': self.model_name, 'status': self.status, 'size': self.size,
+                'error': self.error, 'latency_ms': round(self.latency * 1000, 1)}
+
+
+class CatalogSync:
+    """并发获取配置中各模型标签的清单，计算实际磁盘占用
+
+    已缓存的标签带 If-None-Match 请求，清单未变化时只有一次304往返。
+    """
+
+    def __init__(self, registry: Optional[RegistryClient] = None, cache: Optional[ManifestCache] = None,
+                 max_workers: int = 8):
+        self.registry = registry or RegistryClient()
+        self.cache = cache or ManifestCache()
+        self.max_workers = max_workers
+
+    def _sync_one(self, model_name: str, cached: Optional[Dict[str, Any]]) -> SyncResult:
+        started = time.monotonic()
+        ref = ModelRef.parse(model_name)
+        etag = cached.get('etag') if cached else None
+        try:
+            fetched = self.registry.fetch_manifest(ref, etag)
+        except RegistryError as e:
+            return SyncResult(model_name, 'failed', error=str(e), latency=time.monotonic() - started)
+        if fetched is None:
+            return SyncResult(model_name, 'unchanged', cached['size'], latency=time.monotonic() - started)
+
+        manifest, _, new_etag = fetched
+        blobs = manifest_blobs(manifest)
+        result = SyncResult(model_name, 'updated', sum(size for _, size in blobs),
+                            latency=time.monotonic() - started)
+        result.entry = {
+            'etag': new_etag,
+            'size': result.size,
+            'blobs': [{'digest': digest, 'size': size} for digest, size in blobs],
+            'synced_at': time.time(),
+        }
+        return result
+
+    def sync(self, model_names: Iterable[str]) -> Dict[str, SyncResult]:
+        """同步所有模型，返回每个模型的结果；失败的模型保留原有缓存"""
+        names = list(dict.fromkeys(model_names))
+        cached = self.cache.entries()
+        if not names:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(names))) as pool:
+            results = dict(zip(names, pool.map(lambda name: self._sync_one(name, cached.get(name)), names)))
+
+        updated = {name: r.entry for name, r in results.items() if r.status == 'updated'}
+        if updated:
+            self.cache.update(updated)
+        for name, r in results.items():
+            if r.status == 'failed':
+                logger.warning(f"同步模型 {name} 失败: {r.error}")
+        logger.info(f"模型目录同步完成: 更新 {len(updated)}，未变化 "
+                    f"{sum(r.status == 'unchanged' for r in results.values())}，失败 "
+                    f"{sum(r.status == 'failed' for r in results.values())}")
+        return results
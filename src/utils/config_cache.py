@@ -0,0 +1,215 @@
+import os
+import sys
+import time
+import marshal
+import hashlib
+import logging
+import threading
+import yaml
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# libyaml 提供的C实现比纯Python解析器快一个数量级，不可用时退回纯Python实现
+YAML_LOADER = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+
+# 编译缓存格式变化时递增，旧缓存自动失效
+CACHE_FORMAT = 2
+
+
+def default_cache_dir() -> Path:
+    """编译缓存目录，可通过 DEEPSEEK_CACHE_DIR 覆盖"""
+    override = os.environ.get('DEEPSEEK_CACHE_DIR')
+    if override:
+        return Path(override)
+    if sys.platform == 'win32' and os.environ.get('LOCALAPPDATA'):
+        return Path(os.environ['LOCALAPPDATA']) / 'deepseek-installer' / 'cache'
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return Path(base) / 'deepseek-installer'
+
+
+def parse_yaml(data: bytes) -> Any:
+    return yaml.load(data, Loader=YAML_LOADER)
+
+
+class ConfigCache:
+    """进程内共享的配置缓存
+
+    内存中按 (mtime, 大小) 判断文件是否变化；首次加载时先查磁盘上的
+    编译缓存（marshal，只能保存基本类型，读取时不会执行代码），mtime 不同但内容哈希相同时也直接复用，只有
+    内容真正变化时才解析YAML。返回的配置在进程内共享，调用方不应修改。
+    """
+
+    def __init__(self, cache_dir: Optional[Path] = None):
+        self.cache_dir = Path(cache_dir) if cache_dir else default_cache_dir()
+        self.parses = 0
+        self._entries: Dict[str, Tuple[int, int, str, Any]] = {}  # 路径 -> (mtime_ns, 大小, 哈希, 配置)
+        self._lock = threading.Lock()
+
+    def _compiled_path(self, path: str) -> Path:
+        return self.cache_dir / f"{hashlib.sha256(path.encode('utf-8')).hexdigest()[:32]}.marshal"
+
+    def _read_compiled(self, path: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._compiled_path(path), 'rb') as f:
+                entry = marshal.load(f)
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if not isinstance(entry, dict) or entry.get('format') != CACHE_FORMAT or entry.get('path') != path:
+            return None
+        return entry
+
+    def _write_compiled(self, path: str, mtime_ns: int, size: int, digest: str, config: Any) -> None:
+        target = self._compiled_path(path)
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            tmp = target.with_name(f"{target.name}.{os.getpid()}.tmp")
+            data = marshal.dumps({'format': CACHE_FORMAT, 'path': path, 'mtime_ns': mtime_ns, 'size': size,
+                                  'sha256': digest, 'config': config})
+            with open(tmp, 'wb') as f:
+                f.write(data)
+            os.replace(tmp, target)
+        except (OSError, ValueError) as e:
+            # 缓存目录不可写或配置中有marshal不支持的类型（如YAML日期）时只是失去加速，不影响加载
+            logger.debug(f"写入配置编译缓存失败: {str(e)}")
+
+    def cached(self, path: str) -> Optional[Any]:
+        """内存中的配置与文件一致时直接返回，否则返回None（不读取文件）"""
+        path = os.path.abspath(path)
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._entries.get(path)
+        if entry and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+            return entry[3]
+        return None
+
+    def load(self, path: str) -> Any:
+        """加载配置文件，文件不存在或格式错误时抛出异常"""
+        path = os.path.abspath(path)
+        st = os.stat(path)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+                return entry[3]
+
+            compiled = self._read_compiled(path)
+            if compiled and compiled['mtime_ns'] == st.st_mtime_ns and compiled['size'] == st.st_size:
+                config = compiled['config']
+                self._entries[path] = (st.st_mtime_ns, st.st_size, compiled['sha256'], config)
+                return config
+
+            with open(path, 'rb') as f:
+                data = f.read()
+            digest = hashlib.sha256(data).hexdigest()
+            known = entry[2:] if entry else (compiled['sha256'], compiled['config']) if compiled else None
+            if known and known[0] == digest:
+                # 文件被touch或重新保存但内容未变
+                config = known[1]
+            else:
+                config = parse_yaml(data)
+                self.parses += 1
+                logger.debug(f"已解析配置文件 {path}")
+            self._entries[path] = (st.st_mtime_ns, st.st_size, digest, config)
+            self._write_compiled(path, st.st_mtime_ns, st.st_size, digest, config)
+            return config
+
+    def invalidate(self, path: Optional[str] = None) -> None:
+        with self._lock:
+            if path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(path), None)
+
+
+_shared_cache: Optional[ConfigCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_config_cache() -> ConfigCache:
+    """进程内共享的配置缓存"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = ConfigCache()
+        return _shared_cache
+
+
+class ConfigWatcher:
+    """轮询配置文件的 mtime，内容变化时重新加载并通知订阅者
+
+    订阅回调在监视线程中执行；界面代码应通过信号转发到界面线程。
+    新内容解析失败时保留旧配置，只记录警告。
+    """
+
+    def __init__(self, path: str, interval: float = 1.0, cache: Optional[ConfigCache] = None):
+        self.path = os.path.abspath(path)
+        self.interval = interval
+        self.cache = cache or get_config_cache()
+        self._subscribers: Dict[int, Callable[[Any], None]] = {}
+        self._next_token = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._signature = self._stat()
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def subscribe(self, callback: Callable[[Any], None]) -> Callable[[], None]:
+        """订阅配置变化，返回取消订阅的函数"""
+        with self._lock:
+            token = self._next_token
+            self._next_token += 1
+            self._subscribers[token] = callback
+
+        def unsubscribe() -> None:
+            with self._lock:
+                self._subscribers.pop(token, None)
+        return unsubscribe
+
+    def check(self) -> bool:
+        """检查一次文件是否变化，变化且成功加载时通知订阅者并返回True"""
+        signature = self._stat()
+        if signature is None or signature == self._signature:
+            return False
+        self._signature = signature
+        try:
+            config = self.cache.load(self.path)
+        except (OSError, yaml.YAMLError) as e:
+            logger.warning(f"配置文件已修改但无法加载，继续使用旧配置: {str(e)}")
+            return False
+
+        logger.info(f"配置文件已重新加载: {self.path}")
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+        for callback in subscribers:
+            try:
+                callback(config)
+            except Exception as e:
+                logger.warning(f"配置变更回调出错: {str(e)}")
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.check()
+
+    def start(self) -> 'ConfigWatcher':
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="config-watcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=2)
+            self._thread = None
@@ -3,18 +3,28 @@ import sys
 import platform
 import yaml
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, Optional
+
+from .config_cache import get_config_cache
+from .model_catalog import ModelCatalog
+from .manifest_cache import GB, ManifestCache
+from .tracing import span
 
 logger = logging.getLogger(__name__)
 
 class ConfigLoader:
-    def __init__(self):
+    def __init__(self, manifest_cache: Optional[ManifestCache] = None):
         self.config_path = os.path.join(
             os.path.dirname(os.path.dirname(__file__)),
             'config',
             'config.yaml'
         )
         self._config = None
+        self._catalog = None
+        self._catalog_source = None
+        self.manifest_cache = manifest_cache or ManifestCache()
+        self._models = None
+        self._models_key = None
 
     def get_system_type(self):
         """获取当前操作系统类型"""
@@ -33,50 +43,72 @@ class ConfigLoader:
             
         return paths
 
+    def get_config_path(self) -> str:
+        """实际读取的配置文件路径"""
+        # 如果是打包后的环境，需要调整配置文件路径
+        if getattr(sys, 'frozen', False):
+            # PyInstaller创建的临时文件夹
+            return os.path.join(sys._MEIPASS, 'config', 'config.yaml')
+        return self.config_path
+
     def load_config(self):
-        """加载配置文件"""
-        if self._config is None:
-            try:
-                # 如果是打包后的环境，需要调整配置文件路径
-                if getattr(sys, 'frozen', False):
-                    # PyInstaller创建的临时文件夹
-                    base_path = sys._MEIPASS
-                    config_path = os.path.join(base_path, 'config', 'config.yaml')
-                else:
-                    config_path = self.config_path
+        """加载配置文件
 
-                with open(config_path, 'r', encoding='utf-8') as f:
-                    self._config = yaml.safe_load(f)
+        通过进程内共享的配置缓存读取，文件未修改时不重新解析；
+        文件被修改后下一次调用即返回新内容。
+        """
+        cache = get_config_cache()
+        path = self.get_config_path()
+        config = cache.cached(path)
+        if config is not None:
+            # 内存中的配置仍然有效时不记录阶段，每次查询模型列表都会走到这里
+            if self._config is None:
                 logger.info("配置文件加载成功")
+            self._config = config
+            return config
+        with span('load_config') as current:
+            parses = cache.parses
+            try:
+                config = cache.load(path)
+                current.set(parsed=cache.parses > parses)
+                if self._config is None:
+                    logger.info("配置文件加载成功")
+                self._config = config
             except Exception as e:
-                logger.error(f"加载配置文件失败: {str(e)}")
-                # 使用默认配置
-                self._config = {
-                    'paths': {
-                        'windows': {
-                            'base_path': "C:\\Program Files\\Ollama",
-                            'models_path': "C:\\Program Files\\Ollama\\models",
-                            'logs_path': "C:\\ProgramData\\Ollama\\logs"
-                        },
-                        'linux': {
-                            'base_path': "/usr/local/ollama",
-                            'models_path': "/usr/local/ollama/models",
-                            'logs_path': "/var/log/ollama"
-                        },
-                        'darwin': {
-                            'base_path': "/usr/local/ollama",
-                            'models_path': "/usr/local/ollama/models",
-                            'logs_path': "/var/log/ollama"
+                current.outcome = 'failed'
+                current.error = str(e)
+                if self._config is None:
+                    logger.error(f"加载配置文件失败: {str(e)}")
+                    # 使用默认配置
+                    self._config = {
+                        'paths': {
+                            'windows': {
+                                'base_path': "C:\\Program Files\\Ollama",
+                                'models_path': "C:\\Program Files\\Ollama\\models",
+                                'logs_path': "C:\\ProgramData\\Ollama\\logs"
+                            },
+                            'linux': {
+                                'base_path': "/usr/local/ollama",
+                                'models_path': "/usr/local/ollama/models",
+                                'logs_path': "/var/log/ollama"
+                            },
+                            'darwin': {
+                                'base_path': "/usr/local/ollama",
+                                'models_path': "/usr/local/ollama/models",
+                                'logs_path': "/var/log/ollama"
+                            }
                         }
                     }
-                }
-                
+                else:
+                    # 编辑中的配置文件可能暂时无法解析，继续使用上一次成功加载的配置
+                    logger.warning(f"重新加载配置文件失败，继续使用旧配置: {str(e)}")
+
         return self._config
 
     def get_model_requirements(self, model_name: str) -> Dict[str, Any]:
         """获取指定模型的系统要求"""
         try:
-            return self.load_config()['models'][model_name]
+            return self.get_available_models()[model_name]
         except KeyError:
             logger.error(f"未找到模型 {model_name} 的配置信息")
             raise
@@ -110,8 +142,29 @@ class ConfigLoader:
         return self.load_config()['ui_settings']
 
     def get_available_models(self) -> Dict[str, Dict[str, Any]]:
-        """获取所有可用模型的配置"""
-        return self.load_config()['models']
+        """获取所有可用模型的配置
+
+        同步过模型目录（见 catalog_sync）的模型，disk_space 使用清单中
+        各blob大小之和，而不是配置文件中手写的估计值。
+        """
+        models = self.load_config()['models']
+        synced = self.manifest_cache.entries()
+        key = (id(models), self.manifest_cache.version)
+        if self._models is None or self._models_key != key:
+            self._models = {
+                name: dict(req, disk_space=round(synced[name]['size'] / GB, 2)) if name in synced else req
+                for name, req in models.items()
+            }
+            self._models_key = key
+        return self._models
+
+    def get_model_catalog(self) -> ModelCatalog:
+        """带索引的模型目录，配置文件重新加载后自动重建"""
+        models = self.get_available_models()
+        if self._catalog is None or self._catalog_source is not models:
+            self._catalog = ModelCatalog.from_config(models)
+            self._catalog_source = models
+        return self._catalog
 
     def update_config(self, new_config: Dict[str, Any]) -> None:
         """更新配置文件"""
@@ -0,0 +1,190 @@
+import os
+import errno
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+GB = 1024 ** 3
+# 清单、日志和文件系统元数据预留的余量
+DEFAULT_MARGIN = 512 * 1024 ** 2
+
+_UNSUPPORTED = {errno.EOPNOTSUPP, errno.EINVAL, getattr(errno, 'ENOSYS', errno.EINVAL)}
+
+
+class InsufficientDiskSpace(Exception):
+    """目标卷的可用空间不足"""
+
+    def __init__(self, message: str, required: int = 0, free: int = 0):
+        super().__init__(message)
+        self.required = required
+        self.free = free
+
+
+def default_models_path() -> str:
+    """Ollama默认的模型目录，可通过 OLLAMA_MODELS 覆盖"""
+    return os.environ.get("OLLAMA_MODELS") or os.path.join(os.path.expanduser("~"), ".ollama", "models")
+
+
+def existing_parent(path: str) -> str:
+    """目录可能还不存在，向上找到已存在的父目录"""
+    path = os.path.realpath(os.path.expanduser(path))
+    while not os.path.exists(path) and os.path.dirname(path) != path:
+        path = os.path.dirname(path)
+    return path
+
+
+def find_mount(path: str):
+    """找到 path 所在的分区（psutil.disk_partitions 的条目），找不到时返回None"""
+    path = existing_parent(path)
+    best = None
+    for partition in psutil.disk_partitions(all=True):
+        mount = partition.mountpoint
+        if path == mount or path.startswith(mount.rstrip(os.sep) + os.sep):
+            if best is None or len(mount) > len(best.mountpoint):
+                best = partition
+    return best
+
+
+def volume_usage(path: str) -> Dict[str, Any]:
+    """目标目录所在卷的容量（GB），而不是系统盘"""
+    target = existing_parent(path)
+    disk = psutil.disk_usage(target)
+    partition = find_mount(target)
+    return {
+        'total': disk.total / GB,
+        'free': disk.free / GB,
+        'percent': disk.percent,
+        'path': os.path.abspath(os.path.expanduser(path)),
+        'mount': partition.mountpoint if partition else None,
+    }
+
+
+def allocated_bytes(path: Path) -> int:
+    """文件实际占用的磁盘空间，稀疏文件只计算已写入的部分"""
+    stat = path.stat()
+    blocks = getattr(stat, 'st_blocks', None)
+    if blocks is None:
+        # Windows上 truncate 出来的文件不是稀疏文件，按文件大小计算
+        return stat.st_size
+    return min(blocks * 512, stat.st_size)
+
+
+def allocate_file(path: Path, size: int) -> bool:
+    """把文件扩展到 size 字节并实际分配磁盘块，返回是否完成了预分配
+
+    支持 posix_fallocate 时，空间不足会立即抛出 InsufficientDiskSpace，
+    预分配的文件也更少产生碎片；不支持的系统或文件系统退回到 truncate（稀疏文件）。
+    已写入的数据不受影响，可以对续传中的文件重复调用。
+    """
+    fd = os.open(path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o644)
+    try:
+        if size > 0 and hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(fd, 0, size)
+                return True
+            except OSError as e:
+                if e.errno == errno.ENOSPC:
+                    raise InsufficientDiskSpace(f"磁盘空间不足，无法为 {path.name} 预留 {size / GB:.2f}GB",
+                                                required=size) from e
+                if e.errno not in _UNSUPPORTED:
+                    raise
+        if os.fstat(fd).st_size < size:
+            os.ftruncate(fd, size)
+        return False
+    finally:
+        os.close(fd)
+
+
+class PreflightResult:
+    """一次安装前磁盘检查的结果（字节）"""
+
+    __slots__ = ('path', 'mount', 'free', 'total_size', 'present', 'partial', 'required', 'margin')
+
+    def __init__(self, path: str, mount: Optional[str], free: int, total_size: int, present: int,
+                 partial: int, required: int, margin: int):
+        self.path = path
+        self.mount = mount
+        self.free = free
+        self.total_size = total_size
+        self.present = present      # 已存在的完整blob
+        self.partial = partial      # 部分下载中已落盘的数据
+        self.required = required    # 还需要写入的数据
+        self.margin = margin
+
+    @property
+    def ok(self) -> bool:
+        return self.free >= self.required + self.margin
+
+    @property
+    def shortfall(self) -> int:
+        return max(0, self.required + self.margin - self.free)
+
+    def describe(self) -> str:
+        where = f"{self.path}（挂载点 {self.mount}）" if self.mount else self.path
+        text = (f"{where}: 需要 {self.required / GB:.2f}GB，可用 {self.free / GB:.2f}GB"
+                f"（模型共 {self.total_size / GB:.2f}GB，已存在 {self.present / GB:.2f}GB，"
+                f"未完成的下载 {self.partial / GB:.2f}GB）")
+        if not self.ok:
+            text = f"磁盘空间不足，{text}，还差 {self.shortfall / GB:.2f}GB"
+        return text
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class DiskPreflight:
+    """安装前按目标目录所在的卷检查磁盘空间
+
+    已下载完成的blob不再计入；部分下载的文件只计算还没分配的部分，
+    续传时不会因为重复计算而误报空间不足。
+    store 为 ModelStore（或具有相同 root/blob_path/partial_path/has_blob 接口的对象）。
+    """
+
+    def __init__(self, store, margin: int = DEFAULT_MARGIN):
+        self.store = store
+        self.margin = margin
+
+    def plan(self, blobs: Iterable[Tuple[str, int]]) -> PreflightResult:
+        total = present = partial = required = 0
+        for digest, size in dict(blobs).items():
+            total += size
+            if self.store.has_blob(digest, size):
+                present += size
+                continue
+            done = 0
+            partial_path = self.store.partial_path(digest)
+            try:
+                if partial_path.stat().st_size == size:
+                    done = allocated_bytes(partial_path)
+            except OSError:
+                pass
+            partial += done
+            required += size - done
+
+        return self._result(total, present, partial, required)
+
+    def estimate(self, size: int) -> PreflightResult:
+        """不知道blob清单时（例如未同步过的模型），按估计的总大小检查"""
+        return self._result(size, 0, 0, size)
+
+    def _result(self, total: int, present: int, partial: int, required: int) -> PreflightResult:
+        root = str(self.store.root)
+        target = existing_parent(root)
+        partition = find_mount(target)
+        return PreflightResult(root, partition.mountpoint if partition else None,
+                               psutil.disk_usage(target).free, total, present, partial, required, self.margin)
+
+    def check(self, blobs: Iterable[Tuple[str, int]]) -> PreflightResult:
+        """空间不足时抛出 InsufficientDiskSpace"""
+        return self.ensure(self.plan(blobs))
+
+    @staticmethod
+    def ensure(result: PreflightResult) -> PreflightResult:
+        if not result.ok:
+            raise InsufficientDiskSpace(result.describe(), result.required + result.margin, result.free)
+        logger.info(result.describe())
+        return result
@@ -0,0 +1,135 @@
+import os
+import json
+import glob
+import logging
+import numpy as np
+from typing import Any, Dict, Iterable, List, Optional
+
+from .model_catalog import REQUIREMENT_KEYS, normalize_requirements
+
+logger = logging.getLogger(__name__)
+
+# 与 config.yaml 中模型要求的字段一一对应
+RESOURCES = REQUIREMENT_KEYS
+RESOURCE_LABELS = {'gpu_memory': 'GPU显存', 'system_memory': '系统内存', 'disk_space': '磁盘空间'}
+
+
+def load_snapshots(paths: Iterable[str]) -> List[Dict[str, Any]]:
+    """读取硬件快照，参数可以是文件或包含 *.json 的目录"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, '*.json'))))
+        else:
+            files.append(path)
+
+    snapshots = []
+    for file in files:
+        try:
+            with open(file, 'r', encoding='utf-8') as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"跳过无法读取的快照 {file}: {str(e)}")
+            continue
+        snapshot.setdefault('hostname', os.path.splitext(os.path.basename(file))[0])
+        snapshots.append(snapshot)
+    return snapshots
+
+
+def host_capacity(snapshot: Dict[str, Any]) -> tuple:
+    """从快照中提取 (显存, 内存, 可用磁盘)，单位GB，缺失的探测项按0计"""
+    gpu_info = snapshot.get('gpu_info') or {}
+    memory_info = snapshot.get('memory_info') or {}
+    disk_info = snapshot.get('disk_info') or {}
+    return (
+        float(gpu_info.get('total_memory') or 0.0),
+        float(memory_info.get('total') or 0.0),
+        float(disk_info.get('free') or 0.0),
+    )
+
+
+class FleetMatrix:
+    """主机 x 模型 的适配矩阵
+
+    fits[h, m]      是否满足全部要求
+    limiting[h, m]  余量比例最小的资源在 RESOURCES 中的下标
+    headroom[h, m]  该资源的剩余量（GB），负数表示缺口
+    ratio[h, m]     该资源的 可用/需求 比例
+    """
+
+    def __init__(self, hosts: List[str], models: List[str],
+                 capacity: np.ndarray, requirements: np.ndarray):
+        self.hosts = hosts
+        self.models = models
+        self.capacity = capacity          # (H, R)
+        self.requirements = requirements  # (M, R)
+
+        cap = capacity[:, None, :]
+        req = requirements[None, :, :]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratios = np.where(req > 0, cap / req, np.inf)   # (H, M, R)
+        self.limiting = ratios.argmin(axis=2)
+        self.ratio = np.take_along_axis(ratios, self.limiting[..., None], axis=2)[..., 0]
+        margins = cap - req
+        self.headroom = np.take_along_axis(margins, self.limiting[..., None], axis=2)[..., 0]
+        self.fits = (margins >= 0).all(axis=2)
+
+    def limiting_resource(self, host_index: int, model_index: int) -> str:
+        return RESOURCES[self.limiting[host_index, model_index]]
+
+    def hosts_for(self, model_name: str) -> List[str]:
+        """能运行指定模型的主机"""
+        column = self.fits[:, self.models.index(model_name)]
+        return [self.hosts[i] for i in np.flatnonzero(column)]
+
+    def largest_fit(self) -> List[Optional[str]]:
+        """每台主机能运行的需求最高的模型（按显存、内存、磁盘排序）"""
+        order = np.lexsort(self.requirements.T[::-1])
+        ordered = self.fits[:, order]
+        last = len(order) - 1 - ordered[:, ::-1].argmax(axis=1)
+        return [self.models[order[i]] if any_fit else None
+                for i, any_fit in zip(last, ordered.any(axis=1))]
+
+    def to_rows(self) -> List[Dict[str, Any]]:
+        """展开为逐单元格的记录，便于导出CSV/JSON"""
+        rows = []
+        for h, host in enumerate(self.hosts):
+            for m, model in enumerate(self.models):
+                rows.append({
+                    'host': host,
+                    'model': model,
+                    'fits': bool(self.fits[h, m]),
+                    'limiting_resource': RESOURCES[self.limiting[h, m]],
+                    'headroom_gb': round(float(self.headroom[h, m]), 2),
+                    'ratio': round(float(self.ratio[h, m]), 3),
+                })
+        return rows
+
+    def summary(self) -> Dict[str, int]:
+        """每个模型可运行的主机数量"""
+        return {model: int(count) for model, count in zip(self.models, self.fits.sum(axis=0))}
+
+    def report(self) -> str:
+        """生成文本报告"""
+        lines = [f"主机数: {len(self.hosts)}, 模型数: {len(self.models)}"]
+        for model, count in self.summary().items():
+            lines.append(f"  {model}: {count}/{len(self.hosts)} 台主机满足要求")
+        blockers = np.bincount(self.limiting[~self.fits], minlength=len(RESOURCES))
+        for resource, count in zip(RESOURCES, blockers):
+            if count:
+                lines.append(f"  受 {RESOURCE_LABELS[resource]} 限制的组合: {int(count)}")
+        return "\n".join(lines)
+
+
+def evaluate_fleet(snapshots: List[Dict[str, Any]], models: Dict[str, Dict[str, Any]]) -> FleetMatrix:
+    """一次性计算所有主机对所有模型的适配情况"""
+    hosts = [snapshot.get('hostname', f"host-{i}") for i, snapshot in enumerate(snapshots)]
+    capacity = np.array([host_capacity(s) for s in snapshots], dtype=np.float64).reshape(-1, len(RESOURCES))
+    model_names = list(models)
+    # 兼容 ram_required 等旧字段名
+    normalized = [normalize_requirements(models[name]) for name in model_names]
+    requirements = np.array(
+        [[req[resource] for resource in RESOURCES] for req in normalized],
+        dtype=np.float64,
+    ).reshape(-1, len(RESOURCES))
+    return FleetMatrix(hosts, model_names, capacity, requirements)
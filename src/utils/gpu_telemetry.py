@@ -0,0 +1,243 @@
+import time
+import logging
+import warnings
+import threading
+import subprocess
+import numpy as np
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# nvidia-smi 查询字段与环形缓冲区中的列一一对应（index 和末尾的 name 单独处理）
+QUERY_FIELDS = ('memory.used', 'memory.total', 'utilization.gpu', 'temperature.gpu', 'power.draw')
+FIELDS = ('memory_used', 'memory_total', 'utilization', 'temperature', 'power')
+
+
+class TelemetryRing:
+    """预分配的定长环形缓冲区，按采样时刻保存所有GPU的指标"""
+
+    def __init__(self, capacity: int = 1200, max_gpus: int = 16):
+        self.capacity = capacity
+        self.max_gpus = max_gpus
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.values = np.full((capacity, max_gpus, len(FIELDS)), np.nan, dtype=np.float32)
+        self.gpu_count = 0
+        self.head = 0   # 下一次写入的位置
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def append(self, timestamp: float, sample: np.ndarray) -> None:
+        """写入一次采样，sample 形状为 (GPU数, 字段数)"""
+        gpus = min(sample.shape[0], self.max_gpus)
+        with self._lock:
+            slot = self.head
+            self.timestamps[slot] = timestamp
+            self.values[slot, :gpus] = sample[:gpus]
+            self.values[slot, gpus:] = np.nan
+            self.gpu_count = max(self.gpu_count, gpus)
+            self.head = (slot + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+
+    def _ordered_slots(self) -> np.ndarray:
+        start = (self.head - self.count) % self.capacity
+        return (start + np.arange(self.count)) % self.capacity
+
+    def latest(self) -> Optional[Tuple[float, np.ndarray]]:
+        """最近一次采样 (时间戳, (GPU数, 字段数))"""
+        with self._lock:
+            if not self.count:
+                return None
+            slot = (self.head - 1) % self.capacity
+            return float(self.timestamps[slot]), self.values[slot, :self.gpu_count].copy()
+
+    def window(self, seconds: Optional[float] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """最近 seconds 秒内的采样，按时间顺序返回副本"""
+        with self._lock:
+            slots = self._ordered_slots()
+            timestamps = self.timestamps[slots]
+            values = self.values[slots, :self.gpu_count]
+        if seconds is not None and len(timestamps):
+            keep = timestamps >= timestamps[-1] - seconds
+            timestamps, values = timestamps[keep], values[keep]
+        return timestamps, values
+
+
+def _split(line: str) -> List[str]:
+    # 名称放在最后，其中可能含有逗号
+    return [part.strip() for part in line.split(',', len(QUERY_FIELDS) + 1)]
+
+
+def parse_line(line: str) -> Optional[Tuple[int, List[float]]]:
+    """解析一行 CSV 输出，返回 (GPU序号, 各字段值)，[N/A] 记为 NaN"""
+    parts = _split(line)
+    if len(parts) < len(QUERY_FIELDS) + 1:
+        return None
+    try:
+        index = int(parts[0])
+    except ValueError:
+        return None
+    values = []
+    for part in parts[1:len(QUERY_FIELDS) + 1]:
+        try:
+            values.append(float(part))
+        except ValueError:
+            values.append(float('nan'))
+    return index, values
+
+
+class GpuTelemetry:
+    """常驻的 nvidia-smi 采样进程，把指标写入环形缓冲区并通知订阅者
+
+    只启动一个 `nvidia-smi --query-gpu=... -lms N` 进程，避免每次查询都
+    创建新进程。订阅回调在读取线程中执行，应尽量轻量。
+    """
+
+    def __init__(self, interval_ms: int = 500, capacity: int = 1200, max_gpus: int = 16,
+                 command: str = 'nvidia-smi'):
+        self.interval_ms = interval_ms
+        self.command = command
+        self.ring = TelemetryRing(capacity, max_gpus)
+        self._subscribers: Dict[int, Callable[[float, np.ndarray], None]] = {}
+        self._next_token = 0
+        self._lock = threading.Lock()
+        self._process: Optional[subprocess.Popen] = None
+        self._thread: Optional[threading.Thread] = None
+        self._sampled = threading.Event()
+        self.names: Dict[int, str] = {}
+
+    @property
+    def running(self) -> bool:
+        return self._process is not None and self._process.poll() is None
+
+    def start(self) -> bool:
+        """启动采样进程，nvidia-smi 不可用时返回False"""
+        if self.running:
+            return True
+        cmd = [self.command, f"--query-gpu=index,{','.join(QUERY_FIELDS)},name",
+               '--format=csv,noheader,nounits', '-lms', str(self.interval_ms)]
+        try:
+            self._process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                                             text=True, bufsize=1)
+        except (FileNotFoundError, PermissionError) as e:
+            logger.warning(f"无法启动GPU监控: {str(e)}")
+            self._process = None
+            return False
+        self._thread = threading.Thread(target=self._read_loop, name="gpu-telemetry", daemon=True)
+        self._thread.start()
+        logger.info(f"GPU监控已启动，采样间隔 {self.interval_ms}ms")
+        return True
+
+    def stop(self) -> None:
+        process, self._process = self._process, None
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+
+    def __enter__(self) -> 'GpuTelemetry':
+        self.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def subscribe(self, callback: Callable[[float, np.ndarray], None]) -> Callable[[], None]:
+        """订阅每次完整采样，返回取消订阅的函数"""
+        with self._lock:
+            token = self._next_token
+            self._next_token += 1
+            self._subscribers[token] = callback
+
+        def unsubscribe() -> None:
+            with self._lock:
+                self._subscribers.pop(token, None)
+        return unsubscribe
+
+    def _publish(self, rows: Dict[int, List[float]]) -> None:
+        timestamp = time.time()
+        sample = np.full((max(rows) + 1, len(FIELDS)), np.nan, dtype=np.float32)
+        for index, values in rows.items():
+            sample[index] = values
+        self.ring.append(timestamp, sample)
+        self._sampled.set()
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+        for callback in subscribers:
+            try:
+                callback(timestamp, sample)
+            except Exception as e:
+                logger.warning(f"GPU监控订阅回调出错: {str(e)}")
+
+    def _read_loop(self) -> None:
+        process = self._process
+        rows: Dict[int, List[float]] = {}
+        for line in process.stdout:
+            parsed = parse_line(line)
+            if parsed is None:
+                continue
+            index, values = parsed
+            parts = _split(line)
+            if len(parts) > len(QUERY_FIELDS) + 1 and parts[-1]:
+                self.names[index] = parts[-1]
+            # 每轮采样按GPU序号依次输出，序号回到已出现过的值说明新一轮开始
+            if index in rows:
+                self._publish(rows)
+                rows = {}
+            rows[index] = values
+            if len(rows) == self.ring.gpu_count:
+                self._publish(rows)
+                rows = {}
+        if rows:
+            self._publish(rows)
+
+    def latest(self) -> Optional[Tuple[float, np.ndarray]]:
+        return self.ring.latest()
+
+    def wait_for_sample(self, timeout: float) -> bool:
+        """等待第一次完整采样，刚启动时用"""
+        return self._sampled.wait(timeout)
+
+    def gpu_info(self) -> Optional[Dict[str, Any]]:
+        """最近一次采样换算成 SystemChecker 的 gpu_info 格式（显存单位GB），没有采样时返回None"""
+        latest = self.latest()
+        if latest is None:
+            return None
+        _, sample = latest
+        gpus = []
+        for index, row in enumerate(sample):
+            total = float(row[FIELDS.index('memory_total')])
+            if not np.isnan(total):
+                gpus.append({'name': self.names.get(index, 'NVIDIA GPU'), 'memory': total / 1024})  # MiB -> GB
+        if not gpus:
+            return None
+        return {
+            'name': gpus[0]['name'],
+            'count': len(gpus),
+            'total_memory': sum(gpu['memory'] for gpu in gpus),
+            'gpus': gpus,
+        }
+
+    def summary(self, seconds: Optional[float] = None) -> List[Dict[str, float]]:
+        """每块GPU在时间窗口内的平均值和峰值"""
+        _, values = self.ring.window(seconds)
+        if not len(values):
+            return []
+        with warnings.catch_warnings():
+            # 全部为NaN的列（例如不支持功耗读数的GPU）会触发 RuntimeWarning
+            warnings.simplefilter('ignore', RuntimeWarning)
+            means = np.nanmean(values, axis=0)
+            peaks = np.nanmax(values, axis=0)
+        result = []
+        for gpu in range(values.shape[1]):
+            item = {'index': gpu}
+            for f, name in enumerate(FIELDS):
+                item[f'{name}_avg'] = float(means[gpu, f])
+                item[f'{name}_max'] = float(peaks[gpu, f])
+            result.append(item)
+        return result
+
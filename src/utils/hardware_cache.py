@@ -0,0 +1,107 @@
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from .probes import ProbeResult
+
+logger = logging.getLogger(__name__)
+
+# 各字段的缓存时间（秒）：硬件型号等静态信息缓存较久，可用内存和磁盘变化快
+DEFAULT_FIELD_TTLS = {
+    'os_info': 24 * 3600.0,
+    'cpu_info': 24 * 3600.0,
+    'gpu_info': 600.0,
+    'cuda_info': 600.0,
+    'memory_info': 5.0,
+    'disk_info': 10.0,
+}
+
+
+def scoped_field(name: str, scope: str) -> str:
+    """带作用域的缓存键，例如按目录区分的 disk_info@/data/models"""
+    return f"{name}@{scope}"
+
+
+def _field_name(key: str) -> str:
+    return key.split('@', 1)[0]
+
+
+class HardwareSnapshotCache:
+    """按字段缓存系统探测结果，过期字段在下次读取时重新探测
+
+    与参数相关的字段（如某个目录所在卷的磁盘信息）使用 scoped_field() 生成的键，
+    过期时间按字段名查找，invalidate(字段名) 同时清除该字段所有作用域的缓存。
+    """
+
+    def __init__(self, ttls: Optional[Dict[str, float]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.ttls = dict(DEFAULT_FIELD_TTLS, **(ttls or {}))
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[str, tuple] = {}  # 字段 -> (过期时间, ProbeResult)
+        self._lock = threading.Lock()
+
+    def store(self, results: Dict[str, ProbeResult]) -> None:
+        """保存探测结果，失败或超时的结果不缓存"""
+        now = self.clock()
+        with self._lock:
+            for name, result in results.items():
+                if result.ok:
+                    self._entries[name] = (now + self.ttls.get(_field_name(name), 0.0), result)
+
+    def snapshot(self, fields: Iterable[str],
+                 probe: Callable[[list], Dict[str, ProbeResult]]) -> Dict[str, ProbeResult]:
+        """返回所有字段的结果，只对过期或缺失的字段调用 probe"""
+        fields = list(fields)
+        # 持锁探测，避免多个调用方同时对同一批字段重复探测
+        with self._lock:
+            now = self.clock()
+            fresh = {name: entry[1] for name, entry in self._entries.items()
+                     if name in fields and entry[0] > now}
+            stale = [name for name in fields if name not in fresh]
+            self.hits += len(fresh)
+            self.misses += len(stale)
+
+            results = dict(fresh)
+            if stale:
+                probed = probe(stale)
+                now = self.clock()
+                for name, result in probed.items():
+                    if result.ok:
+                        self._entries[name] = (now + self.ttls.get(_field_name(name), 0.0), result)
+                results.update(probed)
+        return {name: results[name] for name in fields}
+
+    def invalidate(self, *fields: str) -> None:
+        """使指定字段失效，不指定时清空全部缓存"""
+        with self._lock:
+            if not fields:
+                self._entries.clear()
+            for name in fields:
+                for key in [key for key in self._entries if key == name or _field_name(key) == name]:
+                    del self._entries[key]
+        logger.debug(f"硬件信息缓存失效: {', '.join(fields) or '全部'}")
+
+    def stats(self) -> Dict[str, Any]:
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+            'entries': len(self._entries),
+        }
+
+
+_shared_cache: Optional[HardwareSnapshotCache] = None
+_shared_lock = threading.Lock()
+
+
+def get_snapshot_cache() -> HardwareSnapshotCache:
+    """进程内共享的硬件信息缓存"""
+    global _shared_cache
+    with _shared_lock:
+        if _shared_cache is None:
+            _shared_cache = HardwareSnapshotCache()
+        return _shared_cache
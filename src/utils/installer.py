@@ -1,26 +1,76 @@
 import os
 import logging
 import subprocess
-import docker
-import requests
 import platform
 import tempfile
-from typing import Callable, Optional
+import threading
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
 from pathlib import Path
+from .hardware_cache import get_snapshot_cache
+from .tracing import span, traced
+
+if TYPE_CHECKING:
+    from .ollama_pull import PullProgress
+
+# docker、aiohttp、requests、numpy 的导入耗时较长，只在实际用到时导入，
+# 避免拖慢界面启动
+
+# 安装后预热时，安装进度映射到 0..90，预热占 90..100
+WARMUP_PROGRESS_START = 90
 
 class ModelInstaller:
-    def __init__(self):
+    def __init__(self, ollama_host: Optional[str] = None):
         self.logger = logging.getLogger(__name__)
         self.platform = platform.system().lower()
-        
-        # 根据平台设置Docker客户端
-        if self.platform == "darwin":
-            # macOS上Docker Desktop的默认socket路径
+        self.ollama_host = ollama_host
+        self.last_io_summary: Optional[Dict[str, object]] = None
+        self.last_warmup: Optional[Dict[str, object]] = None
+        self._client = None
+        self._ollama = None
+        self._puller = None
+        self._inventory = None
+
+    @property
+    def client(self):
+        """Docker客户端，首次使用时才连接，连接失败时下次再试"""
+        if self._client is None:
+            import docker
+            # macOS上Docker Desktop的默认socket路径，设置了DOCKER_HOST时以环境变量为准
             docker_socket = os.path.expanduser('~/.docker/run/docker.sock')
-            self.client = docker.DockerClient(base_url=f'unix://{docker_socket}')
-        else:
-            self.client = docker.from_env()
+            if self.platform == "darwin" and not os.environ.get('DOCKER_HOST') and os.path.exists(docker_socket):
+                self._client = docker.DockerClient(base_url=f'unix://{docker_socket}')
+            else:
+                self._client = docker.from_env()
+        return self._client
+
+    @property
+    def ollama(self):
+        """共用连接池的Ollama服务客户端"""
+        if self._ollama is None:
+            from .ollama_client import OllamaClient
+            self._ollama = OllamaClient(self.ollama_host)
+        return self._ollama
+
+    @property
+    def inventory(self):
+        """已安装模型的缓存快照，清单目录变化时才重新读取"""
+        if self._inventory is None:
+            from .inventory import ModelInventory
+            self._inventory = ModelInventory(self.ollama)
+        return self._inventory
+
+    @property
+    def puller(self):
+        if self._puller is None:
+            self._puller = self.ollama.puller()
+        return self._puller
 
+    def abort_downloads(self) -> None:
+        """断开进行中的拉取连接，与 cancel_event 一起使用，取消不必等到下一条进度"""
+        if self._puller is not None:
+            self._puller.abort()
+
+    @traced()
     def check_docker(self) -> bool:
         """检查Docker是否已安装并运行"""
         try:
@@ -30,8 +80,16 @@ class ModelInstaller:
             self.logger.error(f"Docker检查失败: {str(e)}")
             return False
 
+    @traced()
     def check_ollama(self) -> bool:
-        """检查Ollama是否已安装"""
+        """检查Ollama是否已安装
+
+        优先通过HTTP接口检查服务，服务未运行时再检查命令行程序是否存在。
+        """
+        version = self.ollama.version()
+        if version is not None:
+            self.logger.debug(f"Ollama服务版本: {version}")
+            return True
         try:
             cmd = "ollama.exe" if self.platform == "windows" else "ollama"
             result = subprocess.run([cmd, '--version'], capture_output=True, text=True)
@@ -89,11 +147,122 @@ sudo ollama serve
             return False
 
     def install_model(self, model_name: str, install_path: str, 
-                     progress_callback: Optional[Callable[[int, str], None]] = None) -> bool:
-        """安装指定的模型"""
-        try:
+                     progress_callback: Optional[Callable[[int, str], None]] = None,
+                     backend: str = "api", registry_url: Optional[str] = None,
+                     cancel_event: Optional[threading.Event] = None, warmup: bool = False) -> bool:
+        """安装指定的模型
+
+        backend 为 "api" 时通过Ollama服务拉取；为 "registry" 时直接从模型仓库
+        分块下载到 install_path（Ollama模型目录），支持断点续传。
+        安装期间采样网络和目标磁盘的吞吐量，汇总保存在 last_io_summary。
+        设置 cancel_event 可在其他线程中取消安装，已下载的数据保留用于续传。
+        warmup 为True时安装成功后预热模型（见 warm_up）。
+        """
+        with span('install_model', model=model_name, backend=backend) as current:
             # 确保安装目录存在
-            Path(install_path).mkdir(parents=True, exist_ok=True)
+            try:
+                Path(install_path).mkdir(parents=True, exist_ok=True)
+            except OSError as e:
+                self.logger.error(f"安装模型失败: {str(e)}")
+                if progress_callback:
+                    progress_callback(0, f"安装失败: {str(e)}")
+                current.outcome = 'failed'
+                current.error = str(e)
+                return False
+
+            from .io_monitor import ThroughputMonitor
+            from .ollama_pull import PullProgress
+            monitor = ThroughputMonitor(install_path).start()
+            if progress_callback:
+                progress_callback = monitor.wrap_callback(progress_callback)
+            install_callback = progress_callback
+            if progress_callback and warmup:
+                # 预热占进度条的最后一段，安装完成后进度不回退
+                install_callback = lambda percent, message: progress_callback(
+                    percent * WARMUP_PROGRESS_START // 100, message)
+            pull_progress = PullProgress()
+            try:
+                success = self._install_model(model_name, install_path, install_callback, backend,
+                                              registry_url, cancel_event, pull_progress)
+            finally:
+                monitor.stop()
+                self.last_io_summary = monitor.summary()
+                self.logger.info(monitor.describe_summary())
+                self._trace_io(current, self.last_io_summary, pull_progress)
+            if not success:
+                current.outcome = 'cancelled' if cancel_event is not None and cancel_event.is_set() else 'failed'
+            if success and warmup:
+                with span('warm_up', model=model_name):
+                    self.warm_up(model_name, install_path, progress_callback,
+                                 progress_range=(WARMUP_PROGRESS_START, 100), cancel_event=cancel_event)
+            return success
+
+    @staticmethod
+    def _trace_io(current, summary: Dict[str, object], pull_progress: 'PullProgress') -> None:
+        """字节数取自拉取进度（本模型完成的字节），磁盘写入取自计数器差值"""
+        current.add_bytes(pull_progress.completed_bytes)
+        if summary.get('samples'):
+            current.set(disk_write_bytes=summary['disk_write_bytes'], net_rx_p95=summary['net_rx_p95'])
+
+    def warm_up(self, model_name: str, install_path: Optional[str] = None,
+                progress_callback: Optional[Callable[[int, str], None]] = None,
+                progress_range: Tuple[int, int] = (0, 100),
+                cancel_event: Optional[threading.Event] = None) -> Dict[str, object]:
+        """把模型文件预读到页缓存并让Ollama预加载，结果保存在 last_warmup
+
+        预热失败不影响已完成的安装，只记录警告。
+        """
+        from .disk_preflight import default_models_path
+        from .warmup import ModelWarmer
+        paths = [install_path, default_models_path()] if install_path else [default_models_path()]
+        warmer = ModelWarmer(self.ollama, paths, progress_callback=progress_callback,
+                             progress_range=progress_range, cancel_event=cancel_event)
+        try:
+            self.last_warmup = warmer.warm(model_name)
+        except OSError as e:
+            self.last_warmup = {'model': model_name, 'error': str(e)}
+        if 'error' in self.last_warmup:
+            self.logger.warning(f"预热模型 {model_name} 失败: {self.last_warmup['error']}")
+        return self.last_warmup
+
+    def export_models(self, model_names: List[str], output, install_path: Optional[str] = None,
+                      progress_callback: Optional[Callable[[int, str], None]] = None,
+                      cancel_event: Optional[threading.Event] = None) -> Dict[str, object]:
+        """把已安装的模型导出为模型包（文件路径或文件描述符），用于离线主机"""
+        from .bundle import BundleExporter
+        from .model_store import ModelStore
+        exporter = BundleExporter(ModelStore(install_path), progress_callback, cancel_event)
+        return exporter.export(model_names, output)
+
+    def import_bundle(self, source, install_path: Optional[str] = None, models: Optional[List[str]] = None,
+                      progress_callback: Optional[Callable[[int, str], None]] = None,
+                      cancel_event: Optional[threading.Event] = None) -> Dict[str, object]:
+        """从模型包导入模型，已存在的blob跳过，写入时校验哈希"""
+        from .bundle import BundleImporter
+        from .model_store import ModelStore
+        importer = BundleImporter(ModelStore(install_path), progress_callback, cancel_event)
+        try:
+            return importer.import_bundle(source, models)
+        finally:
+            get_snapshot_cache().invalidate('disk_info')
+            self.inventory.invalidate()
+
+    def _install_model(self, model_name: str, install_path: str,
+                       progress_callback: Optional[Callable[[int, str], None]],
+                       backend: str, registry_url: Optional[str],
+                       cancel_event: Optional[threading.Event],
+                       pull_progress: Optional['PullProgress'] = None) -> bool:
+        from .ollama_pull import PullCancelled, PullError
+        from .blob_downloader import BlobDownloadCancelled
+        try:
+            if backend == "registry":
+                self._install_from_registry(model_name, install_path, progress_callback, registry_url,
+                                            cancel_event, pull_progress)
+                get_snapshot_cache().invalidate('disk_info')
+                self.inventory.invalidate()
+                if progress_callback:
+                    progress_callback(100, "安装完成")
+                return True
 
             if progress_callback:
                 progress_callback(0, "正在检查环境...")
@@ -108,43 +277,157 @@ sudo ollama serve
                 if not self.install_ollama(progress_callback):
                     raise Exception("Ollama安装失败")
 
+            # 按模型目录所在卷检查空间，不足时立即失败
+            self.preflight(model_name, install_path)
+
             if progress_callback:
                 progress_callback(30, f"正在下载模型 {model_name}...")
 
-            # 使用Ollama下载模型
-            cmd = ["ollama.exe" if self.platform == "windows" else "ollama", "pull", model_name]
-            result = subprocess.run(cmd, capture_output=True, text=True)
-
-            if result.returncode != 0:
-                raise Exception(f"模型下载失败: {result.stderr}")
+            # 通过Ollama HTTP API流式下载模型
+            try:
+                self.puller.pull(model_name, progress_callback, progress_range=(30, 90),
+                                 cancel_event=cancel_event, progress=pull_progress)
+            except PullCancelled:
+                raise
+            except PullError as e:
+                raise Exception(f"模型下载失败: {str(e)}")
 
             if progress_callback:
                 progress_callback(90, "正在完成安装...")
 
             # 验证模型是否成功安装
-            cmd = ["ollama.exe" if self.platform == "windows" else "ollama", "list"]
-            verify_result = subprocess.run(cmd, capture_output=True, text=True)
-
-            if model_name not in verify_result.stdout:
+            if not self.ollama.has_model(model_name):
                 raise Exception("模型安装验证失败")
 
+            # 模型占用了磁盘空间，缓存的磁盘信息和已安装列表已过时
+            get_snapshot_cache().invalidate('disk_info')
+            self.inventory.invalidate()
+
             if progress_callback:
                 progress_callback(100, "安装完成")
 
             return True
 
+        except (PullCancelled, BlobDownloadCancelled):
+            self.logger.info(f"模型 {model_name} 安装已取消")
+            if progress_callback:
+                progress_callback(0, "安装已取消")
+            return False
         except Exception as e:
             self.logger.error(f"安装模型失败: {str(e)}")
             if progress_callback:
                 progress_callback(0, f"安装失败: {str(e)}")
             return False
 
+    def preflight(self, model_name: str, install_path: str):
+        """检查 install_path 所在卷是否放得下模型，空间不足时抛出 InsufficientDiskSpace
+
+        同步过模型目录（见 catalog_sync）时按清单中的blob计算，已存在的blob不计入；
+        否则按配置中的 disk_space 估计。两者都没有时从模型仓库获取清单，
+        仍无法得知大小时跳过检查并返回None。
+        """
+        from .disk_preflight import GB, DiskPreflight
+        from .manifest_cache import ManifestCache
+        from .model_store import ModelStore
+        preflight = DiskPreflight(ModelStore(install_path))
+        manifests = ManifestCache()
+        entry = manifests.get(model_name)
+        if not entry:
+            from .config_loader import ConfigLoader
+            from .model_catalog import normalize_requirements
+            requirements = ConfigLoader().get_available_models().get(model_name, {})
+            disk_space = normalize_requirements(requirements)['disk_space']
+            if disk_space > 0:
+                return preflight.ensure(preflight.estimate(int(disk_space * GB)))
+            from .catalog_sync import CatalogSync
+            from .registry import RegistryClient
+            CatalogSync(RegistryClient(timeout=10.0), manifests).sync([model_name])
+            entry = manifests.get(model_name)
+            if not entry:
+                self.logger.warning(f"无法确定模型 {model_name} 的大小，跳过磁盘空间检查")
+                return None
+        return preflight.ensure(preflight.plan((blob['digest'], blob['size']) for blob in entry['blobs']))
+
+    def _install_from_registry(self, model_name: str, install_path: str,
+                               progress_callback: Optional[Callable[[int, str], None]],
+                               registry_url: Optional[str],
+                               cancel_event: Optional[threading.Event] = None,
+                               pull_progress: Optional['PullProgress'] = None) -> None:
+        """不经过Ollama服务，直接下载blob和清单到模型目录"""
+        from .blob_downloader import BlobDownloadCancelled, BlobDownloader, BlobDownloadError
+        from .registry import ModelRef, RegistryClient, manifest_blobs
+        from .model_store import ModelStore
+        store = ModelStore(install_path)
+        downloader = BlobDownloader(RegistryClient(registry_url), store)
+
+        if progress_callback:
+            progress_callback(10, f"正在下载模型 {model_name}...")
+        try:
+            manifest = downloader.pull(model_name, progress_callback, progress_range=(10, 95),
+                                       cancel_event=cancel_event, progress=pull_progress)
+        except BlobDownloadCancelled:
+            raise
+        except BlobDownloadError as e:
+            raise Exception(f"模型下载失败: {str(e)}")
+
+        # 清单写入后再确认全部blob都已落盘
+        ref = ModelRef.parse(model_name)
+        if store.read_manifest(ref) is None or not all(
+                store.has_blob(digest, size) for digest, size in manifest_blobs(manifest)):
+            raise Exception("模型安装验证失败")
+
+    def install_models(self, model_names: List[str], install_path: str,
+                       progress_callback: Optional[Callable[[int, str], None]] = None,
+                       max_parallel: int = 2, bandwidth_limit: Optional[float] = None,
+                       window: Optional[str] = None,
+                       cancel_event: Optional[threading.Event] = None) -> Dict[str, bool]:
+        """并发安装多个模型
+
+        bandwidth_limit 为所有模型共享的带宽上限（字节/秒），
+        window 为允许下载的时间段，例如 "22:00-06:00"。
+        """
+        from .pull_scheduler import PullScheduler, TimeWindow
+        results = {name: False for name in model_names}
+        try:
+            Path(install_path).mkdir(parents=True, exist_ok=True)
+
+            if not self.check_docker():
+                raise Exception("Docker未运行或未安装")
+            if not self.check_ollama():
+                raise Exception("Ollama未安装")
+
+            scheduler = PullScheduler(
+                self.ollama_host,
+                max_parallel=max_parallel,
+                bandwidth_limit=bandwidth_limit,
+                window=TimeWindow.parse(window) if window else None,
+                progress_callback=progress_callback,
+                cancel_event=cancel_event,
+            )
+            stats = scheduler.run_sync(model_names)
+
+            get_snapshot_cache().invalidate('disk_info')
+            self.inventory.invalidate()
+            installed = self.get_installed_models()
+            for name, model_stats in stats.items():
+                results[name] = model_stats.status == "success" and name in installed
+                if model_stats.status == "success" and not results[name]:
+                    self.logger.error(f"模型 {name} 安装验证失败")
+            return results
+
+        except Exception as e:
+            self.logger.error(f"批量安装模型失败: {str(e)}")
+            if progress_callback:
+                progress_callback(0, f"安装失败: {str(e)}")
+            return results
+
     def uninstall_model(self, model_name: str) -> bool:
         """卸载指定的模型"""
         try:
-            cmd = ["ollama.exe" if self.platform == "windows" else "ollama", "rm", model_name]
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            return result.returncode == 0
+            removed = self.ollama.delete(model_name)
+            get_snapshot_cache().invalidate('disk_info')
+            self.inventory.invalidate()
+            return removed
         except Exception as e:
             self.logger.error(f"卸载模型失败: {str(e)}")
             return False
@@ -152,16 +435,15 @@ sudo ollama serve
     def get_installed_models(self) -> list:
         """获取已安装的模型列表"""
         try:
-            cmd = ["ollama.exe" if self.platform == "windows" else "ollama", "list"]
-            result = subprocess.run(cmd, capture_output=True, text=True)
-            if result.returncode == 0:
-                # 解析输出获取模型列表
-                models = []
-                for line in result.stdout.split('\n')[1:]:  # 跳过标题行
-                    if line.strip():
-                        models.append(line.split()[0])
-                return models
+            return self.inventory.names()
+        except Exception as e:
+            self.logger.error(f"获取已安装模型列表失败: {str(e)}")
             return []
+
+    def get_installed_model_records(self) -> list:
+        """已安装模型的名称、digest、大小和修改时间（InstalledModel）"""
+        try:
+            return self.inventory.models()
         except Exception as e:
             self.logger.error(f"获取已安装模型列表失败: {str(e)}")
-            return [] 
\ No newline at end of file
+            return []
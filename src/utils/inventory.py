@@ -0,0 +1,187 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .model_store import ModelStore
+from .ollama_client import OllamaClient, OllamaError
+from .registry import manifest_blobs
+
+logger = logging.getLogger(__name__)
+
+
+class InstalledModel:
+    """已安装的模型，对应 `ollama list` 的一行"""
+
+    __slots__ = ('name', 'digest', 'size', 'modified_at', 'source')
+
+    def __init__(self, name: str, digest: str, size: int, modified_at: float, source: str):
+        self.name = name
+        self.digest = digest            # 清单内容的sha256，与 /api/tags 中的 digest 一致
+        self.size = size                # 全部blob的总大小（字节）
+        self.modified_at = modified_at  # Unix时间戳
+        self.source = source            # disk 或 api
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self) -> str:
+        return f"InstalledModel({self.name!r}, size={self.size}, digest={self.digest[:12]!r})"
+
+
+def _parse_time(value: Optional[str]) -> float:
+    """解析 /api/tags 中的 RFC 3339 时间（可能带纳秒）"""
+    if not value:
+        return 0.0
+    value = value.replace('Z', '+00:00')
+    main, dot, rest = value.partition('.')
+    if dot:
+        # fromisoformat 在旧版本Python中最多只接受6位小数
+        digits = len(rest) - len(rest.lstrip('0123456789'))
+        value = f"{main}.{rest[:min(digits, 6)]}{rest[digits:]}"
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except ValueError:
+        return 0.0
+
+
+class ModelInventory:
+    """已安装模型的缓存快照
+
+    本地的Ollama服务直接读取磁盘上的清单，否则使用 /api/tags。快照只在
+    清单目录变化时重新读取：每隔 poll_interval 秒最多比较一次目录树的
+    mtime，间隔内的查询直接返回缓存，未变化的清单文件也不重新解析。
+    安装或卸载后调用 invalidate() 立即刷新。
+    """
+
+    def __init__(self, client: Optional[OllamaClient] = None, models_path: Optional[str] = None,
+                 source: str = 'auto', poll_interval: float = 1.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.client = client or OllamaClient()
+        self.store = ModelStore(models_path)
+        self.source = source
+        self.poll_interval = poll_interval
+        self.clock = clock
+        self._models: Dict[str, InstalledModel] = {}
+        self._signature: Optional[Tuple] = None
+        self._checked_at: Optional[float] = None
+        self._manifest_cache: Dict[str, Tuple[Tuple[int, int], InstalledModel]] = {}
+        self._lock = threading.Lock()
+        self.refreshes = 0
+
+    def _use_disk(self) -> bool:
+        if self.source != 'auto':
+            return self.source == 'disk'
+        if not (self.client.is_local and self.store.manifests_dir.is_dir()):
+            return False
+        # 服务可能使用另一个模型目录（例如Linux上以 ollama 用户运行的系统服务），
+        # 首次查询时与 /api/tags 对比一次，不一致就改用接口
+        models = self._scan_disk()
+        try:
+            consistent = set(models) == set(self._query_api())
+        except OllamaError:
+            consistent = True
+        self.source = 'disk' if consistent else 'api'
+        if not consistent:
+            logger.info(f"Ollama服务未使用模型目录 {self.store.root}，改为通过接口获取已安装模型")
+        return consistent
+
+    def _dir_signature(self) -> Tuple:
+        """清单目录树中每个目录和清单文件的 mtime
+
+        新增、删除或原子替换清单会改变目录的 mtime，原地改写清单会改变文件的 mtime。
+        """
+        entries = []
+        for dirpath, dirnames, filenames in os.walk(self.store.manifests_dir):
+            dirnames.sort()
+            for name in [''] + sorted(filenames):
+                try:
+                    stat = os.stat(os.path.join(dirpath, name) if name else dirpath)
+                except OSError:
+                    continue
+                entries.append((dirpath, name, stat.st_mtime_ns, stat.st_size))
+        return tuple(entries)
+
+    def _read_manifest(self, name: str, path: str) -> Optional[InstalledModel]:
+        """读取单个清单，文件未变化时复用上次的结果"""
+        try:
+            stat = os.stat(path)
+            key = (stat.st_mtime_ns, stat.st_size)
+            cached = self._manifest_cache.get(path)
+            if cached is not None and cached[0] == key:
+                return cached[1]
+            with open(path, 'rb') as f:
+                raw = f.read()
+            size = sum(size for _, size in manifest_blobs(json.loads(raw)))
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"跳过无法读取的模型清单 {path}: {str(e)}")
+            return None
+        model = InstalledModel(name, hashlib.sha256(raw).hexdigest(), size, stat.st_mtime, 'disk')
+        self._manifest_cache[path] = (key, model)
+        return model
+
+    def _scan_disk(self) -> Dict[str, InstalledModel]:
+        models = {}
+        seen = set()
+        for ref, path in self.store.iter_manifests():
+            seen.add(str(path))
+            model = self._read_manifest(ref.short_name, str(path))
+            if model is not None:
+                models[model.name] = model
+        for path in set(self._manifest_cache) - seen:
+            del self._manifest_cache[path]
+        return models
+
+    def _query_api(self) -> Dict[str, InstalledModel]:
+        models = {}
+        for entry in self.client.list_models():
+            name = entry.get('name') or entry.get('model')
+            models[name] = InstalledModel(name, entry.get('digest', ''), int(entry.get('size') or 0),
+                                          _parse_time(entry.get('modified_at')), 'api')
+        return models
+
+    def _refresh(self) -> None:
+        now = self.clock()
+        if self._checked_at is not None and now - self._checked_at < self.poll_interval:
+            return
+        if self._use_disk():
+            signature = self._dir_signature()
+            if signature != self._signature:
+                self._models = self._scan_disk()
+                self._signature = signature
+                self.refreshes += 1
+        else:
+            # 远程服务没有可监视的目录，按轮询间隔重新查询；查询失败时下次重试
+            self._models = self._query_api()
+            self._signature = None
+            self.refreshes += 1
+        self._checked_at = now
+
+    def models(self) -> List[InstalledModel]:
+        """已安装的模型，按名称排序；服务不可用时抛出 OllamaError"""
+        with self._lock:
+            self._refresh()
+            return [self._models[name] for name in sorted(self._models)]
+
+    def names(self) -> List[str]:
+        return [model.name for model in self.models()]
+
+    def get(self, model_name: str) -> Optional[InstalledModel]:
+        if ':' not in model_name.rsplit('/', 1)[-1]:
+            model_name += ':latest'
+        with self._lock:
+            self._refresh()
+            return self._models.get(model_name)
+
+    def __contains__(self, model_name: str) -> bool:
+        return self.get(model_name) is not None
+
+    def invalidate(self) -> None:
+        """下次查询时立即重新读取"""
+        with self._lock:
+            self._checked_at = None
+            self._signature = None
@@ -0,0 +1,252 @@
+import os
+import time
+import logging
+import threading
+import psutil
+import numpy as np
+from typing import Callable, Dict, List, Optional, Tuple
+
+from .disk_preflight import find_mount
+from .ollama_pull import format_bytes
+
+logger = logging.getLogger(__name__)
+
+# 回环、容器网桥和虚拟网卡：容器中的下载流量经过物理网卡后还会经过这些网卡，重复计数
+VIRTUAL_INTERFACE_PREFIXES = ('lo', 'docker', 'br-', 'veth', 'virbr', 'vnet', 'vmnet', 'vboxnet', 'cni',
+                              'flannel', 'cali', 'kube', 'podman', 'vethernet', 'loopback')
+
+
+def physical_interfaces(names) -> List[str]:
+    """去掉回环和虚拟网卡；全部被排除时（如容器内只有veth）保留除回环外的网卡"""
+    names = list(names)
+    physical = [name for name in names if not name.lower().startswith(VIRTUAL_INTERFACE_PREFIXES)]
+    if physical:
+        return physical
+    return [name for name in names if not name.lower().startswith(('lo', 'loopback'))]
+
+
+def resolve_disk_device(path: str) -> Tuple[Optional[str], Optional[str]]:
+    """找到 path 所在的挂载点及其在 disk_io_counters 中的设备名"""
+    best = find_mount(path)
+    if best is None:
+        return None, None
+
+    device = best.device
+    if device.startswith('/dev/'):
+        # /dev/mapper/xxx 等符号链接指向 /dev/dm-N
+        device = os.path.basename(os.path.realpath(device))
+    return best.mountpoint, device
+
+
+class ThroughputMonitor:
+    """安装期间采样网络接收速度和目标磁盘写入速度
+
+    采样结果写入预分配的数组（环形缓冲区），采样线程只做计数器差分，
+    10Hz 采样的开销可以忽略。环形缓冲区只保留最近 capacity 个采样，
+    整个安装过程的总字节数由 start() 和 stop() 时的计数器差值得到。
+    """
+
+    def __init__(self, path: str, interval: float = 0.1, capacity: int = 6000):
+        self.path = path
+        self.interval = interval
+        self.capacity = capacity
+        self.mountpoint, self.device = resolve_disk_device(path)
+        disks = psutil.disk_io_counters(perdisk=True) or {}
+        if self.device not in disks:
+            # 容器中的 overlay 等文件系统没有对应的块设备，退化为统计所有磁盘
+            self.device = None
+        nics = psutil.net_io_counters(pernic=True) or {}
+        self.interfaces: List[str] = physical_interfaces(nics)
+
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        self.net_rx = np.zeros((capacity, max(len(self.interfaces), 1)), dtype=np.float64)
+        self.disk_write = np.zeros(capacity, dtype=np.float64)
+        self.disk_busy = np.full(capacity, np.nan, dtype=np.float64)
+        self.head = 0
+        self.count = 0
+        self.started_at: Optional[float] = None
+        self.stopped_at: Optional[float] = None
+        self._start_counters: Optional[Tuple[np.ndarray, int, Optional[int]]] = None
+        self._stop_counters: Optional[Tuple[np.ndarray, int, Optional[int]]] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _read_counters(self) -> Tuple[np.ndarray, int, Optional[int]]:
+        nics = psutil.net_io_counters(pernic=True)
+        rx = np.array([nics[name].bytes_recv if name in nics else 0 for name in self.interfaces] or [0],
+                      dtype=np.float64)
+        if self.device:
+            disk = psutil.disk_io_counters(perdisk=True).get(self.device)
+        else:
+            disk = psutil.disk_io_counters()
+        if disk is None:
+            return rx, 0, None
+        # busy_time 只在 Linux/FreeBSD 上提供
+        return rx, disk.write_bytes, getattr(disk, 'busy_time', None)
+
+    def _run(self) -> None:
+        previous_time = time.monotonic()
+        previous = self._read_counters()
+        while not self._stop.wait(self.interval):
+            now = time.monotonic()
+            current = self._read_counters()
+            elapsed = now - previous_time
+            if elapsed <= 0:
+                continue
+            rx = np.maximum(current[0] - previous[0], 0) / elapsed
+            written = max(current[1] - previous[1], 0) / elapsed
+            busy = np.nan
+            if current[2] is not None and previous[2] is not None:
+                busy = min(max(current[2] - previous[2], 0) / 1000 / elapsed, 1.0)
+            with self._lock:
+                slot = self.head
+                self.timestamps[slot] = now
+                self.net_rx[slot] = rx
+                self.disk_write[slot] = written
+                self.disk_busy[slot] = busy
+                self.head = (slot + 1) % self.capacity
+                self.count = min(self.count + 1, self.capacity)
+            previous_time, previous = now, current
+
+    def start(self) -> 'ThroughputMonitor':
+        if self._thread is None:
+            self.started_at = time.monotonic()
+            self._start_counters = self._read_counters()
+            self._stop_counters = None
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="io-monitor", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join(timeout=2)
+            self._thread = None
+            self.stopped_at = time.monotonic()
+            self._stop_counters = self._read_counters()
+
+    def __enter__(self) -> 'ThroughputMonitor':
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def _window(self, seconds: Optional[float]) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """返回时间窗口内的 (网络总接收速度, 磁盘写入速度, 磁盘忙碌比例)"""
+        with self._lock:
+            start = (self.head - self.count) % self.capacity
+            slots = (start + np.arange(self.count)) % self.capacity
+            timestamps = self.timestamps[slots]
+            rx = self.net_rx[slots].sum(axis=1)
+            written = self.disk_write[slots]
+            busy = self.disk_busy[slots]
+        if seconds is not None and len(timestamps):
+            keep = timestamps >= timestamps[-1] - seconds
+            rx, written, busy = rx[keep], written[keep], busy[keep]
+        return rx, written, busy
+
+    def rolling_average(self, seconds: float = 5.0) -> Dict[str, float]:
+        rx, written, busy = self._window(seconds)
+        if not len(rx):
+            return {'net_rx': 0.0, 'disk_write': 0.0, 'disk_busy': float('nan')}
+        return {
+            'net_rx': float(rx.mean()),
+            'disk_write': float(written.mean()),
+            'disk_busy': float(np.nanmean(busy)) if not np.isnan(busy).all() else float('nan'),
+        }
+
+    def percentiles(self, q=(50, 95, 99), seconds: Optional[float] = None) -> Dict[str, Dict[int, float]]:
+        rx, written, _ = self._window(seconds)
+        if not len(rx):
+            return {'net_rx': {}, 'disk_write': {}}
+        return {
+            'net_rx': dict(zip(q, np.percentile(rx, q).tolist())),
+            'disk_write': dict(zip(q, np.percentile(written, q).tolist())),
+        }
+
+    def per_interface(self, seconds: float = 5.0) -> Dict[str, float]:
+        """各网卡在时间窗口内的平均接收速度"""
+        with self._lock:
+            start = (self.head - self.count) % self.capacity
+            slots = (start + np.arange(self.count)) % self.capacity
+            timestamps = self.timestamps[slots]
+            rx = self.net_rx[slots]
+        if not len(timestamps):
+            return {}
+        rx = rx[timestamps >= timestamps[-1] - seconds]
+        return dict(zip(self.interfaces, rx.mean(axis=0).tolist()))
+
+    def status(self, seconds: float = 5.0) -> str:
+        """简短的实时状态，附加在进度信息后面"""
+        avg = self.rolling_average(seconds)
+        text = f"网络 {format_bytes(avg['net_rx'])}/s, 磁盘写入 {format_bytes(avg['disk_write'])}/s"
+        if not np.isnan(avg['disk_busy']):
+            text += f" (磁盘忙碌 {avg['disk_busy']:.0%})"
+        return text
+
+    def wrap_callback(self, callback: Callable[[int, str], None]) -> Callable[[int, str], None]:
+        """包装 progress_callback，在消息后附加吞吐量"""
+        def wrapped(progress: int, message: str) -> None:
+            if self.count:
+                message = f"{message} | {self.status()}"
+            callback(progress, message)
+        return wrapped
+
+    def totals(self) -> Dict[str, int]:
+        """start() 以来网络接收和目标磁盘写入的总字节数（计数器差值）"""
+        if self._start_counters is None:
+            return {'net_rx_bytes': 0, 'disk_write_bytes': 0}
+        end = self._stop_counters or self._read_counters()
+        return {
+            'net_rx_bytes': int(np.maximum(end[0] - self._start_counters[0], 0).sum()),
+            'disk_write_bytes': max(end[1] - self._start_counters[1], 0),
+        }
+
+    def summary(self) -> Dict[str, object]:
+        """整个安装过程的吞吐量汇总
+
+        总字节数和平均速度覆盖整个安装过程；P95、最大值和磁盘忙碌比例来自
+        环形缓冲区，只代表最近 window_seconds 秒。
+        """
+        rx, written, busy = self._window(None)
+        end = self.stopped_at or time.monotonic()
+        duration = end - self.started_at if self.started_at else 0.0
+        result: Dict[str, object] = {
+            'path': self.path,
+            'mountpoint': self.mountpoint,
+            'device': self.device or 'all',
+            'samples': int(len(rx)),
+            'duration': round(duration, 3),
+        }
+        if len(rx):
+            totals = self.totals()
+            result.update(totals)
+            result.update({
+                'net_rx_avg': totals['net_rx_bytes'] / duration if duration > 0 else 0.0,
+                'net_rx_p95': float(np.percentile(rx, 95)),
+                'net_rx_max': float(rx.max()),
+                'disk_write_avg': totals['disk_write_bytes'] / duration if duration > 0 else 0.0,
+                'disk_write_p95': float(np.percentile(written, 95)),
+                'disk_write_max': float(written.max()),
+                'disk_busy_avg': None if np.isnan(busy).all() else float(np.nanmean(busy)),
+                'window_seconds': round(min(duration, len(rx) * self.interval), 3),
+            })
+        return result
+
+    def describe_summary(self) -> str:
+        summary = self.summary()
+        if not summary['samples']:
+            return "吞吐量监控: 无采样数据"
+        text = (f"吞吐量汇总 ({summary['device']}, {summary['duration']:.1f}秒): "
+                f"网络 共 {format_bytes(summary['net_rx_bytes'])}, 平均 {format_bytes(summary['net_rx_avg'])}/s; "
+                f"磁盘写入 共 {format_bytes(summary['disk_write_bytes'])}, "
+                f"平均 {format_bytes(summary['disk_write_avg'])}/s; "
+                f"最近 {summary['window_seconds']:.0f}秒 P95 网络 {format_bytes(summary['net_rx_p95'])}/s, "
+                f"磁盘写入 {format_bytes(summary['disk_write_p95'])}/s")
+        if summary['disk_busy_avg'] is not None:
+            text += f"; 磁盘忙碌 {summary['disk_busy_avg']:.0%}"
+            # 磁盘接近满负荷时瓶颈在磁盘，否则在网络
+            text += ", 瓶颈: 磁盘" if summary['disk_busy_avg'] > 0.9 else ", 瓶颈: 网络"
+        return text
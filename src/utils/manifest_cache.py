@@ -0,0 +1,74 @@
+import os
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from .config_cache import default_cache_dir
+
+logger = logging.getLogger(__name__)
+
+GB = 1024 ** 3
+
+
+class ManifestCache:
+    """本地保存的模型清单摘要：ETag、各blob大小和总大小
+
+    保存在一个JSON文件中，按文件 mtime 重新读取，其他进程同步后
+    ConfigLoader 能立即看到新的磁盘需求。
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else default_cache_dir() / 'manifests.json'
+        self._entries: Dict[str, Dict[str, Any]] = {}
+        self._mtime: Optional[int] = None
+        self._lock = threading.Lock()
+
+    def _reload(self) -> None:
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            self._entries, self._mtime = {}, None
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                self._entries = json.load(f).get('models', {})
+        except (OSError, ValueError) as e:
+            logger.warning(f"读取清单缓存失败: {str(e)}")
+            self._entries = {}
+        self._mtime = mtime
+
+    def entries(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            self._reload()
+            return dict(self._entries)
+
+    @property
+    def version(self) -> Optional[int]:
+        """缓存文件的 mtime，内容变化后随之变化"""
+        with self._lock:
+            self._reload()
+            return self._mtime
+
+    def get(self, model_name: str) -> Optional[Dict[str, Any]]:
+        return self.entries().get(model_name)
+
+    def update(self, entries: Dict[str, Dict[str, Any]]) -> None:
+        """合并新条目并原子写入"""
+        with self._lock:
+            self._reload()
+            self._entries.update(entries)
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = self.path.with_name(f"{self.path.name}.{os.getpid()}.tmp")
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'models': self._entries}, f, ensure_ascii=False, indent=2, sort_keys=True)
+            os.replace(tmp, self.path)
+            self._mtime = os.stat(self.path).st_mtime_ns
+
+    def disk_space(self, model_name: str) -> Optional[float]:
+        """模型所有blob的总大小（GB）"""
+        entry = self.get(model_name)
+        return entry['size'] / GB if entry else None
@@ -0,0 +1,421 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from .blob_downloader import BlobDownloader
+from .disk_preflight import DiskPreflight, InsufficientDiskSpace
+from .model_store import ModelStore
+from .ollama_pull import format_bytes
+from .registry import (DEFAULT_REGISTRY_HOST, MANIFEST_MEDIA_TYPE, ModelRef, RegistryClient, RegistryError,
+                       manifest_blobs)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PORT = 8765
+MANIFEST_TTL = 300.0
+# 回源时的分块比普通下载小，客户端更快拿到第一批数据
+FILL_CHUNK_SIZE = 16 * 1024 * 1024
+_PATH_PATTERN = re.compile(r'^/v2/(?P<name>.+)/(?P<kind>manifests|blobs)/(?P<reference>[^/]+)$')
+_RANGE_PATTERN = re.compile(r'^bytes=(\d*)-(\d*)$')
+# OCI distribution 规范中的仓库名分段、标签和摘要语法，拒绝 '.'、'..' 和空分段
+_NAME_COMPONENT = re.compile(r'^[A-Za-z0-9]+(?:(?:[._]|__|-+)[A-Za-z0-9]+)*$')
+_TAG_PATTERN = re.compile(r'^[A-Za-z0-9_][A-Za-z0-9_.-]{0,127}$')
+_DIGEST_PATTERN = re.compile(r'^sha256:[0-9a-f]{64}$')
+
+
+class MirrorError(Exception):
+    """镜像无法提供请求的内容，status 为返回给客户端的HTTP状态码"""
+
+    def __init__(self, message: str, status: int = 502, size: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+        self.size = size    # 416 时的文件大小
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[Tuple[int, int]]:
+    """解析单个Range，返回 [start, end)；没有Range或包含多个区间时返回None（返回整个文件）
+
+    区间无法满足时抛出 MirrorError(416)。
+    """
+    if not header:
+        return None
+    match = _RANGE_PATTERN.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first and not last:
+        return None
+    if not first:
+        start, end = max(0, size - int(last)), size
+    else:
+        start = int(first)
+        end = min(int(last) + 1, size) if last else size
+    if start >= size or start >= end:
+        raise MirrorError(f"请求的区间超出文件大小 {size}", 416, size)
+    return start, end
+
+
+class _Fill:
+    """一个正在从上游下载的blob
+
+    下载按分块并行进行，已完成的分块记录在 ranges 中；读者等待所需位置所在的
+    分块完成后直接从部分下载文件发送，不需要等整个blob下载完成。
+    """
+
+    def __init__(self, digest: str, size: int, partial_path: Path, final_path: Path):
+        self.digest = digest
+        self.size = size
+        self.partial_path = partial_path
+        self.final_path = final_path
+        self.ranges: List[Tuple[int, int]] = []
+        self.done = False
+        self.error: Optional[str] = None
+        self.cond = threading.Condition()
+        self.reserved = threading.Event()  # 部分下载文件已创建（或下载已结束）
+
+    def add_range(self, start: int, end: int) -> None:
+        with self.cond:
+            self.ranges.append((start, end))
+            self.cond.notify_all()
+
+    def finish(self, error: Optional[str] = None) -> None:
+        with self.cond:
+            self.done = True
+            self.error = error
+            self.cond.notify_all()
+        self.reserved.set()
+
+    def _available(self, position: int) -> int:
+        """从 position 开始连续可读的结束位置，不可读时返回 position"""
+        end = position
+        for start, stop in sorted(self.ranges):
+            if start <= end < stop:
+                end = stop
+        return end
+
+    def wait(self, position: int, timeout: float) -> int:
+        """等待 position 处的数据到达，返回可以连续读取到的位置"""
+        deadline = time.monotonic() + timeout
+        with self.cond:
+            while True:
+                if self.error:
+                    raise MirrorError(f"从上游下载 {self.digest} 失败: {self.error}")
+                if self.done:
+                    return self.size
+                available = self._available(position)
+                if available > position:
+                    return available
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise MirrorError(f"等待上游数据超时: {self.digest}", 504)
+                self.cond.wait(remaining)
+
+    def open(self):
+        """打开正在写入的文件；下载完成时部分文件已被重命名为最终文件（同一个inode）"""
+        # 下载登记后、部分文件创建前到达的请求等待文件创建
+        self.reserved.wait()
+        if self.error:
+            raise MirrorError(f"从上游下载 {self.digest} 失败: {self.error}")
+        try:
+            return open(self.partial_path, 'rb')
+        except FileNotFoundError:
+            return open(self.final_path, 'rb')
+
+
+class RegistryMirror:
+    """局域网内的模型仓库镜像
+
+    从本机的模型目录提供清单和blob（OCI distribution v2 协议的只读子集），
+    其他主机把 registry_url 指向这里即可。本地没有的内容按需从上游仓库下载，
+    同一个blob无论有多少客户端同时请求都只下载一次，下载过程中已到达的分块
+    就可以转发给客户端。文件通过 socket.sendfile 发送（Linux上为零拷贝）。
+    """
+
+    def __init__(self, store: Optional[ModelStore] = None, upstream: Optional[RegistryClient] = None,
+                 registry_host: str = DEFAULT_REGISTRY_HOST, manifest_ttl: float = MANIFEST_TTL,
+                 fill_timeout: float = 300.0, downloader_workers: int = 4):
+        self.store = store or ModelStore()
+        self.upstream = upstream
+        self.registry_host = registry_host
+        self.manifest_ttl = manifest_ttl
+        self.fill_timeout = fill_timeout
+        self.downloader = BlobDownloader(upstream, self.store, chunk_size=FILL_CHUNK_SIZE,
+                                         max_workers=downloader_workers) if upstream else None
+        if upstream:
+            # 多个blob同时回源时每个下载都有多个分块连接
+            upstream.session.mount('http://', HTTPAdapter(pool_maxsize=32))
+            upstream.session.mount('https://', HTTPAdapter(pool_maxsize=32))
+        self._fills: Dict[str, _Fill] = {}
+        self._sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._manifest_lock = threading.Lock()
+        self.stats = {'requests': 0, 'bytes_served': 0, 'upstream_manifests': 0, 'upstream_blobs': 0,
+                      'upstream_bytes': 0}
+
+    def _count(self, key: str, value: int = 1) -> None:
+        with self._lock:
+            self.stats[key] += value
+
+    def make_ref(self, name: str, tag: str) -> ModelRef:
+        """把URL中的仓库名和标签转换为 ModelRef，不符合仓库语法时抛出 MirrorError(400)"""
+        if not all(_NAME_COMPONENT.match(part) for part in name.split('/')):
+            raise MirrorError(f"无效的仓库名 {name}", 400)
+        if not _TAG_PATTERN.match(tag):
+            raise MirrorError(f"无效的标签 {tag}", 400)
+        namespace, _, repository = name.rpartition('/')
+        return ModelRef(self.registry_host, namespace or 'library', repository, tag)
+
+    def _store_path(self, path: Path) -> Path:
+        """确认路径解析后仍在模型目录内"""
+        root = self.store.root.resolve()
+        resolved = path.resolve()
+        if resolved != root and root not in resolved.parents:
+            raise MirrorError(f"路径超出模型目录: {path}", 400)
+        return path
+
+    def _remember_sizes(self, manifest: Dict[str, Any]) -> None:
+        with self._lock:
+            self._sizes.update(manifest_blobs(manifest))
+
+    def manifest(self, ref: ModelRef) -> bytes:
+        """返回清单原始内容；本地没有或超过 manifest_ttl 时向上游确认"""
+        path = self._store_path(self.store.manifest_path(ref))
+        with self._manifest_lock:
+            try:
+                raw = path.read_bytes()
+                fresh = time.time() - path.stat().st_mtime < self.manifest_ttl
+            except OSError:
+                raw, fresh = None, False
+            if raw is not None and (fresh or not self.upstream):
+                self._remember_sizes(json.loads(raw))
+                return raw
+            if not self.upstream:
+                raise MirrorError(f"镜像中没有 {ref.short_name}", 404)
+            etag = f'"sha256:{hashlib.sha256(raw).hexdigest()}"' if raw is not None else None
+            try:
+                fetched = self.upstream.fetch_manifest(ref, etag)
+            except RegistryError as e:
+                if raw is None:
+                    raise MirrorError(str(e), 404 if e.status == 404 else 502) from e
+                logger.warning(f"上游不可用，使用本地缓存的清单 {ref.short_name}: {str(e)}")
+                return raw
+            self._count('upstream_manifests')
+            if fetched is None:
+                os.utime(path)
+            else:
+                _, raw, _ = fetched
+                self.store.write_manifest(ref, raw)
+                logger.info(f"已从上游获取清单 {ref.short_name}")
+            self._remember_sizes(json.loads(raw))
+            return raw
+
+    def _blob_size(self, ref: ModelRef, digest: str) -> int:
+        """blob大小：先查已见过的清单，再扫描本地清单，最后向上游发HEAD请求"""
+        with self._lock:
+            size = self._sizes.get(digest)
+        if size is not None:
+            return size
+        for _, path in self.store.iter_manifests():
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    self._remember_sizes(json.load(f))
+            except (OSError, ValueError):
+                continue
+        with self._lock:
+            size = self._sizes.get(digest)
+        if size is not None:
+            return size
+        try:
+            response = self.upstream.session.head(self.upstream.blob_url(ref, digest), allow_redirects=True,
+                                                  timeout=self.upstream.timeout)
+        except requests.RequestException as e:
+            raise MirrorError(f"无法获取 {digest} 的大小: {str(e)}") from e
+        if response.status_code != 200 or 'Content-Length' not in response.headers:
+            raise MirrorError(f"上游仓库中不存在 {digest}", 404)
+        return int(response.headers['Content-Length'])
+
+    def blob(self, ref: ModelRef, digest: str) -> Tuple[int, Optional[_Fill]]:
+        """返回 (大小, 正在进行的下载)；blob已在本地时下载为None"""
+        if not _DIGEST_PATTERN.match(digest):
+            raise MirrorError(f"无效的摘要 {digest}", 400)
+        path = self._store_path(self.store.blob_path(digest))
+        with self._lock:
+            fill = self._fills.get(digest)
+        if fill is not None:
+            return fill.size, fill
+        try:
+            return path.stat().st_size, None
+        except FileNotFoundError:
+            pass
+        if not self.downloader:
+            raise MirrorError(f"镜像中没有 {digest}", 404)
+
+        size = self._blob_size(ref, digest)
+        with self._lock:
+            fill = self._fills.get(digest)
+            if fill is not None:
+                return fill.size, fill
+            if self.store.has_blob(digest, size):
+                return size, None
+            fill = _Fill(digest, size, self.store.partial_path(digest), path)
+            self._fills[digest] = fill
+        try:
+            # 先创建并预分配部分下载文件，读者可以立即打开它
+            DiskPreflight(self.store).check([(digest, size)])
+            self.downloader.reserve([(digest, size)])
+        except (InsufficientDiskSpace, OSError) as e:
+            self._end_fill(fill, str(e))
+            raise MirrorError(str(e), 507 if isinstance(e, InsufficientDiskSpace) else 500) from e
+        fill.reserved.set()
+        threading.Thread(target=self._fill, args=(ref, fill), name=f"mirror-fill-{digest[7:19]}",
+                         daemon=True).start()
+        return size, fill
+
+    def _fill(self, ref: ModelRef, fill: _Fill) -> None:
+        logger.info(f"开始从上游下载 {fill.digest}（{format_bytes(fill.size)}）")
+        self._count('upstream_blobs')
+        try:
+            self.downloader.download_blob(ref, fill.digest, fill.size,
+                                          on_bytes=lambda count: self._count('upstream_bytes', count),
+                                          on_chunk=fill.add_range)
+        except Exception as e:
+            logger.error(f"从上游下载 {fill.digest} 失败: {str(e)}")
+            self._end_fill(fill, str(e) or type(e).__name__)
+            return
+        self._end_fill(fill)
+
+    def _end_fill(self, fill: _Fill, error: Optional[str] = None) -> None:
+        with self._lock:
+            self._fills.pop(fill.digest, None)
+        fill.finish(error)
+
+    def make_server(self, host: str = '0.0.0.0', port: int = DEFAULT_PORT) -> 'MirrorServer':
+        return MirrorServer((host, port), self)
+
+
+class _MirrorHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: 'MirrorServer'
+
+    def log_message(self, format: str, *args) -> None:
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def _reply(self, status: int, body: bytes = b'', content_type: str = 'application/json',
+               headers: Optional[Dict[str, str]] = None) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        if self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _error(self, status: int, message: str, headers: Optional[Dict[str, str]] = None) -> None:
+        code = 'UNKNOWN' if status >= 500 else 'NAME_INVALID' if status == 400 else 'NOT_FOUND'
+        body = json.dumps({'errors': [{'code': code, 'message': message}]}, ensure_ascii=False).encode('utf-8')
+        self._reply(status, body, headers=headers)
+
+    def do_GET(self) -> None:
+        mirror = self.server.mirror
+        mirror._count('requests')
+        if self.path in ('/v2', '/v2/'):
+            return self._reply(200, b'{}')
+        if self.path == '/mirror/stats':
+            with mirror._lock:
+                stats = dict(mirror.stats, active_fills=len(mirror._fills))
+            return self._reply(200, json.dumps(stats).encode('utf-8'))
+        match = _PATH_PATTERN.match(self.path.split('?', 1)[0])
+        if not match:
+            return self._error(404, f"不支持的路径 {self.path}")
+        try:
+            if match['kind'] == 'manifests':
+                self._send_manifest(mirror.make_ref(match['name'], match['reference']))
+            else:
+                self._send_blob(mirror.make_ref(match['name'], 'latest'), match['reference'])
+        except MirrorError as e:
+            headers = {'Content-Range': f"bytes */{e.size}"} if e.size is not None else None
+            self._error(e.status, str(e), headers)
+        except (ConnectionError, TimeoutError):
+            # 客户端中途断开，正常情况
+            self.close_connection = True
+
+    do_HEAD = do_GET
+
+    def _send_manifest(self, ref: ModelRef) -> None:
+        raw = self.server.mirror.manifest(ref)
+        digest = 'sha256:' + hashlib.sha256(raw).hexdigest()
+        headers = {'Docker-Content-Digest': digest, 'ETag': f'"{digest}"'}
+        if self.headers.get('If-None-Match') == headers['ETag']:
+            self.send_response(304)
+            self.send_header('Content-Length', '0')
+            for key, value in headers.items():
+                self.send_header(key, value)
+            self.end_headers()
+            return
+        self._reply(200, raw, MANIFEST_MEDIA_TYPE, headers)
+        self.server.mirror._count('bytes_served', len(raw))
+
+    def _send_blob(self, ref: ModelRef, digest: str) -> None:
+        mirror = self.server.mirror
+        size, fill = mirror.blob(ref, digest)
+        requested = parse_range(self.headers.get('Range'), size)
+        start, end = requested or (0, size)
+        try:
+            # 先打开文件再发送响应头，避免发送后才发现文件不可读
+            f = open(mirror.store.blob_path(digest), 'rb') if fill is None else fill.open()
+        except FileNotFoundError as e:
+            raise MirrorError(f"镜像中没有 {digest}", 404) from e
+        except OSError as e:
+            raise MirrorError(f"无法读取 {digest}: {str(e)}", 500) from e
+        self.send_response(206 if requested else 200)
+        self.send_header('Content-Type', 'application/octet-stream')
+        self.send_header('Content-Length', str(end - start))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Docker-Content-Digest', digest)
+        if requested:
+            self.send_header('Content-Range', f"bytes {start}-{end - 1}/{size}")
+        with f:
+            self.end_headers()
+            if self.command == 'HEAD':
+                return
+            position = start
+            while position < end:
+                try:
+                    available = end if fill is None else min(end, fill.wait(position, mirror.fill_timeout))
+                except MirrorError as e:
+                    # 响应头已发送，只能断开连接，客户端会重试剩余的区间
+                    logger.warning(str(e))
+                    self.close_connection = True
+                    return
+                sent = self.connection.sendfile(f, position, available - position)
+                if not sent:
+                    raise ConnectionError("发送被中断")
+                position += sent
+                mirror._count('bytes_served', sent)
+
+
+class MirrorServer(ThreadingHTTPServer):
+    """每个连接一个线程，几十个客户端同时下载时互不阻塞"""
+
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, address: Tuple[str, int], mirror: RegistryMirror):
+        self.mirror = mirror
+        super().__init__(address, _MirrorHandler)
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{'127.0.0.1' if host in ('0.0.0.0', '') else host}:{port}"
@@ -0,0 +1,220 @@
+import re
+import bisect
+import logging
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# config.yaml 中的资源需求字段（GB）
+REQUIREMENT_KEYS = ('gpu_memory', 'system_memory', 'disk_space')
+# 早期代码使用的字段名
+LEGACY_KEYS = {'vram_required': 'gpu_memory', 'ram_required': 'system_memory', 'disk_required': 'disk_space'}
+
+_PARAMS_RE = re.compile(r'(?:^|[-_])(\d+(?:\.\d+)?)([bBmM])(?=$|[-_])')
+_QUANT_RE = re.compile(r'(?:^|[-_])(q\d[\w]*|fp16|fp32|bf16|int[48])$', re.IGNORECASE)
+
+
+def normalize_requirements(requirements: Dict[str, Any]) -> Dict[str, float]:
+    """把资源需求统一为 config.yaml 的字段名，兼容旧字段名，缺失的记为0"""
+    result = {key: 0.0 for key in REQUIREMENT_KEYS}
+    for key, value in requirements.items():
+        key = LEGACY_KEYS.get(key, key)
+        if key in result and value is not None:
+            result[key] = float(value)
+    return result
+
+
+def parse_tag(name: str) -> Tuple[str, Optional[float], Optional[str]]:
+    """从模型名解析 (系列, 参数量(十亿), 量化方式)
+
+    例如 "deepseek-r1:70b-llama-distill-q4_K_M" -> ("deepseek-r1", 70.0, "q4_K_M")
+    """
+    family, _, tag = name.partition(':')
+    params = None
+    match = _PARAMS_RE.search(tag)
+    if match:
+        params = float(match.group(1))
+        if match.group(2) in 'mM':
+            params /= 1000
+    quant = _QUANT_RE.search(tag)
+    return family, params, quant.group(1) if quant else None
+
+
+class ModelRecord:
+    """单个模型标签的需求信息"""
+
+    __slots__ = ('name', 'family', 'parameters', 'quantization', 'gpu_memory', 'system_memory', 'disk_space')
+
+    def __init__(self, name: str, gpu_memory: float, system_memory: float, disk_space: float,
+                 family: Optional[str] = None, parameters: Optional[float] = None,
+                 quantization: Optional[str] = None):
+        parsed_family, parsed_params, parsed_quant = parse_tag(name)
+        self.name = name
+        self.family = family or parsed_family
+        self.parameters = parameters if parameters is not None else parsed_params
+        self.quantization = quantization or parsed_quant
+        self.gpu_memory = float(gpu_memory)
+        self.system_memory = float(system_memory)
+        self.disk_space = float(disk_space)
+
+    @classmethod
+    def from_config(cls, name: str, requirements: Dict[str, Any]) -> 'ModelRecord':
+        req = normalize_requirements(requirements)
+        return cls(name, req['gpu_memory'], req['system_memory'], req['disk_space'],
+                   family=requirements.get('family'), parameters=requirements.get('parameters'),
+                   quantization=requirements.get('quantization'))
+
+    @property
+    def size_key(self) -> Tuple[float, float]:
+        """比较模型大小：参数量优先，未知时按显存需求"""
+        return (self.parameters if self.parameters is not None else -1.0, self.gpu_memory)
+
+    def fits(self, gpu_memory: float, system_memory: float, disk_space: float) -> bool:
+        return (self.gpu_memory <= gpu_memory and self.system_memory <= system_memory
+                and self.disk_space <= disk_space)
+
+    def requirements(self) -> Dict[str, float]:
+        return {'gpu_memory': self.gpu_memory, 'system_memory': self.system_memory,
+                'disk_space': self.disk_space}
+
+    def __repr__(self) -> str:
+        return (f"ModelRecord({self.name!r}, gpu={self.gpu_memory:g}, ram={self.system_memory:g}, "
+                f"disk={self.disk_space:g})")
+
+
+class _FitIndex:
+    """一组模型（全部或同一系列）上的资源查询索引
+
+    - 按显存需求排序并记录每个前缀中最大的模型：二分查找显存够用的前缀后，
+      显存是瓶颈时 O(log n) 得到答案；
+    - 按大小从大到小排列的线段树，每个节点记录子树中三项需求的最小值：
+      内存或磁盘也是瓶颈时自左向右查找第一个满足条件的叶子，需求超出预算
+      的子树整体跳过，结果天然按大小从大到小排列。
+    """
+
+    def __init__(self, records: List[ModelRecord]):
+        self.by_gpu = sorted(records, key=lambda r: (r.gpu_memory, r.name))
+        self.gpu_keys = [r.gpu_memory for r in self.by_gpu]
+        self.prefix_best: List[int] = []
+        best = -1
+        for i, record in enumerate(self.by_gpu):
+            if best < 0 or (record.size_key, record.name) > (self.by_gpu[best].size_key, self.by_gpu[best].name):
+                best = i
+            self.prefix_best.append(best)
+
+        self.by_size = sorted(records, key=lambda r: (r.size_key, r.name), reverse=True)
+        self.leaves = 1
+        while self.leaves < len(self.by_size):
+            self.leaves *= 2
+        inf = float('inf')
+        # 每个节点的 (最小显存, 最小内存, 最小磁盘)，空叶子为无穷大
+        self.mins = [(inf, inf, inf)] * (2 * self.leaves)
+        for i, record in enumerate(self.by_size):
+            self.mins[self.leaves + i] = (record.gpu_memory, record.system_memory, record.disk_space)
+        for node in range(self.leaves - 1, 0, -1):
+            left, right = self.mins[2 * node], self.mins[2 * node + 1]
+            self.mins[node] = (min(left[0], right[0]), min(left[1], right[1]), min(left[2], right[2]))
+
+    def _search(self, gpu_memory: float, system_memory: float, disk_space: float,
+                first: bool) -> List[ModelRecord]:
+        found = []
+        stack = [1] if self.by_size else []
+        while stack:
+            node = stack.pop()
+            gpu, ram, disk = self.mins[node]
+            if gpu > gpu_memory or ram > system_memory or disk > disk_space:
+                continue
+            if node >= self.leaves:
+                found.append(self.by_size[node - self.leaves])
+                if first:
+                    break
+                continue
+            # 先访问左子树（更大的模型）
+            stack.append(2 * node + 1)
+            stack.append(2 * node)
+        return found
+
+    def largest_fit(self, gpu_memory: float, system_memory: float, disk_space: float) -> Optional[ModelRecord]:
+        count = bisect.bisect_right(self.gpu_keys, gpu_memory)
+        if not count:
+            return None
+        best = self.by_gpu[self.prefix_best[count - 1]]
+        if best.fits(gpu_memory, system_memory, disk_space):
+            return best
+        found = self._search(gpu_memory, system_memory, disk_space, first=True)
+        return found[0] if found else None
+
+    def within_budget(self, gpu_memory: float, system_memory: float, disk_space: float) -> List[ModelRecord]:
+        return self._search(gpu_memory, system_memory, disk_space, first=False)
+
+
+class ModelCatalog:
+    """按系列、参数量、量化方式和资源需求建立有序索引的模型目录
+
+    资源查询使用全局和各系列各自的 _FitIndex，不做线性扫描。
+    """
+
+    def __init__(self, records: Iterable[ModelRecord]):
+        self._by_name: Dict[str, ModelRecord] = {}
+        for record in records:
+            self._by_name[record.name] = record
+
+        # 按参数量排序的全局索引和各系列索引
+        self._by_size = sorted(self._by_name.values(), key=lambda r: (r.size_key, r.name))
+        self._size_keys = [r.size_key[0] for r in self._by_size]
+        self._families: Dict[str, List[ModelRecord]] = {}
+        self._quantizations: Dict[Optional[str], List[ModelRecord]] = {}
+        for record in self._by_size:
+            self._families.setdefault(record.family, []).append(record)
+            self._quantizations.setdefault(record.quantization, []).append(record)
+
+        self._fit = _FitIndex(self._by_size)
+        self._family_fit = {family: _FitIndex(records) for family, records in self._families.items()}
+
+    @classmethod
+    def from_config(cls, models: Dict[str, Dict[str, Any]]) -> 'ModelCatalog':
+        return cls(ModelRecord.from_config(name, req) for name, req in (models or {}).items())
+
+    def __len__(self) -> int:
+        return len(self._by_name)
+
+    def __iter__(self) -> Iterator[ModelRecord]:
+        return iter(self._by_size)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._by_name
+
+    def get(self, name: str) -> Optional[ModelRecord]:
+        return self._by_name.get(name)
+
+    @property
+    def families(self) -> List[str]:
+        return sorted(self._families)
+
+    def family(self, family: str) -> List[ModelRecord]:
+        """系列中的全部模型，按参数量从小到大"""
+        return list(self._families.get(family, []))
+
+    def quantization(self, quantization: Optional[str]) -> List[ModelRecord]:
+        return list(self._quantizations.get(quantization, []))
+
+    def parameter_range(self, low: float, high: float) -> List[ModelRecord]:
+        """参数量在 [low, high]（十亿）之间的模型"""
+        start = bisect.bisect_left(self._size_keys, low)
+        end = bisect.bisect_right(self._size_keys, high)
+        return self._by_size[start:end]
+
+    def _index(self, family: Optional[str]) -> Optional[_FitIndex]:
+        return self._fit if family is None else self._family_fit.get(family)
+
+    def largest_fit(self, gpu_memory: float, system_memory: float, disk_space: float,
+                    family: Optional[str] = None) -> Optional[ModelRecord]:
+        """资源能满足的最大模型，没有时返回None"""
+        index = self._index(family)
+        return index.largest_fit(gpu_memory, system_memory, disk_space) if index else None
+
+    def within_budget(self, gpu_memory: float, system_memory: float, disk_space: float,
+                      family: Optional[str] = None) -> List[ModelRecord]:
+        """资源能满足的全部模型，按参数量从大到小"""
+        index = self._index(family)
+        return index.within_budget(gpu_memory, system_memory, disk_space) if index else []
@@ -0,0 +1,71 @@
+import os
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+from .disk_preflight import default_models_path
+from .registry import ModelRef
+
+logger = logging.getLogger(__name__)
+
+
+class ModelStore:
+    """Ollama本地模型目录布局: manifests/<host>/<namespace>/<repo>/<tag> 与 blobs/sha256-<hex>"""
+
+    def __init__(self, models_path: Optional[str] = None):
+        self.root = Path(models_path or default_models_path())
+        self.manifests_dir = self.root / "manifests"
+        self.blobs_dir = self.root / "blobs"
+
+    def ensure_dirs(self) -> None:
+        self.manifests_dir.mkdir(parents=True, exist_ok=True)
+        self.blobs_dir.mkdir(parents=True, exist_ok=True)
+
+    def blob_path(self, digest: str) -> Path:
+        """blob文件路径，文件名中的冒号替换为横线"""
+        return self.blobs_dir / digest.replace(':', '-')
+
+    def partial_path(self, digest: str) -> Path:
+        return self.blobs_dir / (digest.replace(':', '-') + "-partial")
+
+    def has_blob(self, digest: str, size: Optional[int] = None) -> bool:
+        try:
+            stat = self.blob_path(digest).stat()
+        except OSError:
+            return False
+        return size is None or stat.st_size == size
+
+    def manifest_path(self, ref: ModelRef) -> Path:
+        return self.manifests_dir / ref.host / ref.namespace / ref.repository / ref.tag
+
+    def read_manifest(self, ref: ModelRef) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.manifest_path(ref), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write_manifest(self, ref: ModelRef, raw: bytes) -> Path:
+        """原子写入清单，避免Ollama读到写了一半的文件"""
+        path = self.manifest_path(ref)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(raw)
+        os.replace(tmp_path, path)
+        return path
+
+    def iter_manifests(self) -> Iterator[Tuple[ModelRef, Path]]:
+        """遍历全部已安装模型的清单文件"""
+        if not self.manifests_dir.is_dir():
+            return
+        for dirpath, _, filenames in os.walk(self.manifests_dir):
+            rel = Path(dirpath).relative_to(self.manifests_dir).parts
+            if len(rel) < 3:
+                continue
+            for filename in filenames:
+                if filename.endswith(".tmp"):
+                    continue
+                ref = ModelRef(rel[0], '/'.join(rel[1:-1]), rel[-1], filename)
+                yield ref, Path(dirpath) / filename
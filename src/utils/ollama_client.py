@@ -0,0 +1,221 @@
+import json
+import time
+import logging
+import threading
+import requests
+from collections import deque
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+from urllib.parse import urlparse
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .ollama_pull import OllamaPuller, PullProgress, resolve_ollama_host
+
+logger = logging.getLogger(__name__)
+
+LOCAL_HOSTS = {'localhost', '127.0.0.1', '::1', '0.0.0.0'}
+
+
+class OllamaError(Exception):
+    """Ollama服务请求失败"""
+
+
+class EndpointStats:
+    """单个接口的请求次数、错误数和延迟分布"""
+
+    def __init__(self, window: int = 256):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.samples = deque(maxlen=window)
+
+    def record(self, latency: float, error: bool = False) -> None:
+        self.count += 1
+        self.errors += int(error)
+        self.total += latency
+        self.max = max(self.max, latency)
+        self.samples.append(latency)
+
+    def percentile(self, q: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * q / 100), len(ordered) - 1)]
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'avg_ms': round(self.total / self.count * 1000, 2) if self.count else 0.0,
+            'p50_ms': round(self.percentile(50) * 1000, 2),
+            'p95_ms': round(self.percentile(95) * 1000, 2),
+            'max_ms': round(self.max * 1000, 2),
+        }
+
+
+class OllamaClient:
+    """通过连接池复用的 HTTP 连接访问 Ollama 服务
+
+    所有请求共用一个 requests.Session，连接保持 keep-alive；幂等请求在
+    连接失败或 502/503/504 时按指数退避重试。每个接口记录响应头到达
+    所用的时间，stats() 返回汇总。
+    """
+
+    def __init__(self, host: Optional[str] = None, retries: int = 3, backoff_factor: float = 0.5,
+                 timeout: Tuple[float, float] = (5.0, 30.0), pool_maxsize: int = 8):
+        self.host = resolve_ollama_host(host)
+        self.timeout = timeout
+        self.session = requests.Session()
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(502, 503, 504),
+            # 拉取是非幂等的流式请求，由调用方决定是否重试
+            allowed_methods=frozenset({'GET', 'HEAD', 'DELETE'}),
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        # 健康检查需要快速得到结果，不做退避重试（按最长前缀匹配适配器）
+        self.session.mount(f"{self.host}/api/version", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+        # 通过响应钩子统计延迟，共用这个 session 的 OllamaPuller 也会被统计
+        self.session.hooks['response'].append(self._record_response)
+        self._stats: Dict[str, EndpointStats] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def is_local(self) -> bool:
+        """服务是否运行在本机，可以直接访问其进程和模型目录"""
+        return urlparse(self.host).hostname in LOCAL_HOSTS
+
+    def _endpoint(self, method: str, url: str) -> str:
+        path = url[len(self.host):] if url.startswith(self.host) else url
+        return f"{method} {path.split('?')[0]}"
+
+    def _record(self, endpoint: str, latency: float, error: bool) -> None:
+        with self._lock:
+            stats = self._stats.get(endpoint)
+            if stats is None:
+                stats = self._stats[endpoint] = EndpointStats()
+            stats.record(latency, error)
+
+    def _record_response(self, response: requests.Response, *args, **kwargs) -> None:
+        endpoint = self._endpoint(response.request.method, response.request.url)
+        self._record(endpoint, response.elapsed.total_seconds(), response.status_code >= 500)
+
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        """发送请求，连接失败时抛出 OllamaError"""
+        kwargs.setdefault('timeout', self.timeout)
+        url = f"{self.host}{path}"
+        started = time.monotonic()
+        try:
+            return self.session.request(method, url, **kwargs)
+        except requests.RequestException as e:
+            # 没有拿到响应的请求不会经过响应钩子，在这里记为错误
+            self._record(self._endpoint(method, url), time.monotonic() - started, True)
+            raise OllamaError(f"无法连接Ollama服务 {self.host}: {str(e)}") from e
+
+    def version(self) -> Optional[str]:
+        """服务版本，服务不可用时返回None"""
+        try:
+            response = self.request('GET', '/api/version', timeout=(2.0, 5.0))
+        except OllamaError:
+            return None
+        if response.status_code != 200:
+            return None
+        return response.json().get('version')
+
+    def is_available(self) -> bool:
+        return self.version() is not None
+
+    def list_models(self) -> List[Dict[str, Any]]:
+        """已安装的模型，对应 `ollama list`"""
+        response = self.request('GET', '/api/tags')
+        if response.status_code != 200:
+            raise OllamaError(f"获取模型列表失败: HTTP {response.status_code}")
+        return response.json().get('models') or []
+
+    def model_names(self) -> List[str]:
+        return [model['name'] for model in self.list_models()]
+
+    def has_model(self, model_name: str) -> bool:
+        # 未指定标签时 Ollama 使用 latest
+        if ':' not in model_name:
+            model_name += ':latest'
+        return model_name in self.model_names()
+
+    def delete(self, model_name: str) -> bool:
+        """删除模型，模型不存在时返回False"""
+        response = self.request('DELETE', '/api/delete', json={'model': model_name, 'name': model_name})
+        if response.status_code == 404:
+            return False
+        if response.status_code != 200:
+            raise OllamaError(f"删除模型失败: HTTP {response.status_code}: {response.text.strip()}")
+        return True
+
+    def generate(self, model_name: str, prompt: str, options: Optional[Dict[str, Any]] = None,
+                 keep_alive: Optional[Any] = None, read_timeout: float = 300.0) -> Iterator[Dict[str, Any]]:
+        """流式调用 /api/generate，逐个返回事件
+
+        最后一个事件的 done 为 True，带有服务端计时（纳秒）：load_duration、
+        prompt_eval_duration、eval_count、eval_duration 等。
+        """
+        payload: Dict[str, Any] = {'model': model_name, 'prompt': prompt, 'stream': True}
+        if options:
+            payload['options'] = options
+        if keep_alive is not None:
+            payload['keep_alive'] = keep_alive
+        response = self.request('POST', '/api/generate', json=payload, stream=True,
+                                timeout=(self.timeout[0], read_timeout))
+        with response:
+            if response.status_code != 200:
+                raise OllamaError(f"生成失败: HTTP {response.status_code}: {response.text.strip()}")
+            try:
+                for line in response.iter_lines():
+                    if line:
+                        yield json.loads(line)
+            except requests.RequestException as e:
+                raise OllamaError(f"读取生成结果失败: {str(e)}") from e
+            except ValueError as e:
+                raise OllamaError(f"无法解析生成结果: {str(e)}") from e
+
+    def load(self, model_name: str, keep_alive: Optional[Any] = None, read_timeout: float = 600.0) -> Dict[str, Any]:
+        """把模型加载到内存但不生成（空提示），返回服务端的响应"""
+        payload: Dict[str, Any] = {'model': model_name, 'stream': False}
+        if keep_alive is not None:
+            payload['keep_alive'] = keep_alive
+        response = self.request('POST', '/api/generate', json=payload, timeout=(self.timeout[0], read_timeout))
+        if response.status_code != 200:
+            raise OllamaError(f"加载模型失败: HTTP {response.status_code}: {response.text.strip()}")
+        return response.json()
+
+    def unload(self, model_name: str) -> Dict[str, Any]:
+        """立即从内存中卸载模型"""
+        return self.load(model_name, keep_alive=0)
+
+    def running_models(self) -> List[Dict[str, Any]]:
+        """已加载到内存的模型及其内存/显存占用，对应 `ollama ps`"""
+        response = self.request('GET', '/api/ps')
+        if response.status_code != 200:
+            raise OllamaError(f"获取运行中的模型失败: HTTP {response.status_code}")
+        return response.json().get('models') or []
+
+    def puller(self, **kwargs) -> OllamaPuller:
+        """共用连接池的流式拉取器"""
+        return OllamaPuller(self.host, session=self.session, **kwargs)
+
+    def pull(self, model_name: str,
+             progress_callback: Optional[Callable[[int, str], None]] = None,
+             progress_range: Tuple[int, int] = (0, 100),
+             cancel_event: Optional[threading.Event] = None) -> PullProgress:
+        return self.puller().pull(model_name, progress_callback, progress_range, cancel_event)
+
+    def stats(self) -> Dict[str, Dict[str, float]]:
+        """各接口的请求次数和延迟（毫秒）"""
+        with self._lock:
+            return {endpoint: stats.as_dict() for endpoint, stats in sorted(self._stats.items())}
+
+    def close(self) -> None:
+        self.session.close()
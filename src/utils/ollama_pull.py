@@ -0,0 +1,307 @@
+import os
+import json
+import time
+import logging
+import socket
+import requests
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_OLLAMA_HOST = "http://127.0.0.1:11434"
+
+
+class PullError(Exception):
+    """模型拉取失败"""
+
+
+class PullCancelled(PullError):
+    """拉取被用户取消"""
+
+
+def resolve_ollama_host(host: Optional[str] = None) -> str:
+    """解析Ollama服务地址，兼容 OLLAMA_HOST 的 host:port 写法"""
+    host = host or os.environ.get("OLLAMA_HOST") or DEFAULT_OLLAMA_HOST
+    if "://" not in host:
+        host = f"http://{host}"
+    scheme, rest = host.split("://", 1)
+    rest = rest.rstrip('/')
+    # 0.0.0.0 是服务端监听地址，客户端需要连接本机
+    if rest.startswith("0.0.0.0"):
+        rest = "127.0.0.1" + rest[len("0.0.0.0"):]
+    if ':' not in rest.split('/')[0]:
+        rest = f"{rest}:11434"
+    return f"{scheme}://{rest}"
+
+
+def format_bytes(num: float) -> str:
+    """格式化字节数"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if abs(num) < 1024:
+            return f"{num:.1f}{unit}"
+        num /= 1024
+    return f"{num:.1f}TB"
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    """格式化剩余时间"""
+    if seconds is None:
+        return "--:--"
+    seconds = int(seconds)
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}:{minutes:02d}:{secs:02d}"
+    return f"{minutes:02d}:{secs:02d}"
+
+
+class PullProgress:
+    """汇总 /api/pull 事件流中的分层下载进度"""
+
+    def __init__(self, rate_window: float = 10.0, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.rate_window = rate_window
+        self.status = ""
+        self.layers: Dict[str, List[int]] = {}  # digest -> [已完成字节, 总字节]
+        self.success = False
+        self.started_at = clock()
+        self.last_advance_at = self.started_at
+        self._samples: deque = deque()  # (时间, 已完成字节)
+
+    @property
+    def completed_bytes(self) -> int:
+        return sum(layer[0] for layer in self.layers.values())
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(layer[1] for layer in self.layers.values())
+
+    @property
+    def fraction(self) -> float:
+        """已完成比例，清单阶段为0，成功后为1"""
+        if self.success:
+            return 1.0
+        total = self.total_bytes
+        return self.completed_bytes / total if total else 0.0
+
+    @property
+    def layers_done(self) -> int:
+        return sum(1 for done, total in self.layers.values() if total and done >= total)
+
+    def update(self, event: Dict) -> None:
+        """处理一条NDJSON事件"""
+        if event.get("error"):
+            raise PullError(event["error"])
+
+        self.status = event.get("status", self.status)
+        if self.status == "success":
+            self.success = True
+
+        digest = event.get("digest")
+        if digest and event.get("total"):
+            layer = self.layers.setdefault(digest, [0, 0])
+            layer[1] = int(event["total"])
+            # completed 字段在刚开始时可能缺失
+            layer[0] = max(layer[0], int(event.get("completed", 0)))
+
+        now = self.clock()
+        completed = self.completed_bytes
+        if not self._samples or completed > self._samples[-1][1]:
+            self.last_advance_at = now
+        self._samples.append((now, completed))
+        while len(self._samples) > 2 and now - self._samples[1][0] >= self.rate_window:
+            self._samples.popleft()
+
+    @property
+    def rate(self) -> float:
+        """滑动窗口内的下载速度（字节/秒）"""
+        if len(self._samples) < 2:
+            return 0.0
+        (t0, c0), (t1, c1) = self._samples[0], self._samples[-1]
+        if t1 <= t0:
+            return 0.0
+        return max(c1 - c0, 0) / (t1 - t0)
+
+    @property
+    def eta(self) -> Optional[float]:
+        """预计剩余时间（秒），速度未知时返回None"""
+        rate = self.rate
+        if rate <= 0:
+            return None
+        return max(self.total_bytes - self.completed_bytes, 0) / rate
+
+    @property
+    def stalled_for(self) -> float:
+        """距离上一次字节增长的时间（秒）"""
+        return self.clock() - self.last_advance_at
+
+    def describe(self) -> str:
+        """生成进度描述"""
+        if not self.layers or self.success:
+            return self.status
+        return (
+            f"正在下载 {self.layers_done}/{len(self.layers)} 层: "
+            f"{format_bytes(self.completed_bytes)}/{format_bytes(self.total_bytes)}, "
+            f"{format_bytes(self.rate)}/s, 剩余 {format_duration(self.eta)}"
+        )
+
+
+def _response_socket(response: requests.Response) -> Optional[socket.socket]:
+    """流式响应底层的套接字；连接已归还连接池（如 HTTP/1.0 响应）时从 http.client 响应中取"""
+    sock = getattr(getattr(response.raw, 'connection', None), 'sock', None)
+    if sock is None:
+        fp = getattr(getattr(response.raw, '_fp', None), 'fp', None)
+        sock = getattr(getattr(fp, 'raw', None), '_sock', None)
+    return sock
+
+
+def _shutdown(response: requests.Response) -> None:
+    """关闭流式响应的套接字，唤醒阻塞在读取上的线程"""
+    sock = _response_socket(response)
+    if sock is None:
+        return
+    try:
+        sock.shutdown(socket.SHUT_RDWR)
+    except OSError:
+        pass
+
+
+class OllamaPuller:
+    """通过 Ollama HTTP API 流式拉取模型"""
+
+    def __init__(self, host: Optional[str] = None, session: Optional[requests.Session] = None,
+                 connect_timeout: float = 5.0, read_timeout: float = 120.0,
+                 stall_timeout: float = 30.0, report_interval: float = 0.5):
+        self.host = resolve_ollama_host(host)
+        self.session = session or requests.Session()
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.stall_timeout = stall_timeout
+        self.report_interval = report_interval
+        self._responses = set()
+        self._lock = threading.Lock()
+
+    def abort(self) -> None:
+        """断开所有进行中的拉取连接，阻塞在读取上的 pull() 立即返回
+
+        与 cancel_event 一起使用：只设置 cancel_event 时，要等到下一行进度到达
+        （服务端停滞时可能长达 read_timeout）才会停止。
+        """
+        with self._lock:
+            responses = list(self._responses)
+        for response in responses:
+            _shutdown(response)
+
+    def pull(self, model_name: str,
+             progress_callback: Optional[Callable[[int, str], None]] = None,
+             progress_range: Tuple[int, int] = (0, 100),
+             cancel_event: Optional[threading.Event] = None,
+             progress: Optional[PullProgress] = None) -> PullProgress:
+        """拉取模型，按 progress_range 把字节进度映射到 progress_callback
+
+        cancel_event 被设置后断开连接并抛出 PullCancelled，Ollama 服务端
+        随之取消下载，已完成的分片保留在磁盘上，下次拉取时续传。
+        传入 progress 时进度记录在其中，拉取失败或取消后调用方仍可读取已完成的字节数。
+        """
+        try:
+            response = self.session.post(
+                f"{self.host}/api/pull",
+                json={"model": model_name, "name": model_name, "stream": True},
+                stream=True,
+                timeout=(self.connect_timeout, self.read_timeout),
+            )
+        except requests.ConnectionError as e:
+            raise PullError(f"无法连接Ollama服务 {self.host}: {str(e)}") from e
+
+        with self._lock:
+            self._responses.add(response)
+        try:
+            # abort() 可能在连接建立前就已调用
+            if cancel_event is not None and cancel_event.is_set():
+                response.close()
+                raise PullCancelled(f"模型 {model_name} 拉取已取消")
+            return self._read_progress(response, model_name, progress_callback, progress_range, cancel_event,
+                                       progress or PullProgress())
+        finally:
+            with self._lock:
+                self._responses.discard(response)
+
+    def _read_progress(self, response: requests.Response, model_name: str,
+                       progress_callback: Optional[Callable[[int, str], None]],
+                       progress_range: Tuple[int, int],
+                       cancel_event: Optional[threading.Event], progress: PullProgress) -> PullProgress:
+        low, high = progress_range
+        lock = threading.Lock()
+        state = {'last_report': 0.0, 'last_percent': -1, 'stall_reported': False}
+
+        def report(stalled: bool) -> None:
+            """调用时持有 lock；停滞只报告一次，字节恢复增长后重新计时"""
+            now = time.monotonic()
+            # 新的层出现时总量会增大，进度条不回退
+            percent = max(low + int((high - low) * progress.fraction), state['last_percent'])
+            if stalled:
+                if state['stall_reported']:
+                    return
+                logger.warning(f"模型 {model_name} 下载已停滞 {progress.stalled_for:.0f} 秒")
+                if progress_callback:
+                    progress_callback(percent, f"下载停滞 {progress.stalled_for:.0f} 秒: {progress.describe()}")
+                state.update(stall_reported=True, last_report=now, last_percent=percent)
+                return
+            state['stall_reported'] = False
+            if progress_callback and (
+                    percent != state['last_percent'] or now - state['last_report'] >= self.report_interval):
+                progress_callback(percent, progress.describe())
+                state.update(last_report=now, last_percent=percent)
+
+        def is_stalled() -> bool:
+            return bool(progress.layers) and progress.stalled_for >= self.stall_timeout
+
+        # 服务端完全没有输出时 iter_lines() 会阻塞到 read_timeout，由看门狗线程按时检查停滞和取消
+        finished = threading.Event()
+
+        def watchdog() -> None:
+            interval = max(0.05, min(1.0, self.stall_timeout / 4))
+            while not finished.wait(interval):
+                if cancel_event is not None and cancel_event.is_set():
+                    _shutdown(response)
+                    return
+                with lock:
+                    if is_stalled():
+                        report(True)
+
+        with response:
+            if response.status_code != 200:
+                raise PullError(f"Ollama服务返回 {response.status_code}: {response.text.strip()}")
+
+            thread = threading.Thread(target=watchdog, name=f"pull-watchdog-{model_name}", daemon=True)
+            thread.start()
+            try:
+                for line in response.iter_lines():
+                    if cancel_event is not None and cancel_event.is_set():
+                        raise PullCancelled(f"模型 {model_name} 拉取已取消")
+                    if not line:
+                        continue
+                    with lock:
+                        progress.update(json.loads(line))
+                        report(is_stalled())
+            except requests.RequestException as e:
+                if cancel_event is not None and cancel_event.is_set():
+                    raise PullCancelled(f"模型 {model_name} 拉取已取消") from e
+                raise PullError(f"读取拉取进度失败: {str(e)}") from e
+            except ValueError as e:
+                raise PullError(f"无法解析拉取进度: {str(e)}") from e
+            finally:
+                finished.set()
+                thread.join()
+
+        if cancel_event is not None and cancel_event.is_set() and not progress.success:
+            raise PullCancelled(f"模型 {model_name} 拉取已取消")
+        if not progress.success:
+            raise PullError(f"拉取意外结束，最后状态: {progress.status or '无'}")
+
+        elapsed = time.monotonic() - progress.started_at
+        logger.info(
+            f"模型 {model_name} 拉取完成: {format_bytes(progress.total_bytes)}, 用时 {elapsed:.1f} 秒")
+        return progress
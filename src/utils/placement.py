@@ -0,0 +1,230 @@
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from .fleet import host_capacity
+
+logger = logging.getLogger(__name__)
+
+# 副本数 x 主机数 不超过该值时尝试精确搜索
+EXACT_SEARCH_LIMIT = 96
+# 精确搜索最多展开的节点数，超过后保留当前最优解
+EXACT_NODE_BUDGET = 200000
+
+
+class HostState:
+    """规划过程中单台主机的剩余资源"""
+
+    __slots__ = ('name', 'gpu', 'ram', 'disk', 'gpu_total', 'models')
+
+    def __init__(self, name: str, gpu: float, ram: float, disk: float):
+        self.name = name
+        self.gpu = gpu
+        self.ram = ram
+        self.disk = disk
+        self.gpu_total = gpu
+        self.models: List[str] = []
+
+    def disk_needed(self, model: str, req: Dict[str, float]) -> float:
+        # 同一主机上同一模型的多个副本共用一份模型文件
+        return 0.0 if model in self.models else req['disk_space']
+
+    def fits(self, model: str, req: Dict[str, float]) -> bool:
+        return (self.gpu >= req['gpu_memory'] and self.ram >= req['system_memory']
+                and self.disk >= self.disk_needed(model, req))
+
+    def place(self, model: str, req: Dict[str, float]) -> float:
+        """放置一个副本，返回占用的磁盘空间以便撤销"""
+        disk = self.disk_needed(model, req)
+        self.gpu -= req['gpu_memory']
+        self.ram -= req['system_memory']
+        self.disk -= disk
+        self.models.append(model)
+        return disk
+
+    def remove(self, model: str, req: Dict[str, float], disk: float) -> None:
+        self.models.pop()
+        self.gpu += req['gpu_memory']
+        self.ram += req['system_memory']
+        self.disk += disk
+
+    def key(self) -> Tuple:
+        """剩余资源相同且已有模型相同的主机在搜索中等价"""
+        return (round(self.gpu, 6), round(self.ram, 6), round(self.disk, 6), tuple(sorted(set(self.models))))
+
+
+class PlacementPlan:
+    """模型副本到主机的分配结果"""
+
+    def __init__(self, hosts: List[HostState], demand: Dict[str, int],
+                 requirements: Dict[str, Dict[str, float]], method: str):
+        self.hosts = hosts
+        self.demand = demand
+        self.requirements = requirements
+        self.method = method
+
+    @property
+    def assignments(self) -> Dict[str, List[str]]:
+        return {host.name: list(host.models) for host in self.hosts}
+
+    @property
+    def unplaced(self) -> Dict[str, int]:
+        placed: Dict[str, int] = {}
+        for host in self.hosts:
+            for model in host.models:
+                placed[model] = placed.get(model, 0) + 1
+        return {model: count - placed.get(model, 0)
+                for model, count in self.demand.items() if count > placed.get(model, 0)}
+
+    @property
+    def gpu_used(self) -> float:
+        return sum(host.gpu_total - host.gpu for host in self.hosts)
+
+    @property
+    def gpu_utilization(self) -> float:
+        total = sum(host.gpu_total for host in self.hosts)
+        return self.gpu_used / total if total else 0.0
+
+    def stranded(self) -> Dict[str, Dict[str, float]]:
+        """每台主机剩余但放不下任何需求模型的资源（GB）"""
+        result = {}
+        for host in self.hosts:
+            usable = any(host.fits(model, self.requirements[model]) for model in self.demand)
+            result[host.name] = {
+                'gpu': 0.0 if usable else round(host.gpu, 2),
+                'free_gpu': round(host.gpu, 2),
+                'free_ram': round(host.ram, 2),
+                'free_disk': round(host.disk, 2),
+            }
+        return result
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'method': self.method,
+            'assignments': self.assignments,
+            'unplaced': self.unplaced,
+            'gpu_used': round(self.gpu_used, 2),
+            'gpu_utilization': round(self.gpu_utilization, 4),
+            'stranded': self.stranded(),
+        }
+
+    def report(self) -> str:
+        lines = [f"放置方法: {self.method}, GPU利用率: {self.gpu_utilization:.1%}"]
+        stranded = self.stranded()
+        for host in self.hosts:
+            models = ", ".join(host.models) or "无"
+            line = f"  {host.name}: {models}"
+            if stranded[host.name]['gpu']:
+                line += f" (闲置显存 {stranded[host.name]['gpu']:.1f}GB)"
+            lines.append(line)
+        for model, count in self.unplaced.items():
+            lines.append(f"  未能放置: {model} x{count}")
+        return "\n".join(lines)
+
+
+def _normalize_requirements(models: Dict[str, Dict[str, Any]], names) -> Dict[str, Dict[str, float]]:
+    return {name: {key: float(models[name].get(key, 0) or 0)
+                   for key in ('gpu_memory', 'system_memory', 'disk_space')}
+            for name in names}
+
+
+def _make_hosts(snapshots: List[Dict[str, Any]]) -> List[HostState]:
+    return [HostState(s.get('hostname', f"host-{i}"), *host_capacity(s)) for i, s in enumerate(snapshots)]
+
+
+def _replicas(demand: Dict[str, int], requirements: Dict[str, Dict[str, float]]) -> List[str]:
+    """按显存需求从大到小展开副本列表"""
+    replicas = [model for model, count in demand.items() for _ in range(count)]
+    replicas.sort(key=lambda m: (requirements[m]['gpu_memory'], requirements[m]['system_memory']), reverse=True)
+    return replicas
+
+
+def _best_fit(hosts: List[HostState], replicas: List[str], requirements: Dict[str, Dict[str, float]]) -> None:
+    """降序最佳适配：每个副本放到放置后剩余显存最少的主机，已有该模型的主机优先"""
+    for model in replicas:
+        req = requirements[model]
+        candidates = [host for host in hosts if host.fits(model, req)]
+        if not candidates:
+            continue
+        best = min(candidates, key=lambda h: (model not in h.models, h.gpu - req['gpu_memory'], h.ram))
+        best.place(model, req)
+
+
+def _exact(hosts: List[HostState], replicas: List[str], requirements: Dict[str, Dict[str, float]],
+           lower_bound: float) -> Optional[List[List[str]]]:
+    """分支定界求放置显存总量最大的方案，没有优于 lower_bound 的解时返回None"""
+    gpu = [requirements[m]['gpu_memory'] for m in replicas]
+    suffix = [0.0] * (len(replicas) + 1)
+    for i in range(len(replicas) - 1, -1, -1):
+        suffix[i] = suffix[i + 1] + gpu[i]
+
+    best_value = lower_bound
+    best_layout: Optional[List[List[str]]] = None
+    nodes = 0
+
+    def search(index: int, value: float) -> None:
+        nonlocal best_value, best_layout, nodes
+        nodes += 1
+        if nodes > EXACT_NODE_BUDGET:
+            return
+        if value > best_value + 1e-9:
+            best_value = value
+            best_layout = [list(host.models) for host in hosts]
+        if index == len(replicas):
+            return
+        free_gpu = sum(max(host.gpu, 0.0) for host in hosts)
+        if value + min(suffix[index], free_gpu) <= best_value + 1e-9:
+            return
+
+        model = replicas[index]
+        req = requirements[model]
+        seen = set()
+        for host in hosts:
+            if not host.fits(model, req):
+                continue
+            key = host.key()
+            if key in seen:
+                continue
+            seen.add(key)
+            disk = host.place(model, req)
+            search(index + 1, value + req['gpu_memory'])
+            host.remove(model, req, disk)
+        # 也考虑不放置这个副本
+        search(index + 1, value)
+
+    search(0, 0.0)
+    if nodes > EXACT_NODE_BUDGET:
+        logger.info(f"精确搜索达到节点上限 {EXACT_NODE_BUDGET}，使用当前最优解")
+    return best_layout
+
+
+def plan_placement(demand: Dict[str, int], snapshots: List[Dict[str, Any]],
+                   models: Dict[str, Dict[str, Any]], exact: Optional[bool] = None) -> PlacementPlan:
+    """把需求的模型副本分配到主机上，使已用GPU显存最大
+
+    先用降序最佳适配得到可行解；副本和主机较少时再用分支定界搜索更优解。
+    exact 为None时按规模自动决定是否做精确搜索。
+    """
+    unknown = [model for model in demand if model not in models]
+    if unknown:
+        raise KeyError(f"未找到模型配置: {', '.join(unknown)}")
+
+    requirements = _normalize_requirements(models, demand)
+    replicas = _replicas(demand, requirements)
+
+    hosts = _make_hosts(snapshots)
+    _best_fit(hosts, replicas, requirements)
+    plan = PlacementPlan(hosts, demand, requirements, "best-fit")
+
+    if exact is None:
+        exact = len(replicas) * max(len(snapshots), 1) <= EXACT_SEARCH_LIMIT
+    if exact and replicas:
+        fresh = _make_hosts(snapshots)
+        layout = _exact(fresh, replicas, requirements, plan.gpu_used)
+        if layout is not None:
+            for host, placed in zip(fresh, layout):
+                for model in placed:
+                    host.place(model, requirements[model])
+            plan = PlacementPlan(fresh, demand, requirements, "exact")
+
+    logger.info(f"模型放置完成: {plan.method}, GPU利用率 {plan.gpu_utilization:.1%}")
+    return plan
@@ -0,0 +1,85 @@
+import time
+import logging
+import threading
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ProbeResult:
+    """单个探测项的结果"""
+
+    __slots__ = ('name', 'value', 'status', 'latency', 'error')
+
+    def __init__(self, name: str, value: Any = None, status: str = "pending",
+                 latency: Optional[float] = None, error: Optional[str] = None):
+        self.name = name
+        self.value = value
+        self.status = status  # pending / ok / error / timeout
+        self.latency = latency
+        self.error = error
+
+    @property
+    def ok(self) -> bool:
+        return self.status == "ok"
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'status': self.status,
+            'latency_ms': None if self.latency is None else round(self.latency * 1000, 1),
+            'error': self.error,
+        }
+
+
+class ProbeEngine:
+    """并行运行系统探测，每个探测项有独立的截止时间
+
+    探测在守护线程中运行，超时的探测不会阻塞调用方，也不会阻止进程退出；
+    调用方拿到已完成的部分结果，超时项标记为 timeout。
+    """
+
+    def __init__(self, default_timeout: float = 5.0):
+        self.default_timeout = default_timeout
+
+    def run(self, probes: Dict[str, Callable[[], Any]],
+            timeouts: Optional[Dict[str, float]] = None) -> Dict[str, ProbeResult]:
+        timeouts = timeouts or {}
+        results = {name: ProbeResult(name) for name in probes}
+        condition = threading.Condition()
+        started = time.monotonic()
+
+        def worker(name: str, probe: Callable[[], Any]) -> None:
+            begin = time.monotonic()
+            try:
+                value, status, error = probe(), "ok", None
+            except Exception as e:
+                value, status, error = None, "error", str(e)
+                logger.warning(f"探测 {name} 失败: {error}")
+            with condition:
+                result = results[name]
+                if result.status == "pending":
+                    result.value, result.status, result.error = value, status, error
+                    result.latency = time.monotonic() - begin
+                condition.notify_all()
+
+        for name, probe in probes.items():
+            threading.Thread(target=worker, args=(name, probe), name=f"probe-{name}", daemon=True).start()
+
+        deadlines = {name: started + timeouts.get(name, self.default_timeout) for name in probes}
+        with condition:
+            while True:
+                now = time.monotonic()
+                pending = [name for name, result in results.items() if result.status == "pending"]
+                for name in pending:
+                    if now >= deadlines[name]:
+                        result = results[name]
+                        result.status = "timeout"
+                        result.latency = now - started
+                        result.error = f"超过 {deadlines[name] - started:.1f} 秒未返回"
+                        logger.warning(f"探测 {name} 超时")
+                pending = [name for name in pending if results[name].status == "pending"]
+                if not pending:
+                    break
+                condition.wait(min(deadlines[name] for name in pending) - now)
+
+        return results
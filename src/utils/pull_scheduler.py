@@ -0,0 +1,319 @@
+import json
+import time
+import asyncio
+import logging
+import threading
+import aiohttp
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Optional
+
+from .ollama_pull import PullCancelled, PullError, PullProgress, format_bytes, resolve_ollama_host
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """令牌桶带宽限制，允许欠账，由调用方决定是否暂停"""
+
+    def __init__(self, rate: float, burst: Optional[float] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.rate = float(rate)
+        self.burst = float(burst if burst is not None else rate)
+        self.clock = clock
+        self.tokens = self.burst
+        self.updated_at = clock()
+
+    def _refill(self) -> None:
+        now = self.clock()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def take(self, amount: float) -> float:
+        """扣除令牌，返回还清欠账需要等待的秒数"""
+        self._refill()
+        self.tokens -= amount
+        return self.debt_seconds()
+
+    def debt_seconds(self) -> float:
+        """当前欠账折算成的等待时间"""
+        self._refill()
+        return max(-self.tokens, 0.0) / self.rate
+
+
+class TimeWindow:
+    """每日允许下载的时间段，支持跨午夜，例如 22:00-06:00"""
+
+    def __init__(self, start: str, end: str):
+        self.start = self._parse(start)
+        self.end = self._parse(end)
+
+    @staticmethod
+    def _parse(value: str) -> int:
+        hours, minutes = value.strip().split(':')
+        return int(hours) * 60 + int(minutes)
+
+    @classmethod
+    def parse(cls, spec: str) -> 'TimeWindow':
+        """从 "HH:MM-HH:MM" 格式解析"""
+        start, end = spec.split('-')
+        return cls(start, end)
+
+    def contains(self, moment: Optional[datetime] = None) -> bool:
+        moment = moment or datetime.now()
+        minute = moment.hour * 60 + moment.minute
+        if self.start <= self.end:
+            return self.start <= minute < self.end
+        return minute >= self.start or minute < self.end
+
+    def seconds_until_open(self, moment: Optional[datetime] = None) -> float:
+        """距离窗口开启的秒数，已在窗口内返回0"""
+        moment = moment or datetime.now()
+        if self.contains(moment):
+            return 0.0
+        opening = moment.replace(hour=self.start // 60, minute=self.start % 60,
+                                 second=0, microsecond=0)
+        if opening <= moment:
+            opening += timedelta(days=1)
+        return (opening - moment).total_seconds()
+
+    def __repr__(self) -> str:
+        return (f"TimeWindow({self.start // 60:02d}:{self.start % 60:02d}-"
+                f"{self.end // 60:02d}:{self.end % 60:02d})")
+
+
+class ModelPullStats:
+    """单个模型的拉取状态与吞吐量"""
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self.status = "pending"
+        self.error: Optional[str] = None
+        self.progress = PullProgress()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.pauses = 0
+
+    @property
+    def bytes_done(self) -> int:
+        return self.progress.completed_bytes
+
+    @property
+    def elapsed(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.monotonic()) - self.started_at
+
+    @property
+    def average_rate(self) -> float:
+        """整个拉取过程的平均速度（字节/秒）"""
+        elapsed = self.elapsed
+        return self.bytes_done / elapsed if elapsed > 0 else 0.0
+
+    def as_dict(self) -> Dict:
+        return {
+            'model': self.model_name,
+            'status': self.status,
+            'error': self.error,
+            'bytes': self.bytes_done,
+            'total': self.progress.total_bytes,
+            'elapsed': round(self.elapsed, 3),
+            'average_rate': self.average_rate,
+            'current_rate': self.progress.rate,
+            'pauses': self.pauses,
+        }
+
+
+class _Paused(Exception):
+    """超出带宽预算或离开时间窗口，需要断开后等待"""
+
+    def __init__(self, wait: float):
+        super().__init__(wait)
+        self.wait = wait
+
+
+class PullScheduler:
+    """并发拉取多个模型，共享带宽预算和下载时间窗口
+
+    Ollama 服务端负责实际下载，客户端无法直接限速。超出预算时断开
+    /api/pull 连接（服务端会取消下载并保留已下载的分片），等待令牌
+    补足后重新发起拉取，从而让长期平均速度不超过 bandwidth_limit。
+    """
+
+    def __init__(self, host: Optional[str] = None, max_parallel: int = 2,
+                 bandwidth_limit: Optional[float] = None,
+                 window: Optional[TimeWindow] = None,
+                 pause_threshold: float = 2.0, max_attempts: int = 3,
+                 progress_callback: Optional[Callable[[int, str], None]] = None,
+                 report_interval: float = 1.0,
+                 cancel_event: Optional[threading.Event] = None):
+        self.host = resolve_ollama_host(host)
+        self.max_parallel = max(1, max_parallel)
+        self.bucket = TokenBucket(bandwidth_limit) if bandwidth_limit else None
+        self.window = window
+        self.pause_threshold = pause_threshold
+        self.max_attempts = max_attempts
+        self.progress_callback = progress_callback
+        self.report_interval = report_interval
+        self.cancel_event = cancel_event
+        self.stats: Dict[str, ModelPullStats] = {}
+        self.started_at: Optional[float] = None
+        self._last_report = 0.0
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(s.bytes_done for s in self.stats.values())
+
+    @property
+    def aggregate_rate(self) -> float:
+        """所有模型的当前总速度（字节/秒）"""
+        return sum(s.progress.rate for s in self.stats.values() if s.status == "running")
+
+    @property
+    def average_rate(self) -> float:
+        if self.started_at is None:
+            return 0.0
+        elapsed = time.monotonic() - self.started_at
+        return self.total_bytes / elapsed if elapsed > 0 else 0.0
+
+    def _report(self, force: bool = False) -> None:
+        """汇总报告进度"""
+        now = time.monotonic()
+        if not self.progress_callback or (not force and now - self._last_report < self.report_interval):
+            return
+        self._last_report = now
+
+        total = sum(s.progress.total_bytes for s in self.stats.values())
+        finished = sum(1 for s in self.stats.values() if s.status in ("success", "failed", "cancelled"))
+        percent = int(100 * self.total_bytes / total) if total else 0
+        if finished == len(self.stats):
+            percent = 100
+        parts = [f"{s.model_name} {s.status} {format_bytes(s.progress.rate)}/s"
+                 for s in self.stats.values() if s.status in ("running", "paused")]
+        message = (f"已完成 {finished}/{len(self.stats)} 个模型, "
+                   f"总速度 {format_bytes(self.aggregate_rate)}/s")
+        if parts:
+            message += " | " + ", ".join(parts)
+        self.progress_callback(percent, message)
+
+    def _pause_needed(self) -> float:
+        """返回需要暂停的秒数，不需要暂停时返回0"""
+        if self.window is not None:
+            wait = self.window.seconds_until_open()
+            if wait > 0:
+                return wait
+        if self.bucket is not None:
+            debt = self.bucket.debt_seconds()
+            if debt > self.pause_threshold:
+                return debt
+        return 0.0
+
+    @property
+    def cancelled(self) -> bool:
+        return self.cancel_event is not None and self.cancel_event.is_set()
+
+    async def _sleep(self, seconds: float) -> None:
+        """可被 cancel_event 打断的等待"""
+        deadline = time.monotonic() + seconds
+        while not self.cancelled:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            await asyncio.sleep(min(remaining, 0.2))
+        raise PullCancelled("批量拉取已取消")
+
+    async def _wait_until_allowed(self, stats: ModelPullStats) -> None:
+        while True:
+            if self.cancelled:
+                raise PullCancelled("批量拉取已取消")
+            wait = self._pause_needed()
+            if wait <= 0:
+                return
+            stats.status = "paused"
+            logger.info(f"模型 {stats.model_name} 暂停 {wait:.1f} 秒")
+            self._report(force=True)
+            await self._sleep(min(wait, 60.0))
+
+    async def _stream_once(self, session: aiohttp.ClientSession, stats: ModelPullStats) -> None:
+        payload = {"model": stats.model_name, "name": stats.model_name, "stream": True}
+        async with session.post(f"{self.host}/api/pull", json=payload) as response:
+            if response.status != 200:
+                raise PullError(f"Ollama服务返回 {response.status}: {(await response.text()).strip()}")
+
+            async for line in response.content:
+                if self.cancelled:
+                    # 断开连接即可让服务端停止下载
+                    response.close()
+                    raise PullCancelled(f"模型 {stats.model_name} 拉取已取消")
+                if not line.strip():
+                    continue
+                before = stats.bytes_done
+                stats.progress.update(json.loads(line))
+                if self.bucket is not None:
+                    self.bucket.take(max(stats.bytes_done - before, 0))
+                self._report()
+
+                wait = self._pause_needed()
+                if wait > 0:
+                    # 关闭连接后服务端会取消本次下载，已完成的分片保留在磁盘上
+                    response.close()
+                    raise _Paused(wait)
+
+        if not stats.progress.success:
+            raise PullError(f"拉取意外结束，最后状态: {stats.progress.status or '无'}")
+
+    async def _pull_one(self, session: aiohttp.ClientSession, semaphore: asyncio.Semaphore,
+                        stats: ModelPullStats) -> None:
+        async with semaphore:
+            attempts = 0
+            delay = 0.0
+            stats.started_at = time.monotonic()
+            while True:
+                try:
+                    if delay:
+                        await self._sleep(delay)
+                        delay = 0.0
+                    await self._wait_until_allowed(stats)
+                    stats.status = "running"
+                    await self._stream_once(session, stats)
+                    stats.status = "success"
+                    break
+                except _Paused as paused:
+                    stats.pauses += 1
+                    stats.status = "paused"
+                    delay = min(paused.wait, 60.0)
+                except PullCancelled:
+                    stats.status = "cancelled"
+                    logger.info(f"模型 {stats.model_name} 拉取已取消")
+                    break
+                except (PullError, aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+                    attempts += 1
+                    if attempts >= self.max_attempts:
+                        stats.status = "failed"
+                        stats.error = str(e)
+                        logger.error(f"模型 {stats.model_name} 拉取失败: {str(e)}")
+                        break
+                    logger.warning(f"模型 {stats.model_name} 拉取出错，第 {attempts} 次重试: {str(e)}")
+                    delay = min(2 ** attempts, 30)
+            stats.finished_at = time.monotonic()
+            self._report(force=True)
+
+    async def run(self, model_names: Iterable[str]) -> Dict[str, ModelPullStats]:
+        """拉取所有模型，返回每个模型的统计信息"""
+        self.stats = {name: ModelPullStats(name) for name in dict.fromkeys(model_names)}
+        self.started_at = time.monotonic()
+        semaphore = asyncio.Semaphore(self.max_parallel)
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=5, sock_read=120)
+        connector = aiohttp.TCPConnector(limit=self.max_parallel)
+
+        async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+            await asyncio.gather(*(self._pull_one(session, semaphore, stats)
+                                   for stats in self.stats.values()))
+
+        logger.info(
+            f"批量拉取结束: {format_bytes(self.total_bytes)}, "
+            f"平均速度 {format_bytes(self.average_rate)}/s")
+        return self.stats
+
+    def run_sync(self, model_names: Iterable[str]) -> Dict[str, ModelPullStats]:
+        """在新的事件循环中运行，供同步代码调用"""
+        return asyncio.run(self.run(model_names))
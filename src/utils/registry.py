@@ -0,0 +1,131 @@
+import os
+import logging
+import requests
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REGISTRY_HOST = "registry.ollama.ai"
+DEFAULT_REGISTRY_URL = f"https://{DEFAULT_REGISTRY_HOST}"
+MANIFEST_MEDIA_TYPE = "application/vnd.docker.distribution.manifest.v2+json"
+
+
+class RegistryError(Exception):
+    """模型仓库请求失败，status 为仓库返回的HTTP状态码（没有收到响应时为None）"""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class ModelRef:
+    """模型名称解析，例如 deepseek-r1:7b -> registry.ollama.ai/library/deepseek-r1:7b"""
+
+    def __init__(self, host: str, namespace: str, repository: str, tag: str):
+        self.host = host
+        self.namespace = namespace
+        self.repository = repository
+        self.tag = tag
+
+    @classmethod
+    def parse(cls, name: str) -> 'ModelRef':
+        """解析模型名称，缺省部分使用Ollama的默认值"""
+        tag = "latest"
+        last = name.rsplit('/', 1)[-1]
+        if ':' in last:
+            name, tag = name.rsplit(':', 1)
+
+        parts = name.split('/')
+        if len(parts) == 1:
+            return cls(DEFAULT_REGISTRY_HOST, "library", parts[0], tag)
+        if len(parts) == 2:
+            return cls(DEFAULT_REGISTRY_HOST, parts[0], parts[1], tag)
+        return cls(parts[0], '/'.join(parts[1:-1]), parts[-1], tag)
+
+    @property
+    def short_name(self) -> str:
+        """ollama list 中显示的名称"""
+        name = f"{self.repository}:{self.tag}"
+        if self.namespace != "library":
+            name = f"{self.namespace}/{name}"
+        if self.host != DEFAULT_REGISTRY_HOST:
+            name = f"{self.host}/{name}"
+        return name
+
+    @property
+    def repository_path(self) -> str:
+        return f"{self.namespace}/{self.repository}"
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ModelRef) and str(self) == str(other)
+
+    def __hash__(self) -> int:
+        return hash(str(self))
+
+    def __str__(self) -> str:
+        return f"{self.host}/{self.namespace}/{self.repository}:{self.tag}"
+
+    def __repr__(self) -> str:
+        return f"ModelRef({str(self)!r})"
+
+
+class RegistryClient:
+    """访问Ollama模型仓库（OCI distribution v2 协议）"""
+
+    def __init__(self, base_url: Optional[str] = None, session: Optional[requests.Session] = None,
+                 timeout: float = 30.0):
+        self.base_url = (base_url or os.environ.get("DEEPSEEK_REGISTRY_URL") or DEFAULT_REGISTRY_URL).rstrip('/')
+        self.session = session or requests.Session()
+        self.timeout = timeout
+
+    def manifest_url(self, ref: ModelRef) -> str:
+        return f"{self.base_url}/v2/{ref.repository_path}/manifests/{ref.tag}"
+
+    def blob_url(self, ref: ModelRef, digest: str) -> str:
+        return f"{self.base_url}/v2/{ref.repository_path}/blobs/{digest}"
+
+    def get_manifest(self, ref: ModelRef) -> Tuple[Dict[str, Any], bytes]:
+        """获取模型清单，返回解析后的内容和原始字节"""
+        manifest, raw, _ = self.fetch_manifest(ref)
+        return manifest, raw
+
+    def fetch_manifest(self, ref: ModelRef, etag: Optional[str] = None
+                       ) -> Optional[Tuple[Dict[str, Any], bytes, Optional[str]]]:
+        """条件获取模型清单，返回 (内容, 原始字节, ETag)
+
+        传入上次的 etag 且清单未变化时，服务器返回304，此时返回None。
+        """
+        headers = {"Accept": MANIFEST_MEDIA_TYPE}
+        if etag:
+            headers["If-None-Match"] = etag
+        try:
+            response = self.session.get(self.manifest_url(ref), headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise RegistryError(f"获取模型清单失败 {ref.short_name}: {str(e)}") from e
+        if response.status_code == 304:
+            return None
+        if response.status_code == 404:
+            raise RegistryError(f"模型仓库中不存在 {ref.short_name}", 404)
+        if response.status_code != 200:
+            raise RegistryError(f"获取模型清单失败 {ref.short_name}: HTTP {response.status_code}",
+                                response.status_code)
+        try:
+            manifest = response.json()
+        except ValueError as e:
+            raise RegistryError(f"模型清单格式错误 {ref.short_name}: {str(e)}") from e
+        # 没有ETag时用清单摘要代替，registry v2 对两者都支持条件请求
+        new_etag = response.headers.get("ETag")
+        if not new_etag and response.headers.get("Docker-Content-Digest"):
+            new_etag = f'"{response.headers["Docker-Content-Digest"]}"'
+        return manifest, response.content, new_etag
+
+
+def manifest_blobs(manifest: Dict[str, Any]) -> List[Tuple[str, int]]:
+    """返回清单引用的全部blob (digest, size)，包括config"""
+    blobs = []
+    config = manifest.get('config')
+    if config and config.get('digest'):
+        blobs.append((config['digest'], int(config.get('size', 0))))
+    for layer in manifest.get('layers', []):
+        blobs.append((layer['digest'], int(layer.get('size', 0))))
+    return blobs
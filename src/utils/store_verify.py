@@ -0,0 +1,203 @@
+import os
+import json
+import mmap
+import time
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .config_cache import default_cache_dir
+from .model_store import ModelStore
+from .ollama_pull import format_bytes
+from .registry import manifest_blobs
+
+logger = logging.getLogger(__name__)
+
+HASH_WINDOW = 64 * 1024 * 1024
+
+
+def hash_file(path: Path) -> str:
+    """用 mmap 计算文件的 sha256
+
+    hashlib 处理大块数据时会释放GIL，多个文件可以在线程池中真正并行计算；
+    mmap 避免把数据复制到Python的缓冲区。
+    """
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return "sha256:" + hasher.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                for offset in range(0, len(mapped), HASH_WINDOW):
+                    hasher.update(view[offset:offset + HASH_WINDOW])
+            finally:
+                view.release()
+    return "sha256:" + hasher.hexdigest()
+
+
+def _file_key(stat: os.stat_result) -> List[int]:
+    return [stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns]
+
+
+class VerifyCache:
+    """已校验通过的blob，按 (设备, inode, 大小, mtime) 判断文件是否变化
+
+    文件未变化的blob再次校验时直接跳过，只重新计算新增或修改过的文件。
+    """
+
+    def __init__(self, path: Optional[Path] = None):
+        self.path = Path(path) if path else default_cache_dir() / 'verified-blobs.json'
+        self._entries: Optional[Dict[str, Dict[str, Any]]] = None
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        if self._entries is None:
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f).get('blobs', {})
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def is_verified(self, path: Path, digest: str, stat: os.stat_result) -> bool:
+        with self._lock:
+            entry = self._load().get(str(path))
+        return entry is not None and entry.get('digest') == digest and entry.get('key') == _file_key(stat)
+
+    def mark_verified(self, path: Path, digest: str, stat: os.stat_result) -> None:
+        with self._lock:
+            self._load()[str(path)] = {'digest': digest, 'key': _file_key(stat), 'verified_at': time.time()}
+
+    def forget(self, path: Path) -> None:
+        with self._lock:
+            self._load().pop(str(path), None)
+
+    def save(self) -> None:
+        """原子写入"""
+        with self._lock:
+            entries = dict(self._load())
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_name(self.path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'blobs': entries}, f)
+        os.replace(tmp_path, self.path)
+
+
+class StoreVerifier:
+    """校验模型目录中全部清单引用的blob
+
+    先按清单汇总需要校验的blob（多个模型共享的blob只算一次），缺失和
+    大小不符的直接报告；其余在线程池中并行计算哈希，文件未变化且已校验过的跳过。
+    """
+
+    def __init__(self, store: Optional[ModelStore] = None, cache: Optional[VerifyCache] = None,
+                 max_workers: Optional[int] = None,
+                 progress_callback: Optional[Callable[[int, str], None]] = None):
+        self.store = store or ModelStore()
+        self.cache = cache or VerifyCache()
+        self.max_workers = max_workers or min(8, os.cpu_count() or 1)
+        self.progress_callback = progress_callback
+
+    def _collect(self, models: Optional[Iterable[str]]) -> Tuple[Dict[str, Dict[str, Any]],
+                                                                 Dict[str, Tuple[int, List[str]]]]:
+        """返回 (各模型的结果, digest -> (大小, 引用它的模型))"""
+        wanted = set(models) if models else None
+        results: Dict[str, Dict[str, Any]] = {}
+        blobs: Dict[str, Tuple[int, List[str]]] = {}
+        for ref, path in self.store.iter_manifests():
+            name = ref.short_name
+            if wanted is not None and name not in wanted:
+                continue
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    entries = manifest_blobs(json.load(f))
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                results[name] = {'status': 'corrupt', 'problems': [{'manifest': str(path), 'error': str(e)}]}
+                continue
+            results[name] = {'status': 'ok', 'problems': [], 'size': sum(size for _, size in entries)}
+            for digest, size in entries:
+                blobs.setdefault(digest, (size, []))[1].append(name)
+        for name in (wanted or set()) - set(results):
+            results[name] = {'status': 'missing', 'problems': [{'error': "模型清单不存在"}]}
+        return results, blobs
+
+    def _hash(self, digest: str, path: Path) -> Tuple[str, Optional[str]]:
+        try:
+            return digest, hash_file(path)
+        except OSError as e:
+            logger.warning(f"读取 {path} 失败: {str(e)}")
+            return digest, None
+
+    def verify(self, models: Optional[Iterable[str]] = None, full: bool = False) -> Dict[str, Any]:
+        """校验模型（默认全部），full 为True时忽略缓存重新计算全部哈希"""
+        started = time.monotonic()
+        results, blobs = self._collect(models)
+        blob_status: Dict[str, str] = {}
+        pending: List[Tuple[str, Path, os.stat_result]] = []
+        cached = 0
+
+        for digest, (size, _) in blobs.items():
+            path = self.store.blob_path(digest)
+            try:
+                stat = path.stat()
+            except OSError:
+                blob_status[digest] = 'missing'
+                continue
+            if stat.st_size != size:
+                blob_status[digest] = 'size_mismatch'
+            elif not full and self.cache.is_verified(path, digest, stat):
+                blob_status[digest] = 'ok'
+                cached += 1
+            else:
+                pending.append((digest, path, stat))
+
+        total_bytes = sum(stat.st_size for _, _, stat in pending)
+        hashed_bytes = 0
+        hash_started = time.monotonic()
+        if pending:
+            stats = {digest: (path, stat) for digest, path, stat in pending}
+            with ThreadPoolExecutor(max_workers=min(self.max_workers, len(pending))) as pool:
+                # 大文件先算，避免最后只剩一个大文件在单线程上计算
+                ordered = sorted(pending, key=lambda item: item[2].st_size, reverse=True)
+                for digest, actual in pool.map(lambda item: self._hash(item[0], item[1]), ordered):
+                    path, stat = stats[digest]
+                    hashed_bytes += stat.st_size
+                    if actual == digest:
+                        blob_status[digest] = 'ok'
+                        self.cache.mark_verified(path, digest, stat)
+                    else:
+                        blob_status[digest] = 'corrupt' if actual else 'unreadable'
+                        self.cache.forget(path)
+                    if self.progress_callback and total_bytes:
+                        self.progress_callback(int(100 * hashed_bytes / total_bytes),
+                                               f"已校验 {format_bytes(hashed_bytes)}/{format_bytes(total_bytes)}")
+        hash_seconds = time.monotonic() - hash_started
+        self.cache.save()
+
+        for digest, (size, names) in blobs.items():
+            status = blob_status[digest]
+            if status == 'ok':
+                continue
+            for name in names:
+                if results[name]['status'] == 'ok':
+                    results[name]['status'] = 'missing' if status == 'missing' else 'corrupt'
+                results[name]['problems'].append({'digest': digest, 'size': size, 'error': status})
+
+        report = {
+            'models': results,
+            'blobs': len(blobs),
+            'cached': cached,
+            'hashed': len(pending),
+            'hashed_bytes': hashed_bytes,
+            'seconds': round(time.monotonic() - started, 3),
+            'gb_per_s': round(hashed_bytes / hash_seconds / 1024 ** 3, 2) if hashed_bytes and hash_seconds else None,
+            'ok': all(result['status'] == 'ok' for result in results.values()),
+        }
+        logger.info(f"校验完成: {len(results)} 个模型，{len(blobs)} 个blob，跳过未变化的 {cached} 个，"
+                    f"计算 {format_bytes(hashed_bytes)}"
+                    + (f"，{report['gb_per_s']} GB/s" if report['gb_per_s'] else ""))
+        return report
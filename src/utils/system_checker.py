@@ -1,27 +1,122 @@
 import os
+import re
+import json
+import socket
 import psutil
 import platform
 import subprocess
 import logging
-from typing import Dict, Any
+import time
+from typing import TYPE_CHECKING, Dict, Any, List, Optional, Tuple
 import sys
+from datetime import datetime, timezone
+
+from .probes import ProbeEngine, ProbeResult
+from .disk_preflight import default_models_path, volume_usage
+from .hardware_cache import HardwareSnapshotCache, get_snapshot_cache, scoped_field
+from .model_catalog import ModelCatalog, ModelRecord, normalize_requirements
+from .tracing import traced
+
+if TYPE_CHECKING:
+    from .gpu_telemetry import GpuTelemetry
 
 logger = logging.getLogger(__name__)
 
+# 各探测项的截止时间（秒），GPU/CUDA 需要启动外部进程
+DEFAULT_PROBE_TIMEOUTS = {
+    'os_info': 2.0,
+    'cpu_info': 2.0,
+    'memory_info': 2.0,
+    'gpu_info': 8.0,
+    'cuda_info': 8.0,
+    'disk_info': 3.0,
+}
+
+SNAPSHOT_SCHEMA_VERSION = 1
+
 class SystemChecker:
-    def __init__(self):
+    def __init__(self, probe_timeouts: Optional[Dict[str, float]] = None,
+                 command_timeout: float = 5.0,
+                 cache: Optional[HardwareSnapshotCache] = None,
+                 disk_path: Optional[str] = None,
+                 telemetry: Optional['GpuTelemetry'] = None):
         self.system = platform.system().lower()
+        # 已启动的常驻GPU采样，GPU信息直接取最近一次采样，不再单独启动 nvidia-smi
+        self.telemetry = telemetry
+        # 磁盘检查针对模型实际写入的目录所在的卷
+        self.disk_path = disk_path or default_models_path()
+        self.probe_timeouts = dict(DEFAULT_PROBE_TIMEOUTS, **(probe_timeouts or {}))
+        self.command_timeout = command_timeout
+        self.engine = ProbeEngine()
+        self.cache = cache or get_snapshot_cache()
 
-    def check_system(self) -> Dict[str, Any]:
-        """检查系统信息"""
+    def set_disk_path(self, path: str) -> None:
+        """修改安装目录，之后的检查针对新目录所在的卷"""
+        self.disk_path = path
+
+    def _probes(self) -> Dict[str, Any]:
         return {
-            'os_info': self._get_os_info(),
-            'cpu_info': self._get_cpu_info(),
-            'memory_info': self._get_memory_info(),
-            'gpu_info': self._get_gpu_info(),
-            'disk_info': self._get_disk_info()
+            'os_info': self._get_os_info,
+            'cpu_info': self._get_cpu_info,
+            'memory_info': self._get_memory_info,
+            'gpu_info': self._get_gpu_info,
+            'cuda_info': self._get_cuda_info,
+            'disk_info': self._get_disk_info,
         }
 
+    def _run_probes(self, names: List[str]) -> Dict[str, ProbeResult]:
+        probes = self._probes()
+        return self.engine.run({name: probes[name] for name in names}, self.probe_timeouts)
+
+    def _cache_keys(self) -> Dict[str, str]:
+        """缓存键 -> 探测项；共享缓存中的磁盘信息按解析后的目录分别保存"""
+        disk_key = scoped_field('disk_info', os.path.realpath(self.disk_path))
+        return {disk_key if name == 'disk_info' else name: name for name in self._probes()}
+
+    @staticmethod
+    def _assemble(results: Dict[str, ProbeResult]) -> Dict[str, Any]:
+        system_info = {name: result.value for name, result in results.items()}
+        system_info['probe_stats'] = {name: result.as_dict() for name, result in results.items()}
+        return system_info
+
+    @traced()
+    def check_system(self) -> Dict[str, Any]:
+        """并行检查系统信息，超时或失败的探测项为None，耗时记录在 probe_stats 中"""
+        keys = self._cache_keys()
+        results = self._run_probes(list(keys.values()))
+        self.cache.store({key: results[name] for key, name in keys.items()})
+        return self._assemble(results)
+
+    def get_snapshot(self) -> Dict[str, Any]:
+        """读取缓存的系统信息，只重新探测已过期的字段"""
+        keys = self._cache_keys()
+
+        def probe(stale: List[str]) -> Dict[str, ProbeResult]:
+            results = self._run_probes([keys[key] for key in stale])
+            return {key: results[keys[key]] for key in stale}
+
+        results = self.cache.snapshot(keys, probe)
+        return self._assemble({keys[key]: result for key, result in results.items()})
+
+    def export_snapshot(self, path: Optional[str] = None) -> Dict[str, Any]:
+        """导出当前主机的硬件快照（JSON），供集中规划使用"""
+        snapshot = self.check_system()
+        snapshot['hostname'] = socket.gethostname()
+        snapshot['captured_at'] = datetime.now(timezone.utc).isoformat()
+        snapshot['schema_version'] = SNAPSHOT_SCHEMA_VERSION
+        if path:
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(snapshot, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, path)
+            logger.info(f"硬件快照已导出到 {path}")
+        return snapshot
+
+    def _run(self, cmd, timeout: Optional[float] = None, **kwargs) -> subprocess.CompletedProcess:
+        """运行外部命令，始终带超时"""
+        return subprocess.run(cmd, capture_output=True, text=True,
+                              timeout=timeout or self.command_timeout, **kwargs)
+
     def _get_os_info(self) -> Dict[str, str]:
         """获取操作系统信息"""
         return {
@@ -47,80 +142,92 @@ class SystemChecker:
             'percent': mem.percent
         }
 
-    def _get_gpu_info(self) -> Dict[str, Any]:
-        """获取GPU信息"""
-        gpu_info = {
-            'has_gpu': False,
-            'has_cuda': False,
-            'gpu_name': None,
-            'gpu_memory': None
-        }
-        
+    def _get_gpu_info(self) -> Optional[Dict[str, Any]]:
+        """获取NVIDIA GPU信息，未检测到时返回None"""
+        telemetry = self.telemetry
+        if telemetry is not None and telemetry.running:
+            # 刚启动时等待第一次采样，采样间隔远小于探测截止时间
+            telemetry.wait_for_sample(min(self.command_timeout, 2.0))
+            info = telemetry.gpu_info()
+            if info is not None:
+                return info
+
+        deadline = time.monotonic() + self.probe_timeouts['gpu_info']
         try:
-            if self.system == 'windows':
-                # Windows下使用PowerShell检查NVIDIA GPU
-                cmd = ["powershell", "-Command", "Get-WmiObject Win32_VideoController | Where-Object {$_.Name -like '*NVIDIA*'} | Select-Object Name, AdapterRAM"]
-                result = subprocess.run(cmd, capture_output=True, text=True)
-                if 'NVIDIA' in result.stdout:
-                    gpu_info['has_gpu'] = True
-                    # 提取GPU名称
-                    for line in result.stdout.split('\n'):
-                        if 'NVIDIA' in line:
-                            gpu_info['gpu_name'] = line.strip()
-                            break
-            else:
-                # Linux/macOS下使用nvidia-smi
-                result = subprocess.run(['nvidia-smi'], capture_output=True, text=True)
-                if result.returncode == 0:
-                    gpu_info['has_gpu'] = True
-                    # 可以进一步解析nvidia-smi的输出获取详细信息
-                    
-            # 检查CUDA
-            if self.system == 'windows':
-                cuda_cmd = ["powershell", "-Command", "Get-Command nvcc -ErrorAction SilentlyContinue"]
-            else:
-                cuda_cmd = ["which", "nvcc"]
-            
-            result = subprocess.run(cuda_cmd, capture_output=True, text=True)
-            gpu_info['has_cuda'] = result.returncode == 0
-                
-        except Exception as e:
-            logger.warning(f"获取GPU信息时出错: {str(e)}")
-            
-        return gpu_info
-
-    def _get_disk_info(self) -> Dict[str, float]:
-        """获取磁盘信息"""
-        if self.system == 'windows':
-            # Windows下检查C盘
-            disk = psutil.disk_usage('C:\\')
-        else:
-            # Linux/macOS下检查根目录
-            disk = psutil.disk_usage('/')
-            
+            result = self._run(['nvidia-smi', '--query-gpu=name,memory.total',
+                                '--format=csv,noheader,nounits'])
+            if result.returncode == 0:
+                gpus = []
+                for line in result.stdout.strip().splitlines():
+                    name, memory = [field.strip() for field in line.rsplit(',', 1)]
+                    gpus.append({'name': name, 'memory': float(memory) / 1024})  # MiB -> GB
+                if gpus:
+                    return {
+                        'name': gpus[0]['name'],
+                        'count': len(gpus),
+                        'total_memory': sum(gpu['memory'] for gpu in gpus),  # GB
+                        'gpus': gpus,
+                    }
+        except (FileNotFoundError, ValueError) as e:
+            logger.debug(f"nvidia-smi 不可用: {str(e)}")
+        except subprocess.TimeoutExpired as e:
+            # 驱动无响应时PowerShell查询通常也会卡住，不再占用剩余的探测时间
+            logger.debug(f"nvidia-smi 无响应: {str(e)}")
+            return None
+
+        remaining = deadline - time.monotonic()
+        if self.system == 'windows' and remaining > 0.5:
+            # Windows下没有nvidia-smi时使用PowerShell检查NVIDIA GPU，总耗时不超过探测截止时间
+            cmd = ["powershell", "-Command", "Get-WmiObject Win32_VideoController | Where-Object {$_.Name -like '*NVIDIA*'} | ForEach-Object { $_.Name + ';' + $_.AdapterRAM }"]
+            try:
+                result = self._run(cmd, timeout=min(self.command_timeout, remaining - 0.5))
+            except (FileNotFoundError, subprocess.TimeoutExpired) as e:
+                logger.debug(f"PowerShell 查询GPU失败: {str(e)}")
+                return None
+            for line in result.stdout.splitlines():
+                if 'NVIDIA' in line:
+                    name, _, ram = line.strip().partition(';')
+                    # AdapterRAM 为32位字段，大于4GB的显存会被截断，仅作参考
+                    memory = int(ram) / (1024**3) if ram.strip().isdigit() else 0.0
+                    return {'name': name, 'count': 1, 'total_memory': memory,
+                            'gpus': [{'name': name, 'memory': memory}]}
+        return None
+
+    def _get_cuda_info(self) -> Dict[str, Any]:
+        """获取CUDA工具包信息"""
+        try:
+            result = self._run(['nvcc', '--version'])
+        except FileNotFoundError:
+            return {'available': False, 'version': None}
+        match = re.search(r'release (\d+\.\d+)', result.stdout)
         return {
-            'total': disk.total / (1024**3),  # GB
-            'free': disk.free / (1024**3),  # GB
-            'percent': disk.percent
+            'available': result.returncode == 0,
+            'version': match.group(1) if match else None,
         }
 
+    def _get_disk_info(self) -> Dict[str, Any]:
+        """获取模型目录所在卷的磁盘信息（目录不存在时按最近的已存在父目录）"""
+        return volume_usage(self.disk_path)
+
+    @traced()
     def check_docker(self) -> bool:
         """检查Docker是否已安装并运行"""
         try:
             if self.system == 'windows':
                 # Windows下检查Docker Desktop
                 cmd = ["powershell", "-Command", "Get-Service com.docker.service -ErrorAction SilentlyContinue"]
-                result = subprocess.run(cmd, capture_output=True, text=True)
+                result = self._run(cmd)
                 return 'Running' in result.stdout
             else:
                 # Linux/macOS下检查Docker守护进程
                 cmd = ["docker", "info"]
-                result = subprocess.run(cmd, capture_output=True)
+                result = self._run(cmd)
                 return result.returncode == 0
         except Exception as e:
             logger.warning(f"检查Docker状态时出错: {str(e)}")
             return False
             
+    @traced()
     def check_ollama(self) -> bool:
         """检查Ollama是否已安装"""
         try:
@@ -131,28 +238,46 @@ class SystemChecker:
                 # Linux/macOS下检查Ollama进程
                 cmd = ["pgrep", "ollama"]
                 
-            result = subprocess.run(cmd, capture_output=True)
+            result = self._run(cmd)
             return result.returncode == 0
         except Exception as e:
             logger.warning(f"检查Ollama状态时出错: {str(e)}")
             return False
 
     def check_model_compatibility(self, model_requirements: Dict[str, any]) -> Tuple[bool, str]:
-        """检查系统是否满足模型要求"""
-        system_info = self.check_system()
-        
+        """检查系统是否满足模型要求
+
+        model_requirements 使用 config.yaml 的字段名（gpu_memory/system_memory/disk_space），
+        也兼容旧的 vram_required/ram_required/disk_required。
+        """
+        required = normalize_requirements(model_requirements)
+        system_info = self.get_snapshot()
+        for key in ("memory_info", "disk_info"):
+            if system_info[key] is None:
+                return False, f"无法获取系统信息: {system_info['probe_stats'][key]['error']}"
+
         # 检查内存
-        if system_info["memory_info"]["total"] < model_requirements["ram_required"]:
-            return False, f"系统内存不足: 需要 {model_requirements['ram_required']}GB，实际 {system_info['memory_info']['total']:.1f}GB"
+        if system_info["memory_info"]["total"] < required["system_memory"]:
+            return False, f"系统内存不足: 需要 {required['system_memory']:g}GB，实际 {system_info['memory_info']['total']:.1f}GB"
 
         # 检查显存
         if system_info["gpu_info"] is None:
             return False, "未检测到NVIDIA GPU"
-        if system_info["gpu_info"]["total_memory"] < model_requirements["vram_required"]:
-            return False, f"GPU显存不足: 需要 {model_requirements['vram_required']}GB，实际 {system_info['gpu_info']['total_memory']}GB"
+        if system_info["gpu_info"]["total_memory"] < required["gpu_memory"]:
+            return False, f"GPU显存不足: 需要 {required['gpu_memory']:g}GB，实际 {system_info['gpu_info']['total_memory']}GB"
 
         # 检查磁盘空间
-        if system_info["disk_info"]["free"] < model_requirements["disk_required"]:
-            return False, f"磁盘空间不足: 需要 {model_requirements['disk_required']}GB，实际可用 {system_info['disk_info']['free']:.1f}GB"
+        if system_info["disk_info"]["free"] < required["disk_space"]:
+            return False, f"磁盘空间不足: 需要 {required['disk_space']:g}GB，模型目录所在卷实际可用 {system_info['disk_info']['free']:.1f}GB"
+
+        return True, "系统配置满足要求" 
 
-        return True, "系统配置满足要求" 
\ No newline at end of file
+    def recommend_models(self, catalog: ModelCatalog, family: Optional[str] = None) -> List[ModelRecord]:
+        """本机资源能满足的模型，按参数量从大到小；无法获取GPU/内存/磁盘信息时返回空列表"""
+        system_info = self.get_snapshot()
+        gpu_info = system_info.get('gpu_info')
+        memory_info = system_info.get('memory_info')
+        disk_info = system_info.get('disk_info')
+        if not gpu_info or not memory_info or not disk_info:
+            return []
+        return catalog.within_budget(gpu_info['total_memory'], memory_info['total'], disk_info['free'], family)
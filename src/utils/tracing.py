@@ -0,0 +1,308 @@
+import os
+import re
+import json
+import time
+import socket
+import logging
+import functools
+import threading
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .config_cache import default_cache_dir
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = 'deepseek_installer_phase'
+RECENT_SPANS = 256
+_SAMPLE_PATTERN = re.compile(r'^(\w+)\{phase="([^"]*)",outcome="([^"]*)"\} (\S+)$')
+
+
+class Span:
+    """一个阶段的耗时记录
+
+    outcome 默认为 ok，抛出异常时为 error；返回bool的阶段可以设为 failed。
+    """
+
+    __slots__ = ('name', 'trace_id', 'span_id', 'parent_id', 'start', 'end', 'bytes', 'outcome',
+                 'error', 'attributes', '_started')
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start = time.time()
+        self.end: Optional[float] = None
+        self.bytes = 0
+        self.outcome = 'ok'
+        self.error: Optional[str] = None
+        self.attributes = attributes
+        self._started = time.perf_counter()
+
+    @property
+    def duration(self) -> float:
+        return (self.end - self.start) if self.end is not None else time.perf_counter() - self._started
+
+    def add_bytes(self, count: int) -> None:
+        self.bytes += int(count)
+
+    def set(self, **attributes: Any) -> None:
+        self.attributes.update(attributes)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            'name': self.name,
+            'trace_id': self.trace_id,
+            'span_id': self.span_id,
+            'parent_id': self.parent_id,
+            'start': round(self.start, 6),
+            'end': round(self.end, 6) if self.end is not None else None,
+            'duration_s': round(self.duration, 6),
+            'bytes': self.bytes,
+            'outcome': self.outcome,
+            'error': self.error,
+            'attributes': self.attributes,
+        }
+
+
+class _Aggregate:
+    __slots__ = ('count', 'duration_sum', 'bytes_sum', 'last_duration', 'last_end')
+
+    def __init__(self):
+        self.count = 0
+        self.duration_sum = 0.0
+        self.bytes_sum = 0
+        self.last_duration = 0.0
+        self.last_end = 0.0
+
+
+class Tracer:
+    """记录安装各阶段的span
+
+    span 写入JSON行文件（trace_path），并按 (阶段, 结果) 汇总写成 node-exporter
+    textfile collector 读取的Prometheus文本文件（textfile_path）。命令行每次运行都是
+    新进程，写文本文件前先读入旧文件中的计数，累计值跨进程保持递增。
+    profile_phases 中的阶段（"*" 表示全部）用 cProfile 采样，结果保存为 .prof 文件。
+    没有配置任何输出时只在内存中保留最近的span，开销可以忽略。
+    """
+
+    def __init__(self, trace_path: Optional[str] = None, textfile_path: Optional[str] = None,
+                 profile_phases: Iterable[str] = (), profile_dir: Optional[str] = None):
+        self.trace_path = Path(trace_path) if trace_path else None
+        self.textfile_path = Path(textfile_path) if textfile_path else None
+        self.profile_phases = set(profile_phases)
+        self.profile_dir = Path(profile_dir) if profile_dir else default_cache_dir() / 'profiles'
+        self.recent: List[Dict[str, Any]] = []
+        self._aggregates: Dict[Tuple[str, str], _Aggregate] = {}
+        self._textfile_loaded = False
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._host = socket.gethostname()
+
+    @classmethod
+    def from_env(cls) -> 'Tracer':
+        """DEEPSEEK_TRACE_FILE、DEEPSEEK_METRICS_TEXTFILE、DEEPSEEK_PROFILE（逗号分隔的阶段名）"""
+        phases = [p.strip() for p in os.environ.get('DEEPSEEK_PROFILE', '').split(',') if p.strip()]
+        return cls(os.environ.get('DEEPSEEK_TRACE_FILE'), os.environ.get('DEEPSEEK_METRICS_TEXTFILE'),
+                   phases, os.environ.get('DEEPSEEK_PROFILE_DIR'))
+
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def current(self) -> Optional[Span]:
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+    def span(self, name: str, **attributes: Any) -> '_SpanContext':
+        return _SpanContext(self, name, attributes)
+
+    def _start(self, name: str, attributes: Dict[str, Any]) -> Span:
+        parent = self.current()
+        span = Span(name, parent.trace_id if parent else os.urandom(8).hex(),
+                    parent.span_id if parent else None, attributes)
+        self._stack().append(span)
+        return span
+
+    def _finish(self, span: Span) -> None:
+        span.end = span.start + (time.perf_counter() - span._started)
+        stack = self._stack()
+        if stack and stack[-1] is span:
+            stack.pop()
+        record = dict(span.as_dict(), host=self._host, pid=os.getpid(), thread=threading.current_thread().name)
+        with self._lock:
+            self.recent.append(record)
+            del self.recent[:-RECENT_SPANS]
+            aggregate = self._aggregates.setdefault((span.name, span.outcome), _Aggregate())
+            aggregate.count += 1
+            aggregate.duration_sum += span.duration
+            aggregate.bytes_sum += span.bytes
+            aggregate.last_duration = span.duration
+            aggregate.last_end = span.end
+            try:
+                if self.trace_path:
+                    self._append_trace(record)
+                if self.textfile_path:
+                    self._write_textfile()
+            except OSError as e:
+                # 追踪输出失败不影响安装本身
+                logger.warning(f"写入追踪数据失败: {str(e)}")
+
+    def _append_trace(self, record: Dict[str, Any]) -> None:
+        self.trace_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.trace_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+
+    def _load_textfile(self) -> None:
+        """读入上次运行写出的累计值"""
+        self._textfile_loaded = True
+        try:
+            with open(self.textfile_path, 'r', encoding='utf-8') as f:
+                lines = f.readlines()
+        except OSError:
+            return
+        previous: Dict[Tuple[str, str], _Aggregate] = {}
+        for line in lines:
+            match = _SAMPLE_PATTERN.match(line.strip())
+            if not match:
+                continue
+            metric, phase, outcome, value = match.groups()
+            aggregate = previous.setdefault((phase, outcome), _Aggregate())
+            field = {
+                f'{METRIC_PREFIX}_duration_seconds_count': 'count',
+                f'{METRIC_PREFIX}_duration_seconds_sum': 'duration_sum',
+                f'{METRIC_PREFIX}_bytes_total': 'bytes_sum',
+                f'{METRIC_PREFIX}_last_duration_seconds': 'last_duration',
+                f'{METRIC_PREFIX}_last_end_timestamp_seconds': 'last_end',
+            }.get(metric)
+            if field:
+                setattr(aggregate, field, type(getattr(aggregate, field))(float(value)))
+        for key, old in previous.items():
+            aggregate = self._aggregates.get(key)
+            if aggregate is None:
+                self._aggregates[key] = old
+                continue
+            aggregate.count += old.count
+            aggregate.duration_sum += old.duration_sum
+            aggregate.bytes_sum += old.bytes_sum
+
+    def _write_textfile(self) -> None:
+        """原子写入，node-exporter 不会读到写了一半的文件"""
+        if not self._textfile_loaded:
+            self._load_textfile()
+        metrics = [
+            ('duration_seconds', 'summary', "阶段耗时", None),
+            ('bytes_total', 'counter', "阶段传输的字节数", 'bytes_sum'),
+            ('last_duration_seconds', 'gauge', "最近一次的耗时", 'last_duration'),
+            ('last_end_timestamp_seconds', 'gauge', "最近一次结束的Unix时间", 'last_end'),
+        ]
+        lines = []
+        items = sorted(self._aggregates.items())
+        for suffix, kind, description, field in metrics:
+            name = f'{METRIC_PREFIX}_{suffix}'
+            lines.append(f'# HELP {name} {description}')
+            lines.append(f'# TYPE {name} {kind}')
+            for (phase, outcome), aggregate in items:
+                labels = f'{{phase="{phase}",outcome="{outcome}"}}'
+                if field is None:
+                    lines.append(f'{name}_sum{labels} {aggregate.duration_sum:.6f}')
+                    lines.append(f'{name}_count{labels} {aggregate.count}')
+                else:
+                    lines.append(f'{name}{labels} {getattr(aggregate, field)}')
+        self.textfile_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.textfile_path.with_name(self.textfile_path.name + f'.{os.getpid()}.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
+        os.replace(tmp_path, self.textfile_path)
+
+    def should_profile(self, name: str) -> bool:
+        return bool(self.profile_phases) and ('*' in self.profile_phases or name in self.profile_phases)
+
+
+class _SpanContext:
+    def __init__(self, tracer: Tracer, name: str, attributes: Dict[str, Any]):
+        self.tracer = tracer
+        self.name = name
+        self.attributes = attributes
+        self.span: Optional[Span] = None
+        self._profiler = None
+
+    def __enter__(self) -> Span:
+        self.span = self.tracer._start(self.name, self.attributes)
+        if self.tracer.should_profile(self.name):
+            import cProfile
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+                self._profiler = profiler
+            except ValueError:
+                # 同一线程中已有其他阶段在采样（例如外层阶段）
+                pass
+        return self.span
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        span = self.span
+        if self._profiler is not None:
+            self._profiler.disable()
+            self.tracer.profile_dir.mkdir(parents=True, exist_ok=True)
+            path = self.tracer.profile_dir / f"{self.name}-{time.strftime('%Y%m%d-%H%M%S')}-{span.span_id}.prof"
+            try:
+                self._profiler.dump_stats(str(path))
+                span.set(profile=str(path))
+            except OSError as e:
+                logger.warning(f"保存性能分析结果失败: {str(e)}")
+        if exc_type is not None:
+            span.outcome = 'cancelled' if issubclass(exc_type, KeyboardInterrupt) else 'error'
+            span.error = f"{exc_type.__name__}: {exc}"
+        self.tracer._finish(span)
+        return False
+
+
+_tracer: Optional[Tracer] = None
+_tracer_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """进程内共享的Tracer，首次使用时按环境变量配置"""
+    global _tracer
+    if _tracer is None:
+        with _tracer_lock:
+            if _tracer is None:
+                _tracer = Tracer.from_env()
+    return _tracer
+
+
+def configure(trace_path: Optional[str] = None, textfile_path: Optional[str] = None,
+              profile_phases: Iterable[str] = (), profile_dir: Optional[str] = None) -> Tracer:
+    """替换共享的Tracer（例如命令行参数指定了输出位置），未指定的项使用环境变量"""
+    global _tracer
+    env = Tracer.from_env()
+    tracer = Tracer(trace_path or env.trace_path, textfile_path or env.textfile_path,
+                    list(profile_phases) or env.profile_phases, profile_dir or env.profile_dir)
+    with _tracer_lock:
+        _tracer = tracer
+    return tracer
+
+
+def span(name: str, **attributes: Any) -> _SpanContext:
+    """记录一个阶段：with span('install_model', model=name) as s: ..."""
+    return get_tracer().span(name, **attributes)
+
+
+def traced(name: Optional[str] = None) -> Callable:
+    """把函数记录为一个阶段；返回False时结果记为 failed"""
+    def decorator(func: Callable) -> Callable:
+        phase = name or func.__name__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(phase) as current:
+                result = func(*args, **kwargs)
+                if result is False:
+                    current.outcome = 'failed'
+                return result
+        return wrapper
+    return decorator
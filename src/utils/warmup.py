@@ -0,0 +1,194 @@
+import os
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from .disk_preflight import default_models_path
+from .model_store import ModelStore
+from .ollama_client import OllamaClient, OllamaError
+from .ollama_pull import format_bytes
+from .registry import ModelRef, manifest_blobs
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SIZE = 256 * 1024 * 1024
+READ_SIZE = 8 * 1024 * 1024
+DEFAULT_KEEP_ALIVE = '30m'
+
+
+def find_model_blobs(model_name: str, models_paths: Iterable[str]) -> List[Tuple[Path, int]]:
+    """在候选模型目录中找到模型清单，返回已存在的blob文件及大小"""
+    ref = ModelRef.parse(model_name)
+    for models_path in models_paths:
+        store = ModelStore(models_path)
+        manifest = store.read_manifest(ref)
+        if manifest is None:
+            continue
+        return [(store.blob_path(digest), size) for digest, size in manifest_blobs(manifest)
+                if store.has_blob(digest, size)]
+    return []
+
+
+def split_segments(files: Iterable[Tuple[Path, int]],
+                   segment_size: Optional[int] = None) -> List[Tuple[Path, int, int]]:
+    """把文件切成 (路径, 偏移, 长度) 的分段，大文件也能由多个线程并行预读"""
+    segment_size = segment_size or SEGMENT_SIZE
+    segments = []
+    for path, size in files:
+        for offset in range(0, size, segment_size):
+            segments.append((path, offset, min(segment_size, size - offset)))
+    return segments
+
+
+def _read_segment(path: Path, offset: int, length: int) -> int:
+    """顺序读取分段，把数据带入页缓存；缓冲区复用，读到的数据直接丢弃"""
+    buffer = bytearray(min(READ_SIZE, length))
+    view = memoryview(buffer)
+    done = 0
+    with open(path, 'rb', buffering=0) as f:
+        f.seek(offset)
+        while done < length:
+            count = f.readinto(view[:min(len(buffer), length - done)])
+            if not count:
+                break
+            done += count
+    return done
+
+
+def _advise_segment(path: Path, offset: int, length: int) -> int:
+    """posix_fadvise(WILLNEED)：内核在后台把分段读入页缓存，调用本身很快返回"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, offset, length, os.POSIX_FADV_WILLNEED)
+    finally:
+        os.close(fd)
+    return length
+
+
+def prefetch(files: Iterable[Tuple[Path, int]], mode: str = 'auto', max_workers: int = 4,
+             cancel_event: Optional[threading.Event] = None) -> Dict[str, Any]:
+    """把文件预读到页缓存
+
+    mode 为 "advise" 时只发出 WILLNEED 提示，由内核异步读取；为 "read" 时
+    多线程实际读取一遍（所有平台可用，返回时数据已在页缓存中）；"auto"
+    在支持 posix_fadvise 的系统上先发提示再读取，提示让内核提前合并大块I/O。
+    cancel_event 被设置后尚未开始的分段不再读取，结果中 cancelled 为True。
+    """
+    if mode == 'auto':
+        mode = 'advise+read' if hasattr(os, 'posix_fadvise') else 'read'
+    segments = split_segments(files)
+    started = time.monotonic()
+    total = 0
+
+    def cancelled() -> bool:
+        return cancel_event is not None and cancel_event.is_set()
+
+    def run(step: Callable[[Path, int, int], int], segment: Tuple[Path, int, int]) -> int:
+        return 0 if cancelled() else step(*segment)
+
+    if segments:
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(segments)))) as pool:
+            if 'advise' in mode and not cancelled():
+                total = sum(pool.map(lambda s: run(_advise_segment, s), segments))
+            if 'read' in mode and not cancelled():
+                total = sum(pool.map(lambda s: run(_read_segment, s), segments))
+    elapsed = time.monotonic() - started
+    return {
+        'mode': mode,
+        'files': len({path for path, _, _ in segments}),
+        'bytes': total,
+        'seconds': round(elapsed, 3),
+        'gb_per_s': round(total / elapsed / 1024 ** 3, 2) if elapsed > 0 else None,
+        'cancelled': cancelled(),
+    }
+
+
+class ModelWarmer:
+    """安装后或服务启动时预热模型
+
+    先把模型的blob并行预读到页缓存，再通过 keep_alive 让Ollama加载模型并常驻内存，
+    第一个真实请求不用再等待读盘和加载。预热后再次请求加载，两次耗时之差
+    就是为第一个请求省下的冷启动时间。
+    """
+
+    def __init__(self, client: Optional[OllamaClient] = None, models_paths: Optional[List[str]] = None,
+                 keep_alive: Any = DEFAULT_KEEP_ALIVE, mode: str = 'auto', max_workers: int = 4,
+                 progress_callback: Optional[Callable[[int, str], None]] = None,
+                 progress_range: Tuple[int, int] = (0, 100),
+                 cancel_event: Optional[threading.Event] = None):
+        self.client = client or OllamaClient()
+        self.models_paths = list(dict.fromkeys(models_paths or [default_models_path()]))
+        self.keep_alive = keep_alive
+        self.mode = mode
+        self.max_workers = max_workers
+        self.progress_callback = progress_callback
+        self.progress_range = progress_range
+        self.cancel_event = cancel_event
+
+    def _report(self, percent: int, message: str) -> None:
+        logger.info(message)
+        if self.progress_callback:
+            low, high = self.progress_range
+            self.progress_callback(low + (high - low) * percent // 100, message)
+
+    def _cancelled(self, result: Dict[str, Any]) -> bool:
+        """预读、加载等步骤之间检查取消，已加载的模型由 keep_alive 到期后自动卸载"""
+        if self.cancel_event is None or not self.cancel_event.is_set():
+            return False
+        result['cancelled'] = True
+        logger.info(f"模型 {result['model']} 预热已取消")
+        return True
+
+    def warm(self, model_name: str) -> Dict[str, Any]:
+        result: Dict[str, Any] = {'model': model_name}
+        files = find_model_blobs(model_name, self.models_paths)
+        if files:
+            self._report(10, f"正在预读模型 {model_name} 的文件...")
+            result['prefetch'] = prefetch(files, self.mode, self.max_workers, self.cancel_event)
+        else:
+            # Ollama在其他主机或使用其他模型目录时无法预读，只做预加载
+            result['prefetch'] = None
+            logger.info(f"未在本地找到模型 {model_name} 的文件，跳过预读")
+        if self._cancelled(result):
+            return result
+
+        self._report(50, f"正在加载模型 {model_name}...")
+        try:
+            started = time.monotonic()
+            self.client.load(model_name, keep_alive=self.keep_alive)
+            load = time.monotonic() - started
+            if self._cancelled(result):
+                return result
+            started = time.monotonic()
+            self.client.load(model_name, keep_alive=self.keep_alive)
+            resident = time.monotonic() - started
+        except OllamaError as e:
+            result['error'] = str(e)
+            self._report(100, f"预加载模型 {model_name} 失败: {str(e)}")
+            return result
+
+        prefetch_s = result['prefetch']['seconds'] if result['prefetch'] else 0.0
+        result.update(
+            load_s=round(load, 3),
+            resident_s=round(resident, 3),
+            saved_s=round(max(0.0, prefetch_s + load - resident), 3),
+            keep_alive=self.keep_alive,
+        )
+        prefetched = result['prefetch']
+        self._report(100, (f"模型 {model_name} 已预热: "
+                           + (f"预读 {format_bytes(prefetched['bytes'])} 用时 {prefetched['seconds']:.1f}s，"
+                              if prefetched else "")
+                           + f"加载 {load:.1f}s，首个请求预计节省 {result['saved_s']:.1f}s"))
+        return result
+
+    def warm_all(self, model_names: Iterable[str],
+                 cancel_event: Optional[threading.Event] = None) -> List[Dict[str, Any]]:
+        results = []
+        for name in model_names:
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            results.append(self.warm(name))
+        return results
@@ -0,0 +1,152 @@
+import json
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.utils.benchmark import (BenchmarkHistory, BenchmarkRunner, compare_report, hardware_class,
+                                 latest_records, recommend)
+from src.utils.gpu_telemetry import GpuTelemetry
+from src.utils.ollama_client import OllamaClient
+from test_gpu_telemetry import fake_nvidia_smi  # noqa: F401  (pytest fixture)
+
+NS = 1_000_000_000
+
+
+class StandInGenerateApi:
+    """模拟Ollama的生成接口：未加载的模型首次请求有加载延迟，按固定速度输出token"""
+
+    def __init__(self, speeds, load_delay=0.05, tokens=8):
+        self.speeds = dict(speeds)    # 模型 -> 每秒token数
+        self.load_delay = load_delay
+        self.tokens = tokens
+        self.loaded = set()
+        self.lock = threading.Lock()
+        outer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def reply(self, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path == "/api/version":
+                    return self.reply({"version": "0.5.7"})
+                if self.path == "/api/ps":
+                    return self.reply({"models": [{"name": m, "size": 4 << 30, "size_vram": 3 << 30}
+                                                  for m in sorted(outer.loaded)]})
+                self.send_error(404)
+
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                model = payload["model"]
+                if payload.get("keep_alive") == 0:
+                    outer.loaded.discard(model)
+                    return self.reply({"model": model, "done": True, "done_reason": "unload"})
+                load = 0.0
+                with outer.lock:
+                    if model not in outer.loaded:
+                        load = outer.load_delay
+                        outer.loaded.add(model)
+                time.sleep(load)
+                if not payload.get("prompt"):
+                    return self.reply({"model": model, "done": True, "load_duration": int(load * NS)})
+
+                self.send_response(200)
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                interval = 1 / outer.speeds[model]
+                events = [{"response": "字", "done": False} for _ in range(outer.tokens)]
+                events.append({"response": "", "done": True, "load_duration": int(load * NS),
+                               "eval_count": outer.tokens, "eval_duration": int(outer.tokens * interval * NS)})
+                for event in events:
+                    time.sleep(interval)
+                    data = (json.dumps(event) + "\n").encode()
+                    self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.write(b"0\r\n\r\n")
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+SNAPSHOT = {'gpu_info': {'name': 'RTX 4090', 'count': 1, 'total_memory': 24.0}, 'memory_info': {'total': 64.0}}
+
+
+def test_runner_measures_cold_load_and_speed(tmp_path):
+    with StandInGenerateApi({"deepseek-r1:7b": 400, "deepseek-r1:14b": 100}) as server:
+        runner = BenchmarkRunner(OllamaClient(server.url), prompts=["a", "b"], concurrency=(1, 2),
+                                 memory_interval=0.01)
+        records = runner.run(["deepseek-r1:7b", "deepseek-r1:14b"], SNAPSHOT)
+
+    assert [(r["model"], r["concurrency"], r["requests"]) for r in records] == [
+        ("deepseek-r1:7b", 1, 2), ("deepseek-r1:7b", 2, 4), ("deepseek-r1:14b", 1, 2), ("deepseek-r1:14b", 2, 4)]
+    for record in records:
+        assert record["errors"] == 0
+        assert record["hardware_class"] == "RTX 4090 24GB / RAM 64GB"
+        assert abs(record["cold_load_s"] - 0.05) < 0.02
+        assert record["ttft_p50_s"] <= record["ttft_p95_s"]
+        assert record["peak_vram_bytes"] == 3 << 30
+    fast, slow = records[0], records[2]
+    assert abs(fast["tokens_per_s"] - 400) < 1 and abs(slow["tokens_per_s"] - 100) < 1
+    # 并发请求的总吞吐量高于单个请求的速度
+    assert records[3]["throughput_tokens_per_s"] > records[2]["throughput_tokens_per_s"]
+
+    history = BenchmarkHistory(tmp_path / "bench.jsonl")
+    history.append(records)
+    assert len(history.load(model_name="deepseek-r1:14b")) == 2
+    assert recommend(history.load(), min_tokens_per_s=50) == {"RTX 4090 24GB / RAM 64GB": "deepseek-r1:14b"}
+    assert recommend(history.load(), min_tokens_per_s=200) == {"RTX 4090 24GB / RAM 64GB": "deepseek-r1:7b"}
+    report = compare_report(history.load(), min_tokens_per_s=200)
+    assert "== RTX 4090 24GB / RAM 64GB ==" in report and "推荐: deepseek-r1:7b" in report
+
+
+def test_latest_records_per_hardware_class():
+    old = {"model": "deepseek-r1:7b", "concurrency": 1, "timestamp": 1, "hardware_class": "A", "tokens_per_s": 5}
+    new = dict(old, timestamp=2, tokens_per_s=20)
+    other = dict(old, hardware_class="B")
+    assert sorted(r["tokens_per_s"] for r in latest_records([old, new, other])) == [5, 20]
+    assert hardware_class({'memory_info': {'total': 16}}) == "CPU / RAM 16GB"
+
+
+def test_unreachable_model_is_reported_as_error():
+    with StandInGenerateApi({}) as server:
+        runner = BenchmarkRunner(OllamaClient(server.url, retries=0), prompts=["a"])
+        records = runner.run(["missing:1b"])
+    assert records[0]["errors"] == 1 and "error" in records[0]
+
+
+def test_local_runner_reads_vram_from_gpu_telemetry(fake_nvidia_smi):
+    with StandInGenerateApi({"deepseek-r1:7b": 100}) as server, \
+            GpuTelemetry(interval_ms=10, command=fake_nvidia_smi) as telemetry:
+        deadline = time.monotonic() + 5
+        while telemetry.latest() is None and time.monotonic() < deadline:
+            time.sleep(0.01)
+        runner = BenchmarkRunner(OllamaClient(server.url), prompts=["a", "b"], memory_interval=0.01,
+                                 telemetry=telemetry)
+        record, = runner.run(["deepseek-r1:7b"])
+
+    # 两块GPU已用显存之和（MiB）相对冷启动前的增量，而不是 /api/ps 报告的 size_vram
+    assert record["vram_source"] == "nvidia-smi"
+    assert record["vram_baseline_bytes"] >= 3000 * 1024 ** 2
+    assert 0 < record["peak_vram_bytes"] < record["vram_baseline_bytes"]
+    assert record["peak_vram_bytes"] != 3 << 30
+    assert 0 <= record["gpu_util_avg"] <= record["gpu_util_max"] <= 100
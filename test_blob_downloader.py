@@ -0,0 +1,223 @@
+import json
+import hashlib
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.utils import blob_downloader
+from src.utils.blob_downloader import BlobDownloadCancelled, BlobDownloader, BlobDownloadError, ChunkBitmap
+from src.utils.model_store import ModelStore
+from src.utils.registry import ModelRef, RegistryClient
+
+CHUNK = 1024
+
+
+def make_blob(size: int, seed: int = 0):
+    data = bytes((i * 31 + seed) % 251 for i in range(size))
+    return "sha256:" + hashlib.sha256(data).hexdigest(), data
+
+
+class StandInRegistry:
+    """支持Range请求和故障注入的本地模型仓库"""
+
+    def __init__(self, blobs, tag: str = "deepseek-r1:tiny"):
+        self.blobs = dict(blobs)
+        self.ranges = []
+        self.fail_once = {}    # 起始偏移 -> 发送多少字节后断开（仅一次）
+        self.fail_always = set()  # 总是断开的起始偏移
+        self.corrupt = False
+        self.status = None     # 设置后所有blob请求返回该状态码
+        self.ignore_range = False  # 模拟忽略Range、总是从头返回的代理
+        self.lock = threading.Lock()
+        digests = list(self.blobs)
+        self.manifest = json.dumps({
+            "schemaVersion": 2,
+            "mediaType": "application/vnd.docker.distribution.manifest.v2+json",
+            "config": {"digest": digests[0], "size": len(self.blobs[digests[0]])},
+            "layers": [{"digest": d, "size": len(self.blobs[d])} for d in digests[1:]],
+        }).encode()
+        self.ref = ModelRef.parse(tag)
+        outer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                parts = self.path.split('/')
+                if parts[-2] == "manifests":
+                    self.send_response(200)
+                    self.send_header("Content-Length", str(len(outer.manifest)))
+                    self.end_headers()
+                    self.wfile.write(outer.manifest)
+                    return
+
+                data = outer.blobs.get(parts[-1])
+                if data is None:
+                    self.send_error(404)
+                    return
+                spec = self.headers["Range"].split('=')[1]
+                start, end = (int(x) for x in spec.split('-'))
+                if outer.status is not None:
+                    with outer.lock:
+                        outer.ranges.append((parts[-1], start, end))
+                    self.send_error(outer.status)
+                    return
+                if outer.ignore_range:
+                    end -= start
+                    start = 0
+                with outer.lock:
+                    outer.ranges.append((parts[-1], start, end))
+                    cut = outer.fail_once.pop(start, None)
+                    if start in outer.fail_always:
+                        cut = 0
+                body = data[start:end + 1]
+                if outer.corrupt:
+                    body = bytes(len(body))
+                self.send_response(206)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+                self.end_headers()
+                if cut is not None:
+                    # 发送部分数据后断开连接
+                    self.wfile.write(body[:cut])
+                    self.wfile.flush()
+                    self.close_connection = True
+                    return
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def blobs():
+    return [make_blob(200, seed=1), make_blob(10 * CHUNK + 100, seed=2), make_blob(3 * CHUNK, seed=3)]
+
+
+def downloader(registry: StandInRegistry, tmp_path, **kwargs):
+    kwargs.setdefault("retry_delay", 0)
+    kwargs.setdefault("max_workers", 4)
+    return BlobDownloader(RegistryClient(registry.url), ModelStore(str(tmp_path)),
+                          chunk_size=CHUNK, **kwargs)
+
+
+def test_pull_downloads_and_verifies(blobs, tmp_path):
+    reports = []
+    with StandInRegistry(blobs) as registry:
+        manifest = downloader(registry, tmp_path).pull(
+            "deepseek-r1:tiny", lambda p, m: reports.append(p), report_interval=0)
+
+    store = ModelStore(str(tmp_path))
+    for digest, data in blobs:
+        assert store.blob_path(digest).read_bytes() == data
+    assert store.read_manifest(ModelRef.parse("deepseek-r1:tiny")) == manifest
+    assert not list(store.blobs_dir.glob("*-partial*"))
+    assert reports[-1] == 100
+
+
+def test_retries_resume_inside_chunk(blobs, tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_downloader, "READ_SIZE", 64)
+    digest, data = blobs[1]
+    with StandInRegistry(blobs) as registry:
+        registry.fail_once = {3 * CHUNK: 128, 5 * CHUNK: 0, 10 * CHUNK: 64}
+        downloader(registry, tmp_path).pull("deepseek-r1:tiny")
+
+    assert ModelStore(str(tmp_path)).blob_path(digest).read_bytes() == data
+    # 断开后从已写入的位置继续请求，而不是整块重下
+    starts = [start for d, start, _ in registry.ranges if d == digest]
+    assert 3 * CHUNK + 128 in starts and 10 * CHUNK + 64 in starts
+
+
+def test_resume_after_restart(blobs, tmp_path):
+    digest, data = blobs[1]
+    with StandInRegistry(blobs) as registry:
+        registry.fail_always = {4 * CHUNK}
+        with pytest.raises(BlobDownloadError):
+            downloader(registry, tmp_path, max_retries=0).pull("deepseek-r1:tiny")
+
+        store = ModelStore(str(tmp_path))
+        partial = store.partial_path(digest)
+        bitmap = ChunkBitmap.load(partial.with_name(partial.name + ".chunks"), digest, len(data), CHUNK)
+        pending = bitmap.pending
+        assert 4 in pending and len(pending) < bitmap.count
+
+        registry.fail_always.clear()
+        registry.ranges.clear()
+        downloader(registry, tmp_path).pull("deepseek-r1:tiny")
+
+    assert store.blob_path(digest).read_bytes() == data
+    # 重启后只下载缺失的分块
+    assert sorted(start for d, start, _ in registry.ranges if d == digest) == [i * CHUNK for i in pending]
+
+
+def test_permanent_error_stops_remaining_chunks(blobs, tmp_path):
+    with StandInRegistry(blobs) as registry:
+        registry.status = 403
+        started = time.monotonic()
+        with pytest.raises(BlobDownloadError, match="403"):
+            downloader(registry, tmp_path, retry_delay=1.0, max_workers=2).pull("deepseek-r1:tiny")
+    # 不重试，也不等待队列中的分块逐个失败
+    assert time.monotonic() - started < 2
+    assert len(registry.ranges) <= 2
+
+
+def test_rejects_response_for_a_different_range(blobs, tmp_path):
+    digest, _ = blobs[1]
+    with StandInRegistry(blobs) as registry:
+        registry.ignore_range = True
+        with pytest.raises(BlobDownloadError, match="区间"):
+            downloader(registry, tmp_path, max_retries=0).pull("deepseek-r1:tiny")
+
+
+def test_corrupt_blob_is_discarded(blobs, tmp_path):
+    with StandInRegistry(blobs) as registry:
+        registry.corrupt = True
+        with pytest.raises(BlobDownloadError, match="校验失败"):
+            downloader(registry, tmp_path).pull("deepseek-r1:tiny")
+
+    store = ModelStore(str(tmp_path))
+    assert not any(store.has_blob(d) for d, _ in blobs)
+    assert not list(store.blobs_dir.glob("*-partial*"))
+
+
+def test_cancel_keeps_partial_for_resume(blobs, tmp_path, monkeypatch):
+    monkeypatch.setattr(blob_downloader, "READ_SIZE", 64)
+    digest, data = blobs[1]
+    cancel = threading.Event()
+    received = [0]
+
+    def on_progress(percent, message):
+        received[0] += 1
+        if received[0] == 5:
+            cancel.set()
+
+    with StandInRegistry(blobs) as registry:
+        with pytest.raises(BlobDownloadCancelled):
+            downloader(registry, tmp_path, max_workers=1).pull(
+                "deepseek-r1:tiny", on_progress, report_interval=0, cancel_event=cancel)
+
+        store = ModelStore(str(tmp_path))
+        assert store.read_manifest(ModelRef.parse("deepseek-r1:tiny")) is None
+        partial = store.partial_path(digest)
+        assert partial.exists()
+
+        downloader(registry, tmp_path).pull("deepseek-r1:tiny")
+
+    assert store.blob_path(digest).read_bytes() == data
@@ -0,0 +1,154 @@
+import errno
+import io
+import json
+import os
+import tarfile
+import threading
+
+import pytest
+
+from src.utils import bundle
+from src.utils.bundle import BundleError, BundleExporter, BundleImporter, RangeCopier
+from src.utils.model_store import ModelStore
+from src.utils.registry import ModelRef
+from src.utils.store_verify import StoreVerifier, VerifyCache
+from test_store_verify import make_store
+
+
+def export(tmp_path, models=("deepseek-r1:1.5b", "deepseek-r1:7b")):
+    store, small, large = make_store(tmp_path)
+    path = tmp_path / "models.bundle"
+    result = BundleExporter(store).export(list(models), path)
+    return store, path, result
+
+
+def target_store(tmp_path):
+    return ModelStore(str(tmp_path / "target"))
+
+
+def test_export_is_a_tar_with_an_offset_index(tmp_path):
+    store, path, result = export(tmp_path)
+    assert result["blobs"] == 4
+    assert path.stat().st_size == result["bytes"]
+    assert not path.with_name("models.bundle.part").exists()
+
+    with tarfile.open(path) as tar:
+        names = tar.getnames()
+        assert names[0] == "index.json"
+        index = json.load(tar.extractfile("index.json"))
+    data = path.read_bytes()
+    for name, entry in index["entries"].items():
+        assert name in names
+        assert data[entry["offset"]:entry["offset"] + entry["size"]] == (store.root / name).read_bytes()
+    assert set(index["models"]) == {"deepseek-r1:1.5b", "deepseek-r1:7b"}
+
+
+def test_import_writes_verified_store_and_skips_existing_blobs(tmp_path):
+    _, path, _ = export(tmp_path)
+    target = target_store(tmp_path)
+    progress = []
+    result = BundleImporter(target, lambda percent, message: progress.append(percent)).import_bundle(path)
+    assert result["ok"]
+    assert result["models"] == {"deepseek-r1:1.5b": "imported", "deepseek-r1:7b": "imported"}
+    assert result["blobs_written"] == 4
+    assert progress[-1] == 100
+    report = StoreVerifier(target, VerifyCache(tmp_path / "cache.json")).verify()
+    assert report["ok"] and len(report["models"]) == 2
+
+    again = BundleImporter(target).import_bundle(path)
+    assert again["blobs_written"] == 0
+    assert again["blobs_skipped"] == 4
+
+
+def test_selective_import_reads_only_requested_model(tmp_path):
+    _, path, _ = export(tmp_path)
+    target = target_store(tmp_path)
+    result = BundleImporter(target).import_bundle(path, ["deepseek-r1:1.5b"])
+    assert result["models"] == {"deepseek-r1:1.5b": "imported"}
+    assert result["blobs_written"] == 2
+    assert [ref.short_name for ref, _ in target.iter_manifests()] == ["deepseek-r1:1.5b"]
+
+    with pytest.raises(BundleError):
+        BundleImporter(target).import_bundle(path, ["deepseek-r1:70b"])
+
+
+def test_import_from_pipe(tmp_path):
+    _, path, _ = export(tmp_path)
+    read_fd, write_fd = os.pipe()
+
+    def feed():
+        with open(write_fd, "wb") as f:
+            f.write(path.read_bytes())
+
+    writer = threading.Thread(target=feed)
+    writer.start()
+    try:
+        result = BundleImporter(target_store(tmp_path)).import_bundle(read_fd, ["deepseek-r1:7b"])
+    finally:
+        os.close(read_fd)
+        writer.join()
+    assert result["models"] == {"deepseek-r1:7b": "imported"}
+    assert result["blobs_written"] == 3
+
+
+def test_export_to_pipe_matches_file(tmp_path):
+    store, path, _ = export(tmp_path)
+    read_fd, write_fd = os.pipe()
+    chunks = []
+    reader = threading.Thread(target=lambda: chunks.append(open(read_fd, "rb").read()))
+    reader.start()
+    BundleExporter(store).export(["deepseek-r1:1.5b", "deepseek-r1:7b"], write_fd)
+    os.close(write_fd)
+    reader.join()
+    with tarfile.open(fileobj=io.BytesIO(chunks[0])) as tar:
+        assert tar.getnames() == tarfile.open(path).getnames()
+
+
+def test_corrupt_blob_is_not_installed(tmp_path):
+    store, path, _ = export(tmp_path)
+    index = json.load(tarfile.open(path).extractfile("index.json"))
+    shared = [name for name, entry in index["entries"].items()
+              if name.startswith("blobs/") and entry["size"] == 5000][0]
+    data = bytearray(path.read_bytes())
+    data[index["entries"][shared]["offset"] + 10] ^= 0xFF
+    path.write_bytes(bytes(data))
+
+    target = target_store(tmp_path)
+    result = BundleImporter(target).import_bundle(path)
+    assert not result["ok"]
+    assert result["models"] == {"deepseek-r1:1.5b": "imported", "deepseek-r1:7b": "corrupt"}
+    assert target.read_manifest(ModelRef.parse("deepseek-r1:7b")) is None
+    assert not [p for p in target.blobs_dir.iterdir() if p.name.endswith("-import")]
+
+
+def test_copier_falls_back_when_copy_file_range_is_unsupported(tmp_path, monkeypatch):
+    def unsupported(*args):
+        raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+    monkeypatch.setattr(bundle.os, "copy_file_range", unsupported, raising=False)
+    source = tmp_path / "source"
+    source.write_bytes(os.urandom(10000))
+    copier = RangeCopier()
+    with open(source, "rb") as src, open(tmp_path / "dest", "wb") as dst:
+        copier.copy(src.fileno(), dst.fileno(), 100, 9000)
+    assert (tmp_path / "dest").read_bytes() == source.read_bytes()[100:9100]
+    assert copier.methods[0] != "copy_file_range"
+
+
+def test_export_missing_model_fails(tmp_path):
+    store, _, _ = make_store(tmp_path)
+    with pytest.raises(BundleError):
+        BundleExporter(store).export(["deepseek-r1:70b"], tmp_path / "x.bundle")
+    assert not (tmp_path / "x.bundle.part").exists()
+
+
+def test_cli_export_and_import(tmp_path):
+    from src.cli import main
+    store, _, _ = make_store(tmp_path)
+    out = io.StringIO()
+    path = str(tmp_path / "m.bundle")
+    assert main(["export", "deepseek-r1:7b", "-o", path, "--path", str(store.root)], out) == 0
+    assert main(["import", path, "--path", str(tmp_path / "target")], out) == 0
+    events = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert {"event": "import", "model": "deepseek-r1:7b", "status": "imported"}.items() <= \
+        [e for e in events if e["event"] == "import"][0].items()
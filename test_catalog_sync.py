@@ -0,0 +1,120 @@
+import json
+import time
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from src.utils.catalog_sync import CatalogSync
+from src.utils.config_loader import ConfigLoader
+from src.utils.manifest_cache import GB, ManifestCache
+from src.utils.registry import RegistryClient
+
+
+def make_manifest(sizes):
+    return {
+        "schemaVersion": 2,
+        "config": {"digest": "sha256:" + "c" * 64, "size": 500},
+        "layers": [{"digest": "sha256:" + hashlib.sha256(str(i).encode()).hexdigest(), "size": size}
+                   for i, size in enumerate(sizes)],
+    }
+
+
+class StandInManifestRegistry:
+    """只提供清单接口的模型仓库，支持 If-None-Match"""
+
+    def __init__(self, manifests, delay: float = 0.0):
+        self.manifests = manifests  # 仓库路径 -> 清单
+        self.delay = delay
+        self.requests = []
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+        outer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                with outer.lock:
+                    outer.active += 1
+                    outer.peak = max(outer.peak, outer.active)
+                time.sleep(outer.delay)
+                with outer.lock:
+                    outer.active -= 1
+                    outer.requests.append((self.path, self.headers.get("If-None-Match")))
+
+                _, _, namespace, repository, _, tag = self.path.split('/')
+                manifest = outer.manifests.get(f"{repository}:{tag}")
+                if manifest is None:
+                    self.send_response(404)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                body = json.dumps(manifest).encode()
+                etag = f'"sha256:{hashlib.sha256(body).hexdigest()}"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+MODELS = ["deepseek-r1:1.5b", "deepseek-r1:7b", "deepseek-r1:14b", "deepseek-r1:32b"]
+
+
+def test_sync_uses_conditional_requests(tmp_path):
+    manifests = {name: make_manifest([GB * (i + 1), 1000]) for i, name in enumerate(MODELS)}
+    cache = ManifestCache(tmp_path / "manifests.json")
+    with StandInManifestRegistry(manifests, delay=0.1) as registry:
+        sync = CatalogSync(RegistryClient(registry.url), cache)
+        first = sync.sync(MODELS + ["deepseek-r1:999b"])
+
+        assert registry.peak > 1
+        assert [first[name].status for name in MODELS] == ["updated"] * 4
+        assert first["deepseek-r1:999b"].status == "failed"
+        assert cache.get("deepseek-r1:7b")["size"] == 2 * GB + 1000 + 500
+
+        # 只有一个标签变化：其余标签带ETag请求并得到304
+        manifests["deepseek-r1:7b"] = make_manifest([3 * GB])
+        registry.requests.clear()
+        second = sync.sync(MODELS)
+
+    assert [second[name].status for name in MODELS] == ["unchanged", "updated", "unchanged", "unchanged"]
+    assert all(etag for _, etag in registry.requests)
+    assert second["deepseek-r1:1.5b"].size == GB + 1500
+    assert cache.get("deepseek-r1:7b")["size"] == 3 * GB + 500
+
+
+def test_config_loader_uses_synced_sizes(tmp_path):
+    cache = ManifestCache(tmp_path / "manifests.json")
+    loader = ConfigLoader(manifest_cache=cache)
+    assert loader.get_available_models()["deepseek-r1:7b"]["disk_space"] == 5
+
+    cache.update({"deepseek-r1:7b": {"etag": None, "size": int(4.68 * GB), "blobs": []}})
+    models = loader.get_available_models()
+    assert models["deepseek-r1:7b"]["disk_space"] == 4.68
+    assert models["deepseek-r1:14b"]["disk_space"] == 10
+    assert loader.get_model_catalog().get("deepseek-r1:7b").disk_space == 4.68
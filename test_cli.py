@@ -0,0 +1,180 @@
+import io
+import sys
+import json
+import time
+import _thread
+import functools
+import threading
+import subprocess
+from pathlib import Path
+
+import pytest
+
+from src import cli
+from src.utils.model_store import ModelStore
+from src.utils.registry import ModelRef
+from test_blob_downloader import StandInRegistry, make_blob
+
+ROOT = Path(__file__).parent
+
+
+def read_events(text):
+    return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+def test_parse_rate():
+    assert cli.parse_rate("50MB") == 50 * 1024 ** 2
+    assert cli.parse_rate("1.5G/s") == 1.5 * 1024 ** 3
+    assert cli.parse_rate(1000) == 1000.0
+    assert cli.parse_rate(None) is None
+    with pytest.raises(cli.UsageError):
+        cli.parse_rate("fast")
+
+
+def test_provision_from_manifest_without_qt(tmp_path):
+    blobs = [make_blob(300, seed=1), make_blob(5000, seed=2)]
+    models_dir = tmp_path / "models"
+    with StandInRegistry(blobs) as registry:
+        manifest = tmp_path / "fleet.yaml"
+        manifest.write_text(
+            f"install_path: {models_dir}\n"
+            f"registry_url: {registry.url}\n"
+            "backend: registry\n"
+            "models:\n"
+            "  - deepseek-r1:tiny\n",
+            encoding="utf-8")
+        proc = subprocess.run([sys.executable, "-X", "importtime", "-m", "src", "provision", str(manifest)],
+                              cwd=ROOT, capture_output=True, text=True, timeout=60)
+
+    assert proc.returncode == cli.EXIT_OK, proc.stderr
+    # 命令行模式不能导入Qt
+    assert "PySide6" not in proc.stderr
+    events = read_events(proc.stdout)
+    assert [e["event"] for e in events][0] == "start"
+    assert any(e["event"] == "progress" and e["percent"] == 100 for e in events)
+    summary = events[-1]
+    assert summary["event"] == "summary"
+    assert summary["succeeded"] == ["deepseek-r1:tiny"] and summary["failed"] == []
+    assert ModelStore(str(models_dir)).read_manifest(ModelRef.parse("deepseek-r1:tiny")) is not None
+
+
+def test_invalid_manifest_is_usage_error(tmp_path):
+    manifest = tmp_path / "fleet.yaml"
+    manifest.write_text("models:\n  - name: deepseek-r1:7b\n    backend: ftp\n", encoding="utf-8")
+    out = io.StringIO()
+    assert cli.main(["provision", str(manifest)], stream=out) == cli.EXIT_USAGE
+    assert read_events(out.getvalue())[-1]["event"] == "error"
+
+
+class StandInInstaller:
+    """记录调用的安装器，Docker状态可配置"""
+
+    docker = True
+    installed = []
+
+    def __init__(self):
+        self.last_io_summary = None
+        self.last_warmup = None
+
+    def check_docker(self):
+        return self.docker
+
+    def check_ollama(self):
+        return True
+
+    def install_model(self, model_name, install_path, progress_callback=None, backend="api",
+                      registry_url=None, cancel_event=None, warmup=False):
+        self.installed.append((model_name, backend))
+        progress_callback(100, "安装完成")
+        return True
+
+
+def test_provisioner_skips_api_models_when_docker_is_down(monkeypatch):
+    monkeypatch.setattr(StandInInstaller, "docker", False)
+    monkeypatch.setattr(StandInInstaller, "installed", [])
+    out = io.StringIO()
+    provisioner = cli.Provisioner(cli.JsonLinesReporter(out), installer_factory=StandInInstaller)
+    manifest = {
+        'install_path': "/tmp/models", 'max_parallel': 2, 'bandwidth_limit': None, 'window': None,
+        'registry_url': None,
+        'models': [{'name': "deepseek-r1:7b", 'backend': 'api'},
+                   {'name': "deepseek-r1:1.5b", 'backend': 'registry'}],
+    }
+    results = provisioner.run(manifest)
+
+    assert results == {"deepseek-r1:7b": False, "deepseek-r1:1.5b": True}
+    assert not provisioner.environment_ready
+    assert StandInInstaller.installed == [("deepseek-r1:1.5b", "registry")]
+    events = read_events(out.getvalue())
+    assert events[0] == {**events[0], "event": "environment", "docker": False}
+
+
+def test_per_model_path_with_bandwidth_limit_is_usage_error(tmp_path):
+    manifest = tmp_path / "fleet.yaml"
+    manifest.write_text("bandwidth_limit: 50MB\nmodels:\n  - name: deepseek-r1:7b\n    install_path: /data\n",
+                        encoding="utf-8")
+    out = io.StringIO()
+    assert cli.main(["provision", str(manifest)], stream=out) == cli.EXIT_USAGE
+    assert "install_path" in read_events(out.getvalue())[-1]["message"]
+
+
+class BlockingInstaller(StandInInstaller):
+    """安装一直阻塞，直到连接被 abort_downloads() 断开"""
+
+    started = None
+    ignore_abort = False
+
+    def __init__(self):
+        super().__init__()
+        self.aborted = threading.Event()
+
+    def abort_downloads(self):
+        if not self.ignore_abort:
+            self.aborted.set()
+
+    def install_model(self, model_name, install_path, progress_callback=None, backend="api",
+                      registry_url=None, cancel_event=None, warmup=False):
+        self.started.set()
+        self.aborted.wait(10)
+        return False
+
+
+def run_interrupted(monkeypatch, interrupts):
+    monkeypatch.setattr(BlockingInstaller, "started", threading.Event())
+    monkeypatch.setattr(cli, "Provisioner", functools.partial(cli.Provisioner, installer_factory=BlockingInstaller))
+
+    def interrupt():
+        BlockingInstaller.started.wait(5)
+        for _ in range(interrupts):
+            time.sleep(0.3)
+            _thread.interrupt_main()
+
+    threading.Thread(target=interrupt, daemon=True).start()
+    out = io.StringIO()
+    manifest = {'install_path': "/tmp/models", 'max_parallel': 1, 'bandwidth_limit': None, 'window': None,
+                'registry_url': None, 'models': [{'name': "deepseek-r1:7b", 'backend': 'registry'}]}
+    started = time.monotonic()
+    code = cli._run_provisioning(manifest, cli.JsonLinesReporter(out))
+    return code, time.monotonic() - started, read_events(out.getvalue())
+
+
+def test_interrupt_aborts_active_downloads(monkeypatch):
+    code, elapsed, events = run_interrupted(monkeypatch, 1)
+
+    assert code == cli.EXIT_INTERRUPTED
+    # abort_downloads() 唤醒了阻塞的安装，不必等到超时
+    assert elapsed < 5
+    assert [e["event"] for e in events][-2:] == ["result", "summary"]
+    assert events[-1]["cancelled"] and events[-2]["cancelled"]
+
+
+def test_second_interrupt_exits_without_waiting(monkeypatch):
+    monkeypatch.setattr(BlockingInstaller, "ignore_abort", True)
+
+    def fake_exit(code):
+        raise SystemExit(code)
+
+    monkeypatch.setattr(cli.os, "_exit", fake_exit)
+    with pytest.raises(SystemExit) as excinfo:
+        run_interrupted(monkeypatch, 2)
+    assert excinfo.value.code == cli.EXIT_INTERRUPTED
@@ -0,0 +1,100 @@
+import os
+import threading
+
+import pytest
+
+from src.utils import config_cache
+from src.utils.config_cache import ConfigCache, ConfigWatcher
+
+CONFIG = """
+models:
+  deepseek-r1:7b:
+    gpu_memory: 8
+    system_memory: 16
+    disk_space: 10
+"""
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    path = tmp_path / "config.yaml"
+    path.write_text(CONFIG, encoding="utf-8")
+    return path
+
+
+def bump_mtime(path, seconds=10):
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + seconds * 10 ** 9))
+
+
+def test_memory_and_compiled_cache(config_file, tmp_path, monkeypatch):
+    cache = ConfigCache(tmp_path / "cache")
+    first = cache.load(str(config_file))
+    assert first["models"]["deepseek-r1:7b"]["gpu_memory"] == 8
+    assert cache.load(str(config_file)) is first
+    assert cache.parses == 1
+
+    # 新进程（新的缓存实例）直接读取编译缓存，不解析YAML
+    def fail(data):
+        raise AssertionError("不应解析YAML")
+    monkeypatch.setattr(config_cache, "parse_yaml", fail)
+    fresh = ConfigCache(tmp_path / "cache")
+    assert fresh.load(str(config_file)) == first
+
+    # 只修改mtime时按内容哈希复用
+    bump_mtime(config_file)
+    assert fresh.load(str(config_file)) == first
+    assert fresh.parses == 0
+
+
+def test_unreadable_compiled_cache_is_ignored(config_file, tmp_path):
+    cache = ConfigCache(tmp_path / "cache")
+    first = cache.load(str(config_file))
+    cache._compiled_path(os.path.abspath(str(config_file))).write_bytes(b"\x80\x04garbage")
+
+    fresh = ConfigCache(tmp_path / "cache")
+    assert fresh.load(str(config_file)) == first
+    assert fresh.parses == 1
+
+
+def test_content_change_reparses(config_file, tmp_path):
+    cache = ConfigCache(tmp_path / "cache")
+    cache.load(str(config_file))
+    config_file.write_text(CONFIG.replace("gpu_memory: 8", "gpu_memory: 12"), encoding="utf-8")
+    bump_mtime(config_file)
+
+    assert cache.load(str(config_file))["models"]["deepseek-r1:7b"]["gpu_memory"] == 12
+    assert cache.parses == 2
+
+
+def test_uses_libyaml_when_available():
+    if hasattr(config_cache.yaml, "CSafeLoader"):
+        assert config_cache.YAML_LOADER is config_cache.yaml.CSafeLoader
+
+
+def test_watcher_notifies_subscribers(config_file, tmp_path):
+    cache = ConfigCache(tmp_path / "cache")
+    watcher = ConfigWatcher(str(config_file), interval=0.02, cache=cache)
+    received = []
+    changed = threading.Event()
+
+    def on_change(config):
+        received.append(config)
+        changed.set()
+
+    unsubscribe = watcher.subscribe(on_change)
+    watcher.start()
+    try:
+        # 写到一半的文件无法解析时保留旧配置
+        config_file.write_text("models: [", encoding="utf-8")
+        bump_mtime(config_file, 1)
+        assert not watcher.check()
+
+        config_file.write_text(CONFIG.replace("deepseek-r1:7b", "deepseek-r1:8b"), encoding="utf-8")
+        bump_mtime(config_file, 2)
+        assert changed.wait(5)
+    finally:
+        watcher.stop()
+        unsubscribe()
+
+    assert list(received[-1]["models"]) == ["deepseek-r1:8b"]
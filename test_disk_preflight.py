@@ -0,0 +1,116 @@
+import os
+import errno
+from collections import namedtuple
+
+import pytest
+
+from src.utils import disk_preflight
+from src.utils.blob_downloader import BlobDownloadError
+from src.utils.disk_preflight import DiskPreflight, allocate_file, volume_usage
+from src.utils.hardware_cache import HardwareSnapshotCache
+from src.utils.model_store import ModelStore
+from src.utils.system_checker import SystemChecker
+from test_blob_downloader import StandInRegistry, downloader, make_blob
+
+Usage = namedtuple("Usage", "total used free percent")
+
+
+@pytest.fixture
+def blobs():
+    return [make_blob(200, seed=1), make_blob(6000, seed=2), make_blob(3000, seed=3)]
+
+
+def test_plan_skips_present_and_partial_data(blobs, tmp_path):
+    store = ModelStore(str(tmp_path))
+    store.ensure_dirs()
+    (done_digest, done_data), (partial_digest, partial_data), (_, missing_data) = blobs
+    store.blob_path(done_digest).write_bytes(done_data)
+    # 部分下载的稀疏文件只算已写入的部分
+    with open(store.partial_path(partial_digest), 'wb') as f:
+        f.truncate(len(partial_data))
+    allocated = disk_preflight.allocated_bytes(store.partial_path(partial_digest))
+
+    result = DiskPreflight(store, margin=0).plan((d, len(data)) for d, data in blobs)
+    assert result.total_size == sum(len(data) for _, data in blobs)
+    assert result.present == len(done_data)
+    assert result.partial == allocated
+    assert result.required == len(partial_data) - allocated + len(missing_data)
+    assert result.mount is not None and result.ok
+
+
+def test_allocate_file_reserves_blocks(tmp_path):
+    path = tmp_path / "blob-partial"
+    reserved = allocate_file(path, 1 << 20)
+    assert path.stat().st_size == 1 << 20
+    if reserved:
+        assert disk_preflight.allocated_bytes(path) == 1 << 20
+
+
+def test_pull_fails_before_downloading_when_volume_is_full(blobs, tmp_path, monkeypatch):
+    monkeypatch.setattr(disk_preflight.psutil, "disk_usage", lambda path: Usage(10 ** 9, 10 ** 9 - 5000, 5000, 99.9))
+    with StandInRegistry(blobs) as registry:
+        with pytest.raises(BlobDownloadError, match="磁盘空间不足"):
+            downloader(registry, tmp_path, reserve_margin=0).pull("deepseek-r1:tiny")
+
+    assert registry.ranges == []
+    assert not list(ModelStore(str(tmp_path)).blobs_dir.glob("*-partial*"))
+
+
+@pytest.mark.skipif(not hasattr(os, "posix_fallocate"), reason="需要 posix_fallocate")
+def test_reservation_failure_releases_new_files(blobs, tmp_path, monkeypatch):
+    real_fallocate = os.posix_fallocate
+    calls = []
+
+    def fallocate(fd, offset, length):
+        calls.append(length)
+        if len(calls) == 3:
+            raise OSError(errno.ENOSPC, "No space left on device")
+        return real_fallocate(fd, offset, length)
+
+    monkeypatch.setattr(os, "posix_fallocate", fallocate)
+    with StandInRegistry(blobs) as registry:
+        with pytest.raises(BlobDownloadError, match="预留"):
+            downloader(registry, tmp_path).pull("deepseek-r1:tiny")
+
+    assert registry.ranges == []
+    assert not list(ModelStore(str(tmp_path)).blobs_dir.glob("*-partial*"))
+
+
+def test_system_checker_probes_target_volume(tmp_path):
+    target = tmp_path / "not-created-yet" / "models"
+    checker = SystemChecker(cache=HardwareSnapshotCache(), disk_path=str(target))
+    disk = checker.get_snapshot()['disk_info']
+    assert disk['path'] == str(target)
+    assert disk['mount'] == volume_usage(str(tmp_path))['mount']
+
+    checker.set_disk_path(str(tmp_path))
+    assert checker.get_snapshot()['disk_info']['path'] == str(tmp_path)
+
+
+def test_checkers_sharing_a_cache_keep_their_own_volume(tmp_path):
+    cache = HardwareSnapshotCache()
+    first = SystemChecker(cache=cache, disk_path=str(tmp_path / "a"))
+    second = SystemChecker(cache=cache, disk_path=str(tmp_path / "b"))
+    assert first.get_snapshot()['disk_info']['path'] == str(tmp_path / "a")
+    assert second.get_snapshot()['disk_info']['path'] == str(tmp_path / "b")
+    assert first.get_snapshot()['disk_info']['path'] == str(tmp_path / "a")
+
+    cache.invalidate('disk_info')
+    assert cache.stats()['entries'] == 5
+
+
+def test_preflight_resolves_unknown_model_size_from_registry(tmp_path, blobs, monkeypatch):
+    from src.utils.installer import ModelInstaller
+    monkeypatch.setenv("DEEPSEEK_CACHE_DIR", str(tmp_path / "cache"))
+    with StandInRegistry(blobs) as registry:
+        monkeypatch.setenv("DEEPSEEK_REGISTRY_URL", registry.url)
+        result = ModelInstaller().preflight("deepseek-r1:tiny", str(tmp_path / "models"))
+    assert result.total_size == sum(len(data) for _, data in blobs)
+
+
+def test_preflight_skips_when_model_size_is_unknown(tmp_path, monkeypatch, caplog):
+    from src.utils.installer import ModelInstaller
+    monkeypatch.setenv("DEEPSEEK_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setenv("DEEPSEEK_REGISTRY_URL", "http://127.0.0.1:9")
+    assert ModelInstaller().preflight("deepseek-r1:tiny", str(tmp_path / "models")) is None
+    assert "跳过磁盘空间检查" in caplog.text
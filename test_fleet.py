@@ -0,0 +1,76 @@
+import json
+
+import numpy as np
+
+from src.utils.config_loader import ConfigLoader
+from src.utils.fleet import evaluate_fleet, load_snapshots
+
+
+def snapshot(hostname, vram, ram, disk):
+    return {
+        'hostname': hostname,
+        'gpu_info': {'name': 'GPU', 'count': 1, 'total_memory': vram, 'gpus': []} if vram else None,
+        'memory_info': {'total': ram, 'available': ram / 2, 'percent': 50.0},
+        'disk_info': {'total': disk * 2, 'free': disk, 'percent': 50.0},
+    }
+
+
+def test_matrix_marks_limiting_resource():
+    models = ConfigLoader().get_available_models()
+    snapshots = [
+        snapshot('gpu-small', 8, 32, 500),
+        snapshot('gpu-big', 80, 256, 60),
+        snapshot('cpu-only', None, 512, 1000),
+    ]
+    matrix = evaluate_fleet(snapshots, models)
+
+    assert matrix.fits.shape == (3, len(models))
+    assert matrix.hosts_for('deepseek-r1:7b') == ['gpu-small', 'gpu-big']
+    assert matrix.hosts_for('deepseek-r1:70b') == ['gpu-big']
+
+    h, m = matrix.hosts.index('gpu-small'), matrix.models.index('deepseek-r1:14b')
+    assert matrix.limiting_resource(h, m) == 'gpu_memory'
+    assert matrix.headroom[h, m] == 8 - 12
+
+    h, m = matrix.hosts.index('gpu-big'), matrix.models.index('deepseek-r1:70b')
+    assert matrix.limiting_resource(h, m) == 'disk_space'
+    assert matrix.headroom[h, m] == 10
+
+    assert matrix.largest_fit() == ['deepseek-r1:7b', 'deepseek-r1:70b', None]
+
+
+def test_matrix_matches_scalar_check():
+    rng = np.random.default_rng(0)
+    models = ConfigLoader().get_available_models()
+    snapshots = [snapshot(f"h{i}", *rng.integers(0, 600, size=3).astype(float)) for i in range(500)]
+    matrix = evaluate_fleet(snapshots, models)
+
+    for h, snap in enumerate(snapshots):
+        vram = (snap['gpu_info'] or {}).get('total_memory') or 0
+        for m, name in enumerate(matrix.models):
+            req = models[name]
+            expected = (vram >= req['gpu_memory'] and snap['memory_info']['total'] >= req['system_memory']
+                        and snap['disk_info']['free'] >= req['disk_space'])
+            assert matrix.fits[h, m] == expected
+
+
+def test_load_snapshots_from_directory(tmp_path):
+    for i in range(3):
+        (tmp_path / f"node{i}.json").write_text(json.dumps(snapshot(f"node{i}", 24, 64, 100)))
+    (tmp_path / "broken.json").write_text("{")
+
+    snapshots = load_snapshots([str(tmp_path)])
+    assert [s['hostname'] for s in snapshots] == ['node0', 'node1', 'node2']
+
+
+def test_legacy_requirement_keys():
+    models = {
+        'deepseek-r1:7b': {'vram_required': 8, 'ram_required': 16, 'disk_required': 10},
+        'deepseek-r1:70b': {'gpu_memory': 48, 'system_memory': 128, 'disk_space': 70},
+    }
+    matrix = evaluate_fleet([snapshot('gpu-small', 8, 32, 500), snapshot('low-ram', 24, 8, 500)], models)
+
+    assert matrix.hosts_for('deepseek-r1:7b') == ['gpu-small']
+    assert matrix.hosts_for('deepseek-r1:70b') == []
+    h, m = matrix.hosts.index('low-ram'), matrix.models.index('deepseek-r1:7b')
+    assert matrix.limiting_resource(h, m) == 'system_memory'
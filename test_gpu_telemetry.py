@@ -0,0 +1,102 @@
+import sys
+import time
+import threading
+
+import numpy as np
+import pytest
+
+from src.utils.gpu_telemetry import FIELDS, GpuTelemetry, TelemetryRing, parse_line
+from src.utils.system_checker import SystemChecker
+
+FAKE_NVIDIA_SMI = """#!{python}
+import sys, time
+interval = int(sys.argv[sys.argv.index('-lms') + 1]) / 1000
+for i in range(1000):
+    print(f"0, {{1000 + i}}, 81920, {{i % 100}}, 40, 250.5, NVIDIA H100 80GB HBM3", flush=True)
+    print(f"1, {{2000 + i}}, 81920, 50, 45, [N/A]", flush=True)
+    time.sleep(interval)
+"""
+
+
+@pytest.fixture
+def fake_nvidia_smi(tmp_path):
+    if sys.platform == "win32":
+        pytest.skip("使用可执行脚本模拟nvidia-smi")
+    script = tmp_path / "nvidia-smi"
+    script.write_text(FAKE_NVIDIA_SMI.format(python=sys.executable))
+    script.chmod(0o755)
+    return str(script)
+
+
+def test_parse_line_handles_missing_values():
+    index, values = parse_line("1, 2048, 81920, 50, 45, [N/A]\n")
+    assert index == 1
+    assert values[:4] == [2048, 81920, 50, 45]
+    assert np.isnan(values[4])
+    assert parse_line("garbage") is None
+
+
+def test_ring_wraps_and_keeps_order():
+    ring = TelemetryRing(capacity=4, max_gpus=2)
+    for i in range(6):
+        ring.append(float(i), np.full((2, len(FIELDS)), i, dtype=np.float32))
+
+    timestamps, values = ring.window()
+    assert list(timestamps) == [2.0, 3.0, 4.0, 5.0]
+    assert values.shape == (4, 2, len(FIELDS))
+    assert ring.latest()[0] == 5.0
+    assert list(ring.window(seconds=1.0)[0]) == [4.0, 5.0]
+
+
+def test_stream_from_fake_nvidia_smi(fake_nvidia_smi):
+    received = []
+    got_samples = threading.Event()
+
+    def on_sample(timestamp, sample):
+        received.append(sample.copy())
+        if len(received) >= 5:
+            got_samples.set()
+
+    with GpuTelemetry(interval_ms=20, capacity=64, command=fake_nvidia_smi) as telemetry:
+        unsubscribe = telemetry.subscribe(on_sample)
+        assert got_samples.wait(10)
+        unsubscribe()
+        timestamp, latest = telemetry.latest()
+        summary = telemetry.summary()
+
+    assert latest.shape == (2, len(FIELDS))
+    assert latest[0, FIELDS.index('memory_total')] == 81920
+    assert np.isnan(latest[1, FIELDS.index('power')])
+    assert all(sample.shape == (2, len(FIELDS)) for sample in received[1:])
+    assert summary[0]['power_max'] == pytest.approx(250.5)
+    assert summary[1]['memory_used_max'] >= 2000
+    assert not telemetry.running
+
+
+def test_missing_nvidia_smi():
+    telemetry = GpuTelemetry(command="/nonexistent/nvidia-smi")
+    assert telemetry.start() is False
+    assert telemetry.latest() is None
+
+
+def test_gpu_info_from_stream(fake_nvidia_smi):
+    with GpuTelemetry(interval_ms=20, command=fake_nvidia_smi) as telemetry:
+        assert telemetry.wait_for_sample(10)
+        info = telemetry.gpu_info()
+
+    assert info["count"] == 2 and info["name"] == "NVIDIA H100 80GB HBM3"
+    assert info["total_memory"] == pytest.approx(160.0)
+    # 没有输出名称的GPU使用通用名称
+    assert info["gpus"][1]["name"] == "NVIDIA GPU"
+
+
+def test_system_checker_reads_gpu_info_from_running_stream(fake_nvidia_smi, monkeypatch):
+    checker = SystemChecker(telemetry=GpuTelemetry(interval_ms=20, command=fake_nvidia_smi))
+
+    def no_commands(*args, **kwargs):
+        raise AssertionError("不应再启动 nvidia-smi")
+
+    monkeypatch.setattr(checker, "_run", no_commands)
+    with checker.telemetry:
+        info = checker._get_gpu_info()
+    assert info["count"] == 2 and info["total_memory"] == pytest.approx(160.0)
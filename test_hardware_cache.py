@@ -0,0 +1,82 @@
+from collections import Counter
+
+from src.utils.hardware_cache import HardwareSnapshotCache
+from src.utils.system_checker import SystemChecker
+
+
+class CountingChecker(SystemChecker):
+    """记录每个探测项被调用次数的检查器"""
+
+    def __init__(self, cache):
+        super().__init__(cache=cache)
+        self.calls = Counter()
+
+    def _probes(self):
+        def counted(name, value):
+            def probe():
+                self.calls[name] += 1
+                return value
+            return probe
+
+        return {
+            'os_info': counted('os_info', {'system': 'Linux'}),
+            'cpu_info': counted('cpu_info', {'cores': 8, 'threads': 16}),
+            'memory_info': counted('memory_info', {'total': 64.0, 'available': 40.0, 'percent': 37.5}),
+            'gpu_info': counted('gpu_info', {'name': 'GPU', 'count': 1, 'total_memory': 24.0, 'gpus': []}),
+            'cuda_info': counted('cuda_info', {'available': True, 'version': '12.2'}),
+            'disk_info': counted('disk_info', {'total': 1000.0, 'free': 500.0, 'percent': 50.0}),
+        }
+
+
+def make_checker():
+    now = [0.0]
+    cache = HardwareSnapshotCache(ttls={'memory_info': 5, 'disk_info': 10}, clock=lambda: now[0])
+    return CountingChecker(cache), cache, now
+
+
+def test_compatibility_checks_share_one_probe_pass():
+    checker, cache, _ = make_checker()
+    requirements = {'ram_required': 16, 'vram_required': 8, 'disk_required': 5}
+    for _ in range(6):
+        compatible, _ = checker.check_model_compatibility(requirements)
+        assert compatible
+
+    assert set(checker.calls.values()) == {1}
+    assert cache.stats()['misses'] == 6
+    assert cache.stats()['hits'] == 30
+
+
+def test_fields_expire_independently():
+    checker, cache, now = make_checker()
+    checker.get_snapshot()
+    now[0] = 6.0
+    checker.get_snapshot()
+    assert checker.calls['memory_info'] == 2
+    assert checker.calls['disk_info'] == 1
+    assert checker.calls['gpu_info'] == 1
+
+    now[0] = 11.0
+    checker.get_snapshot()
+    assert checker.calls['disk_info'] == 2
+    assert checker.calls['cpu_info'] == 1
+
+
+def test_invalidate_forces_reprobe():
+    checker, cache, _ = make_checker()
+    checker.get_snapshot()
+    cache.invalidate('disk_info')
+    snapshot = checker.get_snapshot()
+    assert checker.calls['disk_info'] == 2
+    assert checker.calls['memory_info'] == 1
+    assert snapshot['probe_stats']['disk_info']['status'] == 'ok'
+
+    cache.invalidate()
+    checker.get_snapshot()
+    assert checker.calls['cpu_info'] == 2
+
+
+def test_live_check_refreshes_cache():
+    checker, cache, _ = make_checker()
+    checker.check_system()
+    checker.get_snapshot()
+    assert set(checker.calls.values()) == {1}
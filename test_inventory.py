@@ -0,0 +1,91 @@
+import os
+
+from src.utils.inventory import ModelInventory, _parse_time
+from src.utils.model_store import ModelStore
+from src.utils.ollama_client import OllamaClient
+from src.utils.registry import ModelRef
+from test_ollama_client import StandInOllamaApi
+from test_store_verify import write_model
+from test_blob_downloader import make_blob
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_inventory(tmp_path, clock):
+    store = ModelStore(str(tmp_path / "models"))
+    store.ensure_dirs()
+    write_model(store, "deepseek-r1:7b", [make_blob(100, seed=1), make_blob(3000, seed=2)])
+    inventory = ModelInventory(OllamaClient("http://127.0.0.1:9"), str(tmp_path / "models"),
+                               source="disk", poll_interval=5.0, clock=clock)
+    return store, inventory
+
+
+def test_disk_inventory_reads_manifests(tmp_path):
+    store, inventory = make_inventory(tmp_path, FakeClock())
+    [model] = inventory.models()
+    assert model.name == "deepseek-r1:7b"
+    assert model.size == 3100
+    assert model.source == "disk"
+    assert len(model.digest) == 64
+    assert "deepseek-r1:7b" in inventory
+    assert inventory.get("deepseek-r1") is None
+
+
+def test_disk_inventory_rescans_only_on_change(tmp_path):
+    clock = FakeClock()
+    store, inventory = make_inventory(tmp_path, clock)
+    assert inventory.names() == ["deepseek-r1:7b"]
+    assert inventory.refreshes == 1
+
+    write_model(store, "deepseek-r1:1.5b", [make_blob(50, seed=3)])
+    # 轮询间隔内直接返回缓存
+    assert inventory.names() == ["deepseek-r1:7b"]
+    clock.now = 10.0
+    assert inventory.names() == ["deepseek-r1:1.5b", "deepseek-r1:7b"]
+    assert inventory.refreshes == 2
+
+    # 目录没有变化时不重新读取
+    clock.now = 20.0
+    inventory.names()
+    assert inventory.refreshes == 2
+
+    os.remove(store.manifest_path(ModelRef.parse("deepseek-r1:1.5b")))
+    inventory.invalidate()
+    assert inventory.names() == ["deepseek-r1:7b"]
+    assert inventory.refreshes == 3
+
+
+def test_api_inventory_polls_tags(tmp_path):
+    clock = FakeClock()
+    with StandInOllamaApi(models=["deepseek-r1:7b"]) as api:
+        inventory = ModelInventory(OllamaClient(api.url), str(tmp_path / "missing"),
+                                   poll_interval=5.0, clock=clock)
+        assert inventory.names() == ["deepseek-r1:7b"]
+        api.models.append("deepseek-r1:1.5b")
+        assert inventory.names() == ["deepseek-r1:7b"]
+        inventory.invalidate()
+        assert inventory.names() == ["deepseek-r1:1.5b", "deepseek-r1:7b"]
+        assert inventory.get("deepseek-r1:1.5b").source == "api"
+        tags = [path for method, path in api.requests if path == "/api/tags"]
+        assert len(tags) == 2
+
+
+def test_auto_falls_back_to_api_when_server_uses_other_directory(tmp_path):
+    store = ModelStore(str(tmp_path / "models"))
+    store.ensure_dirs()
+    write_model(store, "deepseek-r1:7b", [make_blob(100, seed=1)])
+    with StandInOllamaApi(models=["deepseek-r1:14b"]) as api:
+        inventory = ModelInventory(OllamaClient(api.url), str(tmp_path / "models"))
+        assert inventory.names() == ["deepseek-r1:14b"]
+        assert inventory.source == "api"
+
+
+def test_parse_time_accepts_nanoseconds():
+    assert _parse_time("2024-01-02T03:04:05.123456789Z") == _parse_time("2024-01-02T03:04:05.123456+00:00")
+    assert _parse_time("") == 0.0
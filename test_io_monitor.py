@@ -0,0 +1,62 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from src.utils.io_monitor import ThroughputMonitor, physical_interfaces, resolve_disk_device
+
+
+def test_resolve_disk_device_for_missing_directory(tmp_path):
+    mountpoint, _ = resolve_disk_device(str(tmp_path / "not" / "created" / "yet"))
+    assert mountpoint is not None
+    assert str(tmp_path).startswith(mountpoint)
+
+
+def test_monitor_samples_disk_writes(tmp_path):
+    messages = []
+    with ThroughputMonitor(str(tmp_path), interval=0.02, capacity=16) as monitor:
+        callback = monitor.wrap_callback(lambda progress, message: messages.append(message))
+        block = os.urandom(1024 * 1024)
+        with open(tmp_path / "blob", "wb") as f:
+            for _ in range(8):
+                f.write(block)
+                f.flush()
+                os.fsync(f.fileno())
+                time.sleep(0.02)
+        deadline = time.monotonic() + 5
+        while monitor.count < 20 and time.monotonic() < deadline:
+            time.sleep(0.02)
+        callback(50, "正在下载")
+
+    # 环形缓冲区不超过容量，且按时间顺序返回
+    assert monitor.count == 16
+    rx, written, _ = monitor._window(None)
+    assert len(rx) == 16
+    assert np.all(written >= 0)
+
+    assert messages[-1].startswith("正在下载 | 网络 ")
+    percentiles = monitor.percentiles((50, 95))
+    assert percentiles['disk_write'][50] <= percentiles['disk_write'][95]
+
+    summary = monitor.summary()
+    assert summary['samples'] == 16
+    assert summary['duration'] > 0
+    assert summary['disk_write_max'] >= summary['disk_write_p95']
+    # 平均速度按整个过程的计数器差值计算，不受环形缓冲区容量限制
+    assert summary['window_seconds'] < summary['duration']
+    assert summary['disk_write_avg'] == pytest.approx(summary['disk_write_bytes'] / summary['duration'], rel=0.01)
+    assert "吞吐量汇总" in monitor.describe_summary()
+
+
+def test_summary_without_samples(tmp_path):
+    monitor = ThroughputMonitor(str(tmp_path))
+    assert monitor.summary()['samples'] == 0
+    assert monitor.rolling_average()['net_rx'] == 0.0
+    assert monitor.describe_summary() == "吞吐量监控: 无采样数据"
+
+
+def test_virtual_interfaces_are_not_counted():
+    assert physical_interfaces(["lo", "eth0", "docker0", "veth1a2b", "br-5f3c", "wlan0"]) == ["eth0", "wlan0"]
+    # 容器内只有veth时仍然统计它
+    assert physical_interfaces(["lo", "veth0"]) == ["veth0"]
@@ -0,0 +1,135 @@
+import http.client
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+import requests
+
+from src.utils.blob_downloader import BlobDownloader
+from src.utils.mirror import MirrorError, RegistryMirror, parse_range
+from src.utils.model_store import ModelStore
+from src.utils.registry import ModelRef, RegistryClient, RegistryError
+from test_blob_downloader import CHUNK, StandInRegistry, make_blob
+
+
+class RunningMirror:
+    def __init__(self, mirror):
+        self.mirror = mirror
+        self.server = mirror.make_server('127.0.0.1', 0)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def blobs():
+    return [make_blob(200, seed=1), make_blob(6 * CHUNK + 100, seed=2), make_blob(3 * CHUNK, seed=3)]
+
+
+def test_parse_range():
+    assert parse_range(None, 100) is None
+    assert parse_range("bytes=10-19", 100) == (10, 20)
+    assert parse_range("bytes=90-", 100) == (90, 100)
+    assert parse_range("bytes=-5", 100) == (95, 100)
+    assert parse_range("bytes=0-999", 100) == (0, 100)
+    assert parse_range("bytes=0-1,5-6", 100) is None
+    with pytest.raises(MirrorError) as error:
+        parse_range("bytes=100-", 100)
+    assert error.value.status == 416
+
+
+def test_fleet_pulls_each_blob_from_upstream_once(tmp_path, blobs):
+    with StandInRegistry(blobs) as upstream:
+        mirror = RegistryMirror(ModelStore(str(tmp_path / "mirror")), RegistryClient(upstream.url))
+        mirror.downloader.chunk_size = CHUNK
+        with RunningMirror(mirror) as running:
+            def install(index):
+                store = ModelStore(str(tmp_path / f"host{index}"))
+                downloader = BlobDownloader(RegistryClient(running.server.url), store, chunk_size=CHUNK)
+                downloader.pull("deepseek-r1:tiny")
+                return store
+
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                stores = list(pool.map(install, range(8)))
+
+    for store in stores:
+        for digest, data in blobs:
+            assert store.blob_path(digest).read_bytes() == data
+    for digest, data in blobs:
+        assert mirror.store.blob_path(digest).read_bytes() == data
+        fetched = sorted((start, end) for d, start, end in upstream.ranges if d == digest)
+        expected = [(start, min(start + CHUNK, len(data)) - 1) for start in range(0, len(data), CHUNK)]
+        assert fetched == expected
+    assert mirror.stats['upstream_blobs'] == len(blobs)
+    assert not mirror._fills
+
+
+def test_serves_ranges_and_conditional_manifests(tmp_path, blobs):
+    with StandInRegistry(blobs) as upstream:
+        mirror = RegistryMirror(ModelStore(str(tmp_path / "mirror")), RegistryClient(upstream.url))
+        with RunningMirror(mirror) as running:
+            base = f"{running.server.url}/v2/library/deepseek-r1"
+            manifest = requests.get(f"{base}/manifests/tiny")
+            assert manifest.status_code == 200
+            assert manifest.content == upstream.manifest
+            etag = manifest.headers["ETag"]
+            assert requests.get(f"{base}/manifests/tiny", headers={"If-None-Match": etag}).status_code == 304
+
+            digest, data = blobs[1]
+            full = requests.get(f"{base}/blobs/{digest}")
+            assert full.status_code == 200 and full.content == data
+            part = requests.get(f"{base}/blobs/{digest}", headers={"Range": "bytes=100-299"})
+            assert part.status_code == 206
+            assert part.content == data[100:300]
+            assert part.headers["Content-Range"] == f"bytes 100-299/{len(data)}"
+            head = requests.head(f"{base}/blobs/{digest}")
+            assert int(head.headers["Content-Length"]) == len(data)
+            invalid = requests.get(f"{base}/blobs/{digest}", headers={"Range": f"bytes={len(data)}-"})
+            assert invalid.status_code == 416
+            assert invalid.headers["Content-Range"] == f"bytes */{len(data)}"
+            stats = requests.get(f"{running.server.url}/mirror/stats").json()
+    assert stats["upstream_manifests"] == 1
+
+
+def test_offline_mirror_serves_only_local_content(tmp_path, blobs):
+    source = ModelStore(str(tmp_path / "mirror"))
+    with StandInRegistry(blobs) as upstream:
+        BlobDownloader(RegistryClient(upstream.url), source).pull("deepseek-r1:tiny")
+
+    with RunningMirror(RegistryMirror(source)) as running:
+        client = RegistryClient(running.server.url)
+        target = ModelStore(str(tmp_path / "host"))
+        BlobDownloader(client, target).pull("deepseek-r1:tiny")
+        assert all(target.has_blob(digest, len(data)) for digest, data in blobs)
+        with pytest.raises(RegistryError) as error:
+            client.get_manifest(ModelRef.parse("deepseek-r1:70b"))
+        assert error.value.status == 404
+
+
+
+def test_rejects_paths_outside_the_store(tmp_path):
+    store = ModelStore(str(tmp_path / "mirror"))
+    store.ensure_dirs()
+    (tmp_path / "secret.json").write_text('{"secret": true}')
+
+    with RunningMirror(RegistryMirror(store)) as running:
+        for path in ("/v2/library/../../../../manifests/secret.json",
+                     "/v2/library/deepseek-r1/manifests/..",
+                     "/v2/library//deepseek-r1/manifests/latest",
+                     "/v2/x/y/blobs/..",
+                     "/v2/x/y/blobs/sha256:abc"):
+            # 用 http.client 发送，requests 会先规范化路径中的 '..'
+            connection = http.client.HTTPConnection(*running.server.server_address[:2])
+            connection.request("GET", path)
+            response = connection.getresponse()
+            assert response.status == 400, path
+            assert b"secret" not in response.read()
+            connection.close()
+        missing = "sha256:" + "0" * 64
+        assert requests.get(f"{running.server.url}/v2/x/y/blobs/{missing}").status_code == 404
@@ -0,0 +1,91 @@
+import random
+
+import pytest
+
+from src.utils.config_loader import ConfigLoader
+from src.utils.model_catalog import ModelCatalog, ModelRecord, normalize_requirements, parse_tag
+from src.utils.system_checker import SystemChecker
+
+
+def test_parse_tag():
+    assert parse_tag("deepseek-r1:7b") == ("deepseek-r1", 7.0, None)
+    assert parse_tag("deepseek-r1:70b-llama-distill-q4_K_M") == ("deepseek-r1", 70.0, "q4_K_M")
+    assert parse_tag("qwen2.5:1.5b-instruct-fp16") == ("qwen2.5", 1.5, "fp16")
+    assert parse_tag("all-minilm:22m") == ("all-minilm", 0.022, None)
+    assert parse_tag("llama3:latest") == ("llama3", None, None)
+
+
+def test_legacy_requirement_keys():
+    assert normalize_requirements({'vram_required': 8, 'ram_required': 16, 'disk_required': 5}) == \
+        {'gpu_memory': 8.0, 'system_memory': 16.0, 'disk_space': 5.0}
+    record = ModelRecord.from_config("deepseek-r1:7b", {'gpu_memory': 8, 'ram_required': 16})
+    assert (record.gpu_memory, record.system_memory, record.disk_space) == (8, 16, 0)
+
+
+def test_catalog_from_config():
+    loader = ConfigLoader()
+    catalog = loader.get_model_catalog()
+    # 配置未变化时复用已建立的索引
+    assert loader.get_model_catalog() is catalog
+    assert len(catalog) == 6 and "deepseek-r1:671b" in catalog
+    assert [r.name for r in catalog.family("deepseek-r1")][:2] == ["deepseek-r1:1.5b", "deepseek-r1:7b"]
+    assert catalog.largest_fit(24, 64, 100).name == "deepseek-r1:32b"
+    # 内存不足时退到更小的模型
+    assert catalog.largest_fit(24, 40, 100).name == "deepseek-r1:14b"
+    assert catalog.largest_fit(2, 64, 100) is None
+    assert [r.name for r in catalog.within_budget(12, 32, 10)] == ["deepseek-r1:14b", "deepseek-r1:7b",
+                                                                    "deepseek-r1:1.5b"]
+    assert [r.name for r in catalog.parameter_range(7, 32)] == ["deepseek-r1:7b", "deepseek-r1:14b",
+                                                                 "deepseek-r1:32b"]
+
+
+@pytest.fixture
+def large_catalog():
+    rng = random.Random(0)
+    records = []
+    for i in range(5000):
+        params = rng.choice([0.5, 1.5, 3, 7, 8, 14, 32, 70, 405])
+        quant = rng.choice(["q4_K_M", "q8_0", "fp16"])
+        scale = {"q4_K_M": 0.6, "q8_0": 1.1, "fp16": 2.1}[quant]
+        records.append(ModelRecord(
+            f"family{i % 40}:{params:g}b-v{i}-{quant}",
+            gpu_memory=round(params * scale + rng.uniform(0, 2), 1),
+            system_memory=round(params * rng.uniform(0.5, 3), 1),
+            disk_space=round(params * scale * rng.uniform(0.8, 1.2), 1),
+        ))
+    return records
+
+
+def test_queries_match_linear_scan(large_catalog):
+    catalog = ModelCatalog(large_catalog)
+    rng = random.Random(1)
+    assert len(catalog.quantization("fp16")) + len(catalog.quantization("q8_0")) + \
+        len(catalog.quantization("q4_K_M")) == 5000
+
+    for _ in range(300):
+        budget = (rng.uniform(0, 300), rng.uniform(0, 800), rng.uniform(0, 500))
+        fitting = [r for r in large_catalog if r.fits(*budget)]
+        best = catalog.largest_fit(*budget)
+        if not fitting:
+            assert best is None
+            continue
+        assert best.fits(*budget)
+        assert best.size_key == max(r.size_key for r in fitting)
+        assert {r.name for r in catalog.within_budget(*budget)} == {r.name for r in fitting}
+
+        family = "family7"
+        in_family = [r for r in fitting if r.family == family]
+        best_in_family = catalog.largest_fit(*budget, family=family)
+        assert (best_in_family.size_key if best_in_family else None) == \
+            (max(r.size_key for r in in_family) if in_family else None)
+
+
+def test_system_checker_recommends_from_catalog():
+    class FixedChecker(SystemChecker):
+        def get_snapshot(self):
+            return {'gpu_info': {'total_memory': 24.0}, 'memory_info': {'total': 40.0}, 'disk_info': {'free': 100.0}}
+
+    recommended = FixedChecker().recommend_models(ConfigLoader().get_model_catalog())
+    assert recommended[0].name == "deepseek-r1:14b"
+    assert [r.name for r in recommended] == sorted((r.name for r in recommended),
+                                                   key=lambda name: parse_tag(name)[1], reverse=True)
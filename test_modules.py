@@ -46,9 +46,9 @@ def test_config_loader():
     models = config.get_available_models()
     for model, requirements in models.items():
         print(f"\n  {model}:")
-        print(f"    显存要求: {requirements['vram_required']} GB")
-        print(f"    内存要求: {requirements['ram_required']} GB")
-        print(f"    磁盘要求: {requirements['disk_required']} GB")
+        print(f"    显存要求: {requirements['gpu_memory']} GB")
+        print(f"    内存要求: {requirements['system_memory']} GB")
+        print(f"    磁盘要求: {requirements['disk_space']} GB")
 
 def test_model_compatibility():
     print("\n=== 测试模型兼容性检查 ===")
@@ -0,0 +1,125 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.utils.ollama_client import OllamaClient, OllamaError
+from test_ollama_pull import make_events
+
+
+class StandInOllamaApi:
+    """模拟Ollama的管理接口，记录每个请求使用的客户端端口以检查连接复用"""
+
+    def __init__(self, models=("deepseek-r1:7b",), unavailable_once=0):
+        self.models = list(models)
+        self.unavailable = unavailable_once
+        self.ports = set()
+        self.requests = []
+        outer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status, payload):
+                body = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def handle_request(self):
+                outer.ports.add(self.client_address[1])
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length)) if length else None
+                outer.requests.append((self.command, self.path))
+                if outer.unavailable:
+                    outer.unavailable -= 1
+                    return self.reply(503, {"error": "starting"})
+                if self.path == "/api/version":
+                    return self.reply(200, {"version": "0.5.7"})
+                if self.path == "/api/tags":
+                    return self.reply(200, {"models": [{"name": name} for name in outer.models]})
+                if self.path == "/api/delete":
+                    if payload["model"] not in outer.models:
+                        return self.reply(404, {"error": "model not found"})
+                    outer.models.remove(payload["model"])
+                    return self.reply(200, {})
+                if self.path == "/api/pull":
+                    body = "".join(json.dumps(event) + "\n" for event in make_events()).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                    outer.models.append(payload["model"])
+                    return
+                self.reply(404, {"error": "not found"})
+
+            do_GET = do_DELETE = do_POST = handle_request
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def test_client_reuses_one_connection():
+    with StandInOllamaApi() as server:
+        client = OllamaClient(server.url)
+        assert client.version() == "0.5.7"
+        assert client.has_model("deepseek-r1:7b")
+        client.pull("deepseek-r1:1.5b")
+        assert client.model_names() == ["deepseek-r1:7b", "deepseek-r1:1.5b"]
+        assert client.delete("deepseek-r1:7b")
+        assert not client.delete("deepseek-r1:7b")
+        client.close()
+
+    assert len(server.requests) == 6
+    # 健康检查走单独的不重试连接，其余请求共用一条keep-alive连接
+    assert len(server.ports) == 2
+
+    stats = client.stats()
+    assert stats["GET /api/tags"]["count"] == 2
+    assert stats["POST /api/pull"]["count"] == 1
+    assert stats["DELETE /api/delete"]["errors"] == 0
+    assert stats["GET /api/version"]["p95_ms"] >= stats["GET /api/version"]["p50_ms"] > 0
+
+
+def test_client_retries_unavailable_server():
+    with StandInOllamaApi(unavailable_once=2) as server:
+        client = OllamaClient(server.url, backoff_factor=0)
+        assert client.model_names() == ["deepseek-r1:7b"]
+
+    assert server.requests.count(("GET", "/api/tags")) == 3
+
+
+def test_health_check_does_not_retry():
+    with StandInOllamaApi(unavailable_once=1) as server:
+        client = OllamaClient(server.url)
+        assert client.version() is None
+        assert client.version() == "0.5.7"
+
+    assert server.requests.count(("GET", "/api/version")) == 2
+
+
+def test_client_reports_unreachable_server():
+    client = OllamaClient("http://127.0.0.1:9", retries=0)
+    assert client.version() is None
+    assert not client.is_available()
+    with pytest.raises(OllamaError, match="无法连接"):
+        client.list_models()
+    assert client.stats()["GET /api/tags"]["errors"] == 1
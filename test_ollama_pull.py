@@ -0,0 +1,181 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.utils.ollama_pull import OllamaPuller, PullCancelled, PullError, PullProgress, resolve_ollama_host
+
+LAYER_A = "sha256:" + "a" * 64
+LAYER_B = "sha256:" + "b" * 64
+
+
+def make_events(total_a: int = 4000, total_b: int = 1000, steps: int = 4):
+    """生成与 /api/pull 相同格式的事件序列"""
+    events = [{"status": "pulling manifest"}]
+    for digest, total in ((LAYER_A, total_a), (LAYER_B, total_b)):
+        for i in range(steps + 1):
+            events.append({
+                "status": f"pulling {digest[7:19]}",
+                "digest": digest,
+                "total": total,
+                "completed": total * i // steps,
+            })
+    events += [
+        {"status": "verifying sha256 digest"},
+        {"status": "writing manifest"},
+        {"status": "success"},
+    ]
+    return events
+
+
+class StandInOllama:
+    """本地模拟的Ollama服务，按预设事件流响应 /api/pull"""
+
+    def __init__(self, events):
+        self.events = events
+        self.requests = []
+        self.hold = None    # 设置后发送完事件不结束响应，模拟停滞的下载
+        outer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                outer.requests.append((self.path, json.loads(self.rfile.read(length))))
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.end_headers()
+                for event in outer.events:
+                    self.wfile.write((json.dumps(event) + "\n").encode())
+                    self.wfile.flush()
+                if outer.hold is not None:
+                    outer.hold.wait(30)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def test_resolve_ollama_host():
+    assert resolve_ollama_host("0.0.0.0") == "http://127.0.0.1:11434"
+    assert resolve_ollama_host("example:8080") == "http://example:8080"
+    assert resolve_ollama_host("https://example/") == "https://example:11434"
+
+
+def test_progress_tracks_layers():
+    now = [0.0]
+    progress = PullProgress(clock=lambda: now[0])
+    progress.update({"status": "pulling a", "digest": LAYER_A, "total": 1000, "completed": 0})
+    now[0] = 2.0
+    progress.update({"status": "pulling a", "digest": LAYER_A, "total": 1000, "completed": 400})
+    progress.update({"status": "pulling b", "digest": LAYER_B, "total": 1000})
+
+    assert progress.total_bytes == 2000
+    assert progress.completed_bytes == 400
+    assert progress.rate == pytest.approx(200.0)
+    assert progress.eta == pytest.approx(8.0)
+
+    # 字节不再增长时识别为停滞
+    now[0] = 12.0
+    progress.update({"status": "pulling a", "digest": LAYER_A, "total": 1000, "completed": 400})
+    assert progress.stalled_for == pytest.approx(10.0)
+
+
+def test_pull_streams_progress():
+    reports = []
+    with StandInOllama(make_events()) as server:
+        puller = OllamaPuller(server.url, report_interval=0)
+        progress = puller.pull("deepseek-r1:1.5b", lambda p, m: reports.append((p, m)),
+                               progress_range=(30, 90))
+
+    assert server.requests[0][0] == "/api/pull"
+    assert server.requests[0][1]["model"] == "deepseek-r1:1.5b"
+    assert progress.success
+    assert progress.total_bytes == 5000
+    percents = [p for p, _ in reports]
+    assert percents == sorted(percents)
+    assert percents[0] == 30 and percents[-1] == 90
+    assert any("2/2 层" in m for _, m in reports)
+
+
+def test_pull_reports_server_error():
+    events = [{"status": "pulling manifest"}, {"error": "pull model manifest: file does not exist"}]
+    with StandInOllama(events) as server:
+        with pytest.raises(PullError, match="file does not exist"):
+            OllamaPuller(server.url).pull("deepseek-r1:999b")
+
+
+def test_pull_requires_success():
+    with StandInOllama(make_events()[:-1]) as server:
+        with pytest.raises(PullError, match="意外结束"):
+            OllamaPuller(server.url).pull("deepseek-r1:1.5b")
+
+
+def test_pull_cancel_stops_stream():
+    cancel = threading.Event()
+    reports = []
+
+    def on_progress(percent, message):
+        reports.append(percent)
+        if len(reports) == 3:
+            cancel.set()
+
+    with StandInOllama(make_events(steps=50)) as server:
+        puller = OllamaPuller(server.url, report_interval=0)
+        with pytest.raises(PullCancelled):
+            puller.pull("deepseek-r1:1.5b", on_progress, cancel_event=cancel)
+
+    assert len(reports) == 3
+
+
+def test_abort_interrupts_stalled_pull():
+    cancel = threading.Event()
+    with StandInOllama(make_events()[:2]) as server:
+        server.hold = threading.Event()
+        puller = OllamaPuller(server.url)
+        threading.Timer(0.5, lambda: (cancel.set(), puller.abort())).start()
+
+        started = time.monotonic()
+        with pytest.raises(PullCancelled):
+            puller.pull("deepseek-r1:1.5b", cancel_event=cancel)
+        server.hold.set()
+
+    assert time.monotonic() - started < 5
+
+
+def test_stall_reported_while_stream_is_silent():
+    cancel = threading.Event()
+    reports = []
+
+    def on_progress(percent, message):
+        reports.append((percent, message))
+        if message.startswith("下载停滞"):
+            cancel.set()
+
+    with StandInOllama(make_events(steps=20)[:12]) as server:
+        server.hold = threading.Event()
+        # 停滞检测和取消都不依赖新的进度行到达，也不需要调用 abort()
+        puller = OllamaPuller(server.url, read_timeout=20, stall_timeout=0.3, report_interval=0)
+        started = time.monotonic()
+        with pytest.raises(PullCancelled):
+            puller.pull("deepseek-r1:1.5b", on_progress, cancel_event=cancel)
+        server.hold.set()
+
+    assert time.monotonic() - started < 5
+    stalled = [percent for percent, message in reports if message.startswith("下载停滞")]
+    assert len(stalled) == 1 and stalled[0] == max(percent for percent, _ in reports)
@@ -0,0 +1,50 @@
+from src.utils.config_loader import ConfigLoader
+from src.utils.placement import plan_placement
+from test_fleet import snapshot
+
+MODELS = {
+    f"m{gpu}": {'gpu_memory': gpu, 'system_memory': 1, 'disk_space': 1}
+    for gpu in (2, 3, 4, 5)
+}
+
+
+def test_exact_search_beats_best_fit():
+    snapshots = [snapshot('a', 10, 64, 100), snapshot('b', 10, 64, 100)]
+    demand = {'m5': 1, 'm4': 1, 'm3': 3, 'm2': 1}
+
+    heuristic = plan_placement(demand, snapshots, MODELS, exact=False)
+    assert heuristic.method == "best-fit"
+    assert heuristic.gpu_used == 18
+    assert heuristic.unplaced == {'m2': 1}
+
+    plan = plan_placement(demand, snapshots, MODELS)
+    assert plan.method == "exact"
+    assert plan.gpu_used == 20
+    assert plan.gpu_utilization == 1.0
+    assert plan.unplaced == {}
+
+
+def test_replicas_share_disk_and_stranded_capacity():
+    models = ConfigLoader().get_available_models()
+    snapshots = [snapshot('big', 80, 256, 60), snapshot('small', 10, 32, 100)]
+    plan = plan_placement({'deepseek-r1:32b': 3}, snapshots, models)
+
+    # 60GB磁盘只够放两份32b模型文件，三个副本共用一份
+    assert plan.assignments == {'big': ['deepseek-r1:32b'] * 3, 'small': []}
+    assert plan.hosts[0].disk == 60 - 25
+    assert plan.stranded() == {
+        'big': {'gpu': 8.0, 'free_gpu': 8.0, 'free_ram': 112.0, 'free_disk': 35.0},
+        'small': {'gpu': 10.0, 'free_gpu': 10.0, 'free_ram': 32.0, 'free_disk': 100.0},
+    }
+
+
+def test_large_fleet_uses_heuristic():
+    models = ConfigLoader().get_available_models()
+    snapshots = [snapshot(f"h{i}", 24, 64, 200) for i in range(200)]
+    plan = plan_placement({'deepseek-r1:14b': 300, 'deepseek-r1:7b': 100}, snapshots, models)
+
+    assert plan.method == "best-fit"
+    assert plan.unplaced == {}
+    # 每台24GB主机放两个14b (24GB)，或者14b+7b组合
+    assert plan.gpu_used == 300 * 12 + 100 * 8
+    assert all(v['gpu'] == 0 or v['free_gpu'] < 8 for v in plan.stranded().values())
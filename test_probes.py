@@ -0,0 +1,70 @@
+import os
+import sys
+import time
+
+import pytest
+
+from src.utils.probes import ProbeEngine
+from src.utils.system_checker import SystemChecker
+
+
+def test_probes_run_in_parallel():
+    engine = ProbeEngine()
+    probes = {f"p{i}": (lambda: time.sleep(0.2) or "done") for i in range(5)}
+    started = time.monotonic()
+    results = engine.run(probes)
+    elapsed = time.monotonic() - started
+
+    # 总耗时取决于最慢的探测，而不是所有探测之和
+    assert elapsed < 0.6
+    assert all(r.ok and r.value == "done" for r in results.values())
+    assert all(r.latency >= 0.2 for r in results.values())
+
+
+def test_partial_results_on_timeout_and_error():
+    def broken():
+        raise RuntimeError("driver error")
+
+    engine = ProbeEngine()
+    started = time.monotonic()
+    results = engine.run(
+        {"fast": lambda: 1, "hung": lambda: time.sleep(5), "broken": broken},
+        timeouts={"hung": 0.2},
+    )
+
+    assert time.monotonic() - started < 1
+    assert results["fast"].ok and results["fast"].value == 1
+    assert results["hung"].status == "timeout" and results["hung"].value is None
+    assert results["broken"].status == "error" and "driver error" in results["broken"].error
+    assert results["hung"].as_dict()["latency_ms"] >= 200
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="使用shell脚本模拟nvidia-smi")
+def test_hung_nvidia_smi_does_not_block(tmp_path, monkeypatch):
+    script = tmp_path / "nvidia-smi"
+    script.write_text("#!/bin/sh\nsleep 30\n")
+    script.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+
+    checker = SystemChecker(probe_timeouts={"gpu_info": 0.5})
+    started = time.monotonic()
+    info = checker.check_system()
+
+    assert time.monotonic() - started < 2
+    assert info["probe_stats"]["gpu_info"]["status"] == "timeout"
+    assert info["gpu_info"] is None
+    assert info["memory_info"]["total"] > 0
+    assert info["probe_stats"]["memory_info"]["status"] == "ok"
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="使用shell脚本模拟nvidia-smi")
+def test_gpu_probe_parses_nvidia_smi(tmp_path, monkeypatch):
+    script = tmp_path / "nvidia-smi"
+    script.write_text("#!/bin/sh\necho 'NVIDIA A100-SXM4-80GB, 81920'\necho 'NVIDIA A100-SXM4-80GB, 81920'\n")
+    script.chmod(0o755)
+    monkeypatch.setenv("PATH", f"{tmp_path}{os.pathsep}{os.environ['PATH']}")
+
+    gpu_info = SystemChecker()._get_gpu_info()
+    assert gpu_info["name"] == "NVIDIA A100-SXM4-80GB"
+    assert gpu_info["count"] == 2
+    assert gpu_info["total_memory"] == 160
@@ -0,0 +1,138 @@
+import json
+import time
+import threading
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from src.utils.pull_scheduler import PullScheduler, TimeWindow, TokenBucket
+from test_ollama_pull import make_events
+
+
+class SlowStandInOllama:
+    """逐条延迟发送事件的模拟服务，用于观察并发度"""
+
+    def __init__(self, delay: float = 0.01, failing=()):
+        self.delay = delay
+        self.failing = set(failing)
+        self.active = 0
+        self.peak = 0
+        self.pulled = []
+        self.lock = threading.Lock()
+        outer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                model = json.loads(self.rfile.read(length))["model"]
+                with outer.lock:
+                    outer.active += 1
+                    outer.peak = max(outer.peak, outer.active)
+                    outer.pulled.append(model)
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/x-ndjson")
+                    self.end_headers()
+                    events = make_events()
+                    if model in outer.failing:
+                        events = events[:2] + [{"error": "manifest unknown"}]
+                    for event in events:
+                        self.wfile.write((json.dumps(event) + "\n").encode())
+                        self.wfile.flush()
+                        time.sleep(outer.delay)
+                finally:
+                    with outer.lock:
+                        outer.active -= 1
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def test_token_bucket_debt():
+    now = [0.0]
+    bucket = TokenBucket(100, clock=lambda: now[0])
+    assert bucket.take(50) == 0
+    assert bucket.take(250) == pytest.approx(2.0)
+    now[0] = 1.0
+    assert bucket.debt_seconds() == pytest.approx(1.0)
+    now[0] = 10.0
+    # 令牌不会超过突发上限
+    assert bucket.take(0) == 0 and bucket.tokens == 100
+
+
+def test_time_window_wraps_midnight():
+    window = TimeWindow.parse("22:00-06:00")
+    assert window.contains(datetime(2024, 1, 1, 23, 30))
+    assert window.contains(datetime(2024, 1, 2, 5, 59))
+    assert not window.contains(datetime(2024, 1, 2, 12, 0))
+    assert window.seconds_until_open(datetime(2024, 1, 2, 21, 0)) == 3600
+    assert window.seconds_until_open(datetime(2024, 1, 2, 23, 0)) == 0
+
+
+def test_scheduler_limits_parallelism():
+    models = ["deepseek-r1:1.5b", "deepseek-r1:7b", "deepseek-r1:14b"]
+    reports = []
+    with SlowStandInOllama() as server:
+        scheduler = PullScheduler(server.url, max_parallel=2,
+                                  progress_callback=lambda p, m: reports.append((p, m)))
+        stats = scheduler.run_sync(models)
+
+    assert server.peak == 2
+    assert sorted(server.pulled) == sorted(models)
+    assert all(s.status == "success" for s in stats.values())
+    assert all(s.bytes_done == 5000 and s.average_rate > 0 for s in stats.values())
+    assert scheduler.total_bytes == 15000
+    assert reports[-1][0] == 100
+
+
+def test_scheduler_reports_failures():
+    with SlowStandInOllama(delay=0, failing={"deepseek-r1:7b"}) as server:
+        scheduler = PullScheduler(server.url, max_parallel=2, max_attempts=2)
+        stats = scheduler.run_sync(["deepseek-r1:1.5b", "deepseek-r1:7b"])
+
+    assert stats["deepseek-r1:1.5b"].status == "success"
+    assert stats["deepseek-r1:7b"].status == "failed"
+    assert "manifest unknown" in stats["deepseek-r1:7b"].error
+    assert server.pulled.count("deepseek-r1:7b") == 2
+
+
+def test_scheduler_pauses_over_budget():
+    with SlowStandInOllama(delay=0) as server:
+        # 每个模型5000字节，预算1000字节/秒，超过0.5秒欠账即断开等待
+        scheduler = PullScheduler(server.url, max_parallel=1,
+                                  bandwidth_limit=1000, pause_threshold=0.5)
+        stats = scheduler.run_sync(["deepseek-r1:1.5b"])
+
+    assert stats["deepseek-r1:1.5b"].status == "success"
+    assert stats["deepseek-r1:1.5b"].pauses >= 1
+    assert len(server.pulled) >= 2
+
+
+def test_scheduler_cancel_stops_all_models():
+    cancel = threading.Event()
+    with SlowStandInOllama(delay=0.05) as server:
+        scheduler = PullScheduler(server.url, max_parallel=1, cancel_event=cancel)
+        threading.Timer(0.2, cancel.set).start()
+        started = time.monotonic()
+        stats = scheduler.run_sync(["deepseek-r1:1.5b", "deepseek-r1:7b"])
+
+    assert time.monotonic() - started < 2
+    assert all(s.status == "cancelled" for s in stats.values())
+    # 排队中的模型不会再发起拉取
+    assert server.pulled == ["deepseek-r1:1.5b"]
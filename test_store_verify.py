@@ -0,0 +1,83 @@
+import json
+import os
+
+from src.utils import store_verify
+from src.utils.model_store import ModelStore
+from src.utils.registry import ModelRef
+from src.utils.store_verify import StoreVerifier, VerifyCache, hash_file
+from test_blob_downloader import make_blob
+
+
+def write_model(store, name, blobs):
+    for digest, data in blobs:
+        store.blob_path(digest).write_bytes(data)
+    manifest = {
+        "schemaVersion": 2,
+        "config": {"digest": blobs[0][0], "size": len(blobs[0][1])},
+        "layers": [{"digest": digest, "size": len(data)} for digest, data in blobs[1:]],
+    }
+    store.write_manifest(ModelRef.parse(name), json.dumps(manifest).encode())
+
+
+def make_store(tmp_path):
+    store = ModelStore(str(tmp_path / "models"))
+    store.ensure_dirs()
+    shared = make_blob(100, seed=9)
+    small = [shared, make_blob(3000, seed=1)]
+    large = [shared, make_blob(5000, seed=2), make_blob(7000, seed=3)]
+    write_model(store, "deepseek-r1:1.5b", small)
+    write_model(store, "deepseek-r1:7b", large)
+    return store, small, large
+
+
+def test_hash_file_matches_digest(tmp_path, monkeypatch):
+    monkeypatch.setattr(store_verify, "HASH_WINDOW", 1000)
+    digest, data = make_blob(4500)
+    (tmp_path / "blob").write_bytes(data)
+    (tmp_path / "empty").write_bytes(b"")
+    assert hash_file(tmp_path / "blob") == digest
+    assert hash_file(tmp_path / "empty") == make_blob(0)[0]
+
+
+def test_verify_is_incremental(tmp_path):
+    store, small, large = make_store(tmp_path)
+    cache = VerifyCache(tmp_path / "verified.json")
+
+    report = StoreVerifier(store, cache, max_workers=4).verify()
+    assert report["ok"] and report["blobs"] == 4
+    assert report["hashed"] == 4 and report["hashed_bytes"] == 100 + 3000 + 5000 + 7000
+    assert report["gb_per_s"] > 0
+    assert report["models"]["deepseek-r1:7b"]["size"] == 12100
+
+    # 缓存跨实例生效，未变化的文件不再计算
+    report = StoreVerifier(store, VerifyCache(tmp_path / "verified.json")).verify()
+    assert report["ok"] and report["hashed"] == 0 and report["cached"] == 4
+
+    # 修改过的文件（mtime变化）重新计算并报告损坏
+    path = store.blob_path(large[2][0])
+    data = bytearray(large[2][1])
+    data[10] ^= 0xFF
+    path.write_bytes(bytes(data))
+    os.utime(path, ns=(0, 10 ** 9))
+    report = StoreVerifier(store, VerifyCache(tmp_path / "verified.json")).verify()
+    assert report["hashed"] == 1 and not report["ok"]
+    assert report["models"]["deepseek-r1:1.5b"]["status"] == "ok"
+    problem = report["models"]["deepseek-r1:7b"]
+    assert problem["status"] == "corrupt" and problem["problems"] == [
+        {"digest": large[2][0], "size": 7000, "error": "corrupt"}]
+
+
+def test_verify_reports_missing_layers(tmp_path):
+    store, small, large = make_store(tmp_path)
+    store.blob_path(large[1][0]).unlink()
+    store.blob_path(small[1][0]).write_bytes(b"short")
+
+    report = StoreVerifier(store, VerifyCache(tmp_path / "verified.json")).verify(
+        ["deepseek-r1:7b", "deepseek-r1:1.5b", "deepseek-r1:70b"])
+    models = report["models"]
+    assert models["deepseek-r1:7b"]["status"] == "missing"
+    assert models["deepseek-r1:1.5b"]["problems"][0]["error"] == "size_mismatch"
+    assert models["deepseek-r1:70b"]["status"] == "missing"
+
+    report = StoreVerifier(store, VerifyCache(tmp_path / "verified.json")).verify(["deepseek-r1:7b"])
+    assert list(report["models"]) == ["deepseek-r1:7b"] and report["blobs"] == 3
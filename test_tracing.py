@@ -0,0 +1,120 @@
+import io
+import json
+
+import pytest
+
+from src.utils import tracing
+from src.utils.tracing import Tracer
+
+
+@pytest.fixture
+def shared_tracer(monkeypatch):
+    monkeypatch.setattr(tracing, "_tracer", None)
+    monkeypatch.delenv("DEEPSEEK_TRACE_FILE", raising=False)
+    monkeypatch.delenv("DEEPSEEK_METRICS_TEXTFILE", raising=False)
+    monkeypatch.delenv("DEEPSEEK_PROFILE", raising=False)
+
+
+def read_trace(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_nested_spans_and_outcomes(tmp_path):
+    tracer = Tracer(tmp_path / "trace.jsonl")
+    with tracer.span("install_model", model="deepseek-r1:7b") as outer:
+        with tracer.span("check_docker"):
+            pass
+        outer.add_bytes(1000)
+    with pytest.raises(ValueError):
+        with tracer.span("load_config"):
+            raise ValueError("bad yaml")
+
+    check, install, config = read_trace(tmp_path / "trace.jsonl")
+    assert check["parent_id"] == install["span_id"]
+    assert check["trace_id"] == install["trace_id"]
+    assert install["parent_id"] is None
+    assert install["bytes"] == 1000
+    assert install["attributes"] == {"model": "deepseek-r1:7b"}
+    assert install["duration_s"] >= check["duration_s"]
+    assert config["outcome"] == "error"
+    assert "bad yaml" in config["error"]
+    assert config["trace_id"] != install["trace_id"]
+
+
+def test_traced_marks_false_as_failed(shared_tracer):
+    @tracing.traced("check_ollama")
+    def check(result):
+        return result
+
+    assert check(False) is False
+    assert check(True) is True
+    assert [(s["name"], s["outcome"]) for s in tracing.get_tracer().recent] == [
+        ("check_ollama", "failed"), ("check_ollama", "ok")]
+
+
+def test_textfile_accumulates_across_processes(tmp_path):
+    textfile = tmp_path / "deepseek.prom"
+    for _ in range(2):
+        tracer = Tracer(textfile_path=textfile)
+        with tracer.span("install_model") as current:
+            current.add_bytes(500)
+        with tracer.span("install_model") as current:
+            current.outcome = "failed"
+
+    text = textfile.read_text(encoding="utf-8")
+    assert "# TYPE deepseek_installer_phase_duration_seconds summary" in text
+    assert 'deepseek_installer_phase_duration_seconds_count{phase="install_model",outcome="ok"} 2' in text
+    assert 'deepseek_installer_phase_duration_seconds_count{phase="install_model",outcome="failed"} 2' in text
+    assert 'deepseek_installer_phase_bytes_total{phase="install_model",outcome="ok"} 1000' in text
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_profile_selected_phase(tmp_path):
+    tracer = Tracer(profile_phases=["check_system"], profile_dir=tmp_path)
+    with tracer.span("check_system"):
+        sum(range(1000))
+    with tracer.span("load_config"):
+        pass
+    profiled, plain = tracer.recent
+    assert profiled["attributes"]["profile"].endswith(".prof")
+    assert "profile" not in plain["attributes"]
+    assert len(list(tmp_path.glob("check_system-*.prof"))) == 1
+
+
+def test_cli_writes_trace_and_metrics(tmp_path, shared_tracer):
+    from src.cli import main
+    trace = tmp_path / "trace.jsonl"
+    textfile = tmp_path / "metrics.prom"
+    code = main(["--trace", str(trace), "--metrics-textfile", str(textfile),
+                 "verify", "--path", str(tmp_path / "models")], io.StringIO())
+    assert code == 0
+    spans = read_trace(trace)
+    assert spans[-1]["name"] == "cli"
+    assert spans[-1]["attributes"] == {"command": "verify", "exit_code": 0}
+    assert 'phase="cli",outcome="ok"' in textfile.read_text(encoding="utf-8")
+
+
+def test_config_lookups_record_one_load_span(tmp_path, shared_tracer, monkeypatch):
+    from src.utils import config_cache
+    from src.utils.config_loader import ConfigLoader
+    monkeypatch.setattr(config_cache, "_shared_cache", config_cache.ConfigCache(tmp_path / "cache"))
+    loader = ConfigLoader()
+    for _ in range(50):
+        assert loader.get_available_models()
+    assert ConfigLoader().get_available_models()
+    spans = [s for s in tracing.get_tracer().recent if s["name"] == "load_config"]
+    assert len(spans) == 1
+    assert spans[0]["attributes"]["parsed"] is True
+
+
+def test_install_span_counts_pulled_bytes():
+    from src.utils.installer import ModelInstaller
+    from src.utils.ollama_pull import PullProgress
+    progress = PullProgress()
+    progress.update({"digest": "sha256:" + "a" * 64, "total": 4000, "completed": 2500})
+    tracer = Tracer()
+    with tracer.span("install_model") as current:
+        ModelInstaller._trace_io(current, {"samples": 3, "disk_write_bytes": 2600, "net_rx_p95": 10.0}, progress)
+    record = tracer.recent[-1]
+    assert record["bytes"] == 2500
+    assert record["attributes"]["disk_write_bytes"] == 2600
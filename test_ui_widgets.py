@@ -0,0 +1,52 @@
+import os
+import threading
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+QtWidgets = pytest.importorskip("PySide6.QtWidgets")
+
+from src.ui.widgets import LogView, ProgressCoalescer
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+
+def test_coalescer_keeps_latest_value_per_key(app):
+    coalescer = ProgressCoalescer()
+    flushed = []
+    coalescer.flushed.connect(flushed.append)
+
+    workers = [threading.Thread(target=lambda: [coalescer.submit_progress(i // 100, f"块 {i}")
+                                                for i in range(10000)])
+               for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    coalescer.submit('speed', 1)
+    coalescer.submit('speed', 2)
+    coalescer.flush()
+    coalescer.flush()
+
+    # 四万次提交只产生一次界面刷新
+    assert coalescer.submitted == 40002
+    assert flushed == [{'progress': 99, 'message': "块 9999", 'speed': 2}]
+
+
+def test_log_view_is_bounded_and_batched(app):
+    view = LogView(max_lines=100, flush_interval_ms=10000)
+    for i in range(1000):
+        view.append_line(f"第 {i} 行")
+
+    # 定时器触发前不会触碰文档
+    assert view.document().blockCount() == 1
+    lines = view.lines()
+    assert len(lines) == 100
+    assert lines[0] == "第 900 行" and lines[-1] == "第 999 行"
+
+    view.append_line("最后一行")
+    assert view.lines()[-1] == "最后一行"
+    assert view.document().blockCount() == 100
@@ -0,0 +1,97 @@
+import os
+import json
+import threading
+
+import pytest
+
+from src.utils import warmup
+from src.utils.model_store import ModelStore
+from src.utils.ollama_client import OllamaClient
+from src.utils.registry import ModelRef
+from src.utils.warmup import ModelWarmer, find_model_blobs, prefetch, split_segments
+from test_benchmark import StandInGenerateApi
+from test_blob_downloader import make_blob
+
+
+def install_fake_model(models_path, name, blobs):
+    store = ModelStore(str(models_path))
+    store.ensure_dirs()
+    for digest, data in blobs:
+        store.blob_path(digest).write_bytes(data)
+    manifest = {
+        "schemaVersion": 2,
+        "config": {"digest": blobs[0][0], "size": len(blobs[0][1])},
+        "layers": [{"digest": digest, "size": len(data)} for digest, data in blobs[1:]],
+    }
+    store.write_manifest(ModelRef.parse(name), json.dumps(manifest).encode())
+    return store
+
+
+def test_split_segments(tmp_path):
+    files = [(tmp_path / "a", 10), (tmp_path / "b", 4), (tmp_path / "empty", 0)]
+    assert split_segments(files, segment_size=4) == [
+        (tmp_path / "a", 0, 4), (tmp_path / "a", 4, 4), (tmp_path / "a", 8, 2), (tmp_path / "b", 0, 4)]
+
+
+@pytest.mark.parametrize("mode", ["read", "auto"])
+def test_prefetch_reads_every_byte(tmp_path, monkeypatch, mode):
+    monkeypatch.setattr(warmup, "SEGMENT_SIZE", 1000)
+    monkeypatch.setattr(warmup, "READ_SIZE", 256)
+    blobs = [make_blob(2500, seed=1), make_blob(700, seed=2)]
+    store = install_fake_model(tmp_path, "deepseek-r1:tiny", blobs)
+    files = find_model_blobs("deepseek-r1:tiny", [str(tmp_path / "missing"), str(tmp_path)])
+    assert files == [(store.blob_path(d), len(data)) for d, data in blobs]
+
+    result = prefetch(files, mode, max_workers=3)
+    assert result["bytes"] == 3200 and result["files"] == 2
+
+
+@pytest.mark.skipif(not hasattr(os, "posix_fadvise"), reason="需要 posix_fadvise")
+def test_prefetch_advise_only(tmp_path):
+    path = tmp_path / "blob"
+    path.write_bytes(b"x" * 5000)
+    assert prefetch([(path, 5000)], "advise")["bytes"] == 5000
+
+
+def test_warm_preloads_and_reports_saving(tmp_path):
+    blobs = [make_blob(300, seed=1), make_blob(4000, seed=2)]
+    install_fake_model(tmp_path, "deepseek-r1:7b", blobs)
+    progress = []
+    with StandInGenerateApi({"deepseek-r1:7b": 100}, load_delay=0.2) as server:
+        warmer = ModelWarmer(OllamaClient(server.url), [str(tmp_path)], keep_alive=-1,
+                             progress_callback=lambda p, m: progress.append(p))
+        result = warmer.warm("deepseek-r1:7b")
+        assert server.loaded == {"deepseek-r1:7b"}
+        missing = warmer.warm("deepseek-r1:1.5b")
+
+    assert result["prefetch"]["bytes"] == 4300
+    assert result["load_s"] >= 0.2 > result["resident_s"]
+    assert result["saved_s"] >= 0.15
+    assert progress[-1] == 100
+    # 本地没有文件时只做预加载
+    assert missing["prefetch"] is None and "load_s" in missing
+
+
+def test_warm_maps_progress_into_range(tmp_path):
+    install_fake_model(tmp_path, "deepseek-r1:7b", [make_blob(300, seed=1), make_blob(4000, seed=2)])
+    progress = []
+    with StandInGenerateApi({"deepseek-r1:7b": 100}) as server:
+        warmer = ModelWarmer(OllamaClient(server.url), [str(tmp_path)], progress_range=(90, 100),
+                             progress_callback=lambda p, m: progress.append(p))
+        warmer.warm("deepseek-r1:7b")
+
+    # 安装之后的预热只占进度条的最后一段，不回退
+    assert progress == sorted(progress) and progress[0] >= 90 and progress[-1] == 100
+
+
+def test_cancel_skips_remaining_warmup_steps(tmp_path):
+    install_fake_model(tmp_path, "deepseek-r1:7b", [make_blob(300, seed=1), make_blob(4000, seed=2)])
+    cancel = threading.Event()
+    cancel.set()
+    with StandInGenerateApi({"deepseek-r1:7b": 100}) as server:
+        warmer = ModelWarmer(OllamaClient(server.url), [str(tmp_path)], cancel_event=cancel)
+        result = warmer.warm("deepseek-r1:7b")
+        assert not server.loaded
+
+    assert result["cancelled"] and result["prefetch"]["bytes"] == 0
+    assert "load_s" not in result